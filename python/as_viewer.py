@@ -21,6 +21,7 @@ import argparse
 import json
 import logging
 import os
+import socket
 import subprocess
 import time
 import pathlib
@@ -155,10 +156,23 @@ def launch_sciond(sock_file, conf_dir, addr, s_isd_as):
         cmd = '%s --addr %s' % (cmd, addr)
     logging.info("Listening for sciond: %s" % cmd)
     subprocess.Popen(cmd, shell=True)
-    wait = 0
-    while not os.path.exists(sock_file) and wait < 5:
-        wait = wait + 1
-        time.sleep(1)
+    deadline = time.time() + 5
+    while not sciond_ready(sock_file) and time.time() < deadline:
+        time.sleep(0.1)
+
+
+def sciond_ready(sock_file):
+    '''
+    Tests whether sciond accepts connections on its API socket.
+    '''
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(sock_file)
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
 
 
 def print_yml(path):
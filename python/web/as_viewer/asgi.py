@@ -0,0 +1,153 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+ASGI config for as_viewer project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``, to be served by an ASGI server such as uvicorn:
+
+    uvicorn as_viewer.asgi:application
+
+Django 1.8 has no ASGI handler, so the event loop of the server accepts
+connections and reads request bodies, and requests are handed to the WSGI
+application on a bounded pool of ASGI_WORKERS threads. Response chunks are
+sent as they are produced. A request holds one of these threads while its
+view runs. The sciond requests of views are exchanged on the event loop of
+the asyncio sciond client and hold no thread while sciond answers, but the
+view thread waits for their results since Django 1.8 views are synchronous.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from django.core.wsgi import get_wsgi_application
+import asyncio
+import io
+import os
+import sys
+
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "as_viewer.settings")
+
+# threads running the WSGI application
+ASGI_WORKERS = int(os.environ.get("ASVIZ_ASGI_WORKERS", 32))
+
+wsgi_application = get_wsgi_application()
+executor = ThreadPoolExecutor(max_workers=ASGI_WORKERS)
+
+
+def build_environ(scope, body):
+    '''
+    Returns the WSGI environ of an ASGI http scope.
+    :param scope: ASGI http connection scope.
+    :param body: Request body bytes.
+    '''
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ['CONTENT_TYPE', 'CONTENT_LENGTH']:
+            name = 'HTTP_' + name
+        if name in environ:
+            # repeated cookie headers are one cookie list, RFC 6265 5.4
+            sep = '; ' if name == 'HTTP_COOKIE' else ','
+            value = '%s%s%s' % (environ[name], sep, value)
+        environ[name] = value
+    return environ
+
+
+async def read_body(receive):
+    '''
+    Returns the request body, or None when the client disconnected.
+    '''
+    body = []
+    more = True
+    while more:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body.append(message.get('body', b''))
+        more = message.get('more_body', False)
+    return b''.join(body)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        raise ValueError("Unsupported ASGI scope: %s" % scope['type'])
+    body = await read_body(receive)
+    if body is None:
+        return
+    loop = asyncio.get_running_loop()
+    start = {}
+
+    def start_response(status, headers, exc_info=None):
+        start['status'] = int(status.split(' ', 1)[0])
+        start['headers'] = [(k.lower().encode('latin-1'),
+                             v.encode('latin-1')) for k, v in headers]
+        return start.setdefault('written', []).append
+
+    result = await loop.run_in_executor(
+        executor, wsgi_application, build_environ(scope, body),
+        start_response)
+    try:
+        chunks = iter(result)
+        # start_response may be deferred until the first chunk, PEP 3333
+        chunk = await loop.run_in_executor(executor, next, chunks, None)
+        if 'status' not in start:
+            raise RuntimeError("WSGI application did not call start_response")
+        await send({'type': 'http.response.start', 'status': start['status'],
+                    'headers': start['headers']})
+        for written in start.get('written', []):
+            await send({'type': 'http.response.body', 'body': written,
+                        'more_body': True})
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        close = getattr(result, 'close', None)
+        if close is not None:
+            await loop.run_in_executor(executor, close)
@@ -63,6 +63,8 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'asviz.metrics.MetricsMiddleware',
+    'asviz.timing.TimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -124,6 +126,53 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# asviz sciond connections
+SCIOND_HEALTH_CHECK_INTERVAL = 10  # seconds between pooled socket checks
+SCIOND_MAX_PER_AS = 4  # concurrent sciond requests per source AS
+SCIOND_READY_WAIT = 1  # seconds a request waits for a starting sciond
+SCIOND_REQUEST_TIMEOUT = 10  # seconds before a sciond request is abandoned
+SEGMENT_CACHE_SIZE = 256  # cached (source AS, segment type) entries
+SEGMENT_CACHE_MAX_AGE = 60  # seconds, unless segments expire earlier
+PATH_CACHE_SIZE = 256  # cached (source AS, destination AS, max paths) entries
+PATH_CACHE_FRESH = 10  # seconds before cached paths are revalidated
+PATH_CACHE_MAX_STALE = 300  # seconds after which paths are fetched inline
+
+# asviz generated config files
+FILE_CACHE_SIZE = 256  # cached topologies, cert listings and cert html
+CERT_INDEX_CACHE_SIZE = 16  # cached cert indexes of single ASes or all gen/
+GEN_WATCH_INTERVAL = 5  # seconds between scans of gen/ for changes
+
+# asviz remote visualization config
+CONFIG_URL = os.environ.get(
+    "ASVIZ_CONFIG_URL",
+    "https://my-project-1470640410708.appspot.com/getconfig")
+CONFIG_TTL = 300  # seconds the config is served before revalidation
+# runtime cache outside the source tree, the config holds API keys, so the
+# directory is created with mode 0700 and the config saved with mode 0600
+CACHE_DIR = os.environ.get(
+    "ASVIZ_CACHE_DIR",
+    os.path.join(os.path.expanduser('~'), '.cache', 'asviz'))
+CONFIG_FALLBACK_FILE = os.path.join(CACHE_DIR, 'config-cache.json')
+
+# asviz labels and locations feed proxy
+FEED_ALLOWED_URLS = []  # URL prefixes allowed besides the configured feeds
+FEED_TTL = 300  # seconds a feed is served before revalidation
+FEED_CACHE_SIZE = 2 * 1024 * 1024  # largest body in bytes kept in memory
+FEED_CACHE_ENTRIES = 32  # cached feed URLs
+FEED_MAX_SIZE = 32 * 1024 * 1024  # largest body in bytes passed through
+
+# asviz client geolocation: 'cidr' locates clients by subnet, 'google' can
+# only locate the server and answers the same location for every client
+GEOLOCATION_RESOLVERS = ['cidr', 'google']  # tried in order
+GEOLOCATION_CIDR_FILE = os.path.join(BASE_DIR, 'geolocation.cidr')
+GEOLOCATION_TTL = 3600  # seconds a location is cached
+GEOLOCATION_SUBNET_V4 = 24  # IPv4 prefix length of clients sharing a location
+GEOLOCATION_SUBNET_V6 = 56  # IPv6 prefix length of clients sharing a location
+GEOLOCATION_CACHE_SIZE = 1024  # cached subnets
+
+# asviz request diagnostics
+PROFILE_REQUESTS = DEBUG  # allow ?profile=1 to return a cProfile summary
+
 # configure logging
 LOGGING = {
     'version': 1,
@@ -23,6 +23,9 @@ urlpatterns = [
     url(r'^hosttime/', 'asviz.views.hosttime'),
     url(r'^config/', 'asviz.views.config'),
     url(r'^labels/', 'asviz.views.labels'),
+    url(r'^locations/ia/', 'asviz.views.locations_ia'),
+    url(r'^locations/bbox/', 'asviz.views.locations_bbox'),
     url(r'^locations/', 'asviz.views.locations'),
     url(r'^geolocate/', 'asviz.views.geolocate'),
+    url(r'^metrics/?$', 'asviz.views.metrics'),
 ]
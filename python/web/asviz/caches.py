@@ -0,0 +1,312 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from lib.types import PathSegmentType as PST
+
+from .metrics import cache_lookup
+
+# segment types sciond only holds for destinations it has looked up
+DST_SEG_TYPES = (PST.CORE, PST.DOWN)
+
+
+class SegmentCacheEntry(object):
+    '''
+    Cached segments of one type for one source AS.
+    '''
+    __slots__ = ['segs', 'expires', 'dsts']
+
+    def __init__(self, segs, expires, dsts):
+        self.segs = segs
+        self.expires = expires
+        self.dsts = dsts
+
+
+class SegmentCache(object):
+    '''
+    LRU cache of sciond segments keyed by source ISD_AS and segment type.
+
+    An entry stays valid until the earliest expTime of its segments or until
+    max_age seconds have passed, whichever comes first. Core and down
+    segments depend on the destinations sciond has looked up, so they are
+    only served for destinations the entry was filled for.
+    '''
+
+    def __init__(self, max_entries, max_age):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._max_age = max_age
+
+    def get(self, s_isd_as, seg_type, dst=None):
+        '''
+        Returns cached segments, or None when missing or expired.
+        :param s_isd_as: Source ISD_AS.
+        :param seg_type: PathSegmentType of the segments.
+        :param dst: Destination ISD_AS core and down segments must cover.
+        '''
+        key = (s_isd_as, seg_type)
+        with self._lock:
+            segs = self._lookup(key, seg_type, dst)
+        cache_lookup('segment', segs is not None)
+        return segs
+
+    def _lookup(self, key, seg_type, dst):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.time():
+            del self._entries[key]
+            return None
+        if seg_type in DST_SEG_TYPES and dst not in entry.dsts:
+            return None
+        self._entries.move_to_end(key)
+        return entry.segs
+
+    def put(self, s_isd_as, seg_type, segs, dst=None):
+        '''
+        Stores segments, evicting the least recently used entries over the
+        size cap. Empty results are not cached since sciond may still be
+        fetching segments.
+        :param s_isd_as: Source ISD_AS.
+        :param seg_type: PathSegmentType of the segments.
+        :param segs: Segments returned by lib_sciond.get_segtype_hops.
+        :param dst: Destination ISD_AS the segments were requested for.
+        '''
+        if not segs:
+            return
+        now = time.time()
+        expires = min([now + self._max_age] + [s.p.expTime for s in segs])
+        key = (s_isd_as, seg_type)
+        with self._lock:
+            old = self._entries.get(key)
+            dsts = {dst}
+            if old is not None and old.expires > now:
+                dsts |= old.dsts
+            self._entries[key] = SegmentCacheEntry(segs, expires, dsts)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, s_isd_as=None):
+        '''
+        Drops all entries of a source AS, or everything when not given.
+        :param s_isd_as: Source ISD_AS.
+        '''
+        with self._lock:
+            if s_isd_as is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == s_isd_as]:
+                del self._entries[key]
+
+
+class PathCache(object):
+    '''
+    Stale-while-revalidate LRU cache of sciond paths keyed by
+    (source ISD_AS, destination ISD_AS, max paths).
+
+    Entries younger than max_stale seconds are served with their age, once
+    older than fresh seconds the caller is expected to revalidate them in
+    the background. Only one revalidation per key is in flight at a time.
+    '''
+
+    def __init__(self, max_entries, fresh, max_stale):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._max_entries = max_entries
+        self._fresh = fresh
+        self._max_stale = max_stale
+
+    def get(self, key):
+        '''
+        Returns cached paths and their age in seconds, or (None, None) when
+        missing or too stale to serve.
+        :param key: (source ISD_AS, destination ISD_AS, max paths) tuple.
+        '''
+        with self._lock:
+            paths, age = self._lookup(key)
+        cache_lookup('path', paths is not None)
+        return paths, age
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        paths, fetched = entry
+        age = time.time() - fetched
+        if age > self._max_stale:
+            del self._entries[key]
+            return None, None
+        self._entries.move_to_end(key)
+        return paths, age
+
+    def put(self, key, paths):
+        '''
+        Stores freshly fetched paths, evicting the least recently used
+        entries over the size cap.
+        :param key: (source ISD_AS, destination ISD_AS, max paths) tuple.
+        :param paths: Paths returned by lib_sciond.get_paths.
+        '''
+        with self._lock:
+            self._entries[key] = (paths, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def needs_refresh(self, paths, age):
+        '''
+        Returns True when served paths should be revalidated, empty results
+        are always revalidated since sciond may still be fetching segments.
+        '''
+        return not paths or age > self._fresh
+
+    def start_refresh(self, key):
+        '''
+        Claims the revalidation of a key, returns False when another one is
+        already in flight.
+        '''
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key):
+        '''
+        Releases the revalidation claim of a key.
+        '''
+        with self._lock:
+            self._refreshing.discard(key)
+
+
+def file_stamp(paths):
+    '''
+    Returns the (path, mtime, size) of files or directories, with None for
+    missing ones, identifying the version of the data read from them.
+    :param paths: File or directory paths.
+    '''
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append((path, None, None))
+    return tuple(stamp)
+
+
+class FileCache(object):
+    '''
+    LRU cache of values derived from files, such as parsed topologies and
+    rendered certificate html.
+
+    Each entry remembers the mtime and size of the files it was built from
+    and is rebuilt as soon as one of them changes, so a request only costs a
+    few stat calls while the files stay the same. invalidate() drops
+    everything, e.g. when a watcher sees the generated config change. A
+    value whose build overlapped an invalidation is returned but not
+    stored, since it may have read the old files.
+    '''
+
+    def __init__(self, max_entries, name='file'):
+        '''
+        :param max_entries: Number of cached values.
+        :param name: Cache name of the lookup metrics.
+        '''
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._name = name
+        self._generation = 0
+
+    def get(self, key, paths, build, *args):
+        '''
+        Returns the cached value of a key, building it with build(*args) when
+        missing or when the files it depends on changed.
+        :param key: Hashable cache key.
+        :param paths: Files and directories the value is read from.
+        :param build: Function returning the value.
+        '''
+        stamp = file_stamp(paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and entry[0] == stamp
+            if hit:
+                self._entries.move_to_end(key)
+            generation = self._generation
+        cache_lookup(self._name, hit)
+        if hit:
+            return entry[1]
+        value = build(*args)
+        with self._lock:
+            if generation != self._generation:
+                return value  # invalidated while building
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        '''
+        Drops all entries, and the values of builds still running.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+class SingleFlight(object):
+    '''
+    Collapses concurrent calls with the same key into one. Callers arriving
+    while a call is in flight wait for it and share its result or exception
+    instead of repeating the work.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args):
+        '''
+        Runs func(*args) unless a call for key is already in flight, and
+        returns its result.
+        :param key: Hashable key identifying the work.
+        :param func: Function doing the work.
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                self._calls[key] = call
+        if not leader:
+            return call.result()
+        try:
+            result = func(*args)
+            call.set_result(result)
+            return result
+        except BaseException as err:
+            call.set_exception(err)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -0,0 +1,171 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+from bisect import bisect_right
+
+# file names of TRCs and certificate chains, used when the content lacks
+# the ISD, AS or version
+TRC_FILE = re.compile(r'^ISD(\d+)-V(\d+)\.trc$')
+CHAIN_FILE = re.compile(r'^ISD(\d+)-AS(.+)-V(\d+)\.crt$')
+
+
+class CertRecord(object):
+    '''
+    Index entry of one TRC or certificate chain file.
+    '''
+    __slots__ = ['path', 'kind', 'isd', 'isd_as', 'version', 'created',
+                 'expires']
+
+    def __init__(self, path, kind, isd, isd_as, version, created, expires):
+        self.path = path
+        self.kind = kind
+        self.isd = isd
+        self.isd_as = isd_as
+        self.version = version
+        self.created = created
+        self.expires = expires
+
+    def key(self):
+        '''
+        Returns all fields of the record, identifying its json data.
+        '''
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def to_json(self, root):
+        '''
+        Returns the record as json data, paths relative to root.
+        '''
+        return {
+            "type": self.kind,
+            "isd": self.isd,
+            "isd_as": self.isd_as,
+            "version": self.version,
+            "created": self.created,
+            "expires": self.expires,
+            "path": os.path.relpath(self.path, root),
+        }
+
+
+def trc_record(path, trc):
+    '''
+    Builds the record of a parsed TRC file.
+    :param path: Path to the TRC file.
+    :param trc: Parsed json of the TRC.
+    '''
+    m = TRC_FILE.match(os.path.basename(path))
+    isd = trc.get('ISD', m.group(1) if m else None)
+    version = trc.get('Version', int(m.group(2)) if m else None)
+    return CertRecord(path, 'trc', None if isd is None else str(isd), None,
+                      version, trc.get('CreationTime'),
+                      trc.get('ExpirationTime'))
+
+
+def chain_record(path, chain):
+    '''
+    Builds the record of a parsed certificate chain file, indexed by its
+    leaf certificate and expiring with the first certificate of the chain.
+    :param path: Path to the certificate chain file.
+    :param chain: Parsed json of the chain, certificates keyed by position.
+    '''
+    if 'Subject' in chain:
+        certs = [chain]
+    else:
+        certs = [chain[k] for k in sorted(chain, key=str)
+                 if isinstance(chain[k], dict)]
+    leaf = certs[0] if certs else {}
+    m = CHAIN_FILE.match(os.path.basename(path))
+    isd_as = leaf.get('Subject')
+    if isd_as is None and m:
+        isd_as = "%s-%s" % (m.group(1), m.group(2).replace('_', ':'))
+    version = leaf.get('Version', int(m.group(3)) if m else None)
+    expires = [c['ExpirationTime'] for c in certs if 'ExpirationTime' in c]
+    return CertRecord(path, 'crt', isd_as.split('-')[0] if isd_as else None,
+                      isd_as, version, leaf.get('IssuingTime'),
+                      min(expires) if expires else None)
+
+
+class CertIndex(object):
+    '''
+    Index of TRC and certificate chain records by ISD, AS, version and
+    expiration time.
+
+    Records are sorted by expiration so expiry queries are a bisection, and
+    the latest version of each TRC per ISD and of each chain per AS is kept
+    for lookups of current material. Every AS keeps a copy of the TRCs of
+    its ISD, so TRCs are indexed once per ISD and version, from the first
+    directory listing them.
+    '''
+
+    def __init__(self, records):
+        seen = set()
+        unique = []
+        for r in records:
+            if r.kind == 'trc':
+                if (r.isd, r.version) in seen:
+                    continue
+                seen.add((r.isd, r.version))
+            unique.append(r)
+        records = unique
+        self.records = sorted(
+            [r for r in records if r.expires is not None],
+            key=lambda r: r.expires)
+        self._expires = [r.expires for r in self.records]
+        # records without expiration are never returned by expiry queries
+        self.records += [r for r in records if r.expires is None]
+        self._by_isd = {}
+        self._by_as = {}
+        self._latest = {}
+        for r in self.records:
+            self._by_isd.setdefault(r.isd, []).append(r)
+            if r.isd_as:
+                self._by_as.setdefault(r.isd_as, []).append(r)
+            key = self._latest_key(r)
+            cur = self._latest.get(key)
+            if cur is None or (r.version or 0) > (cur.version or 0):
+                self._latest[key] = r
+
+    def _latest_key(self, r):
+        return (r.kind, r.isd if r.kind == 'trc' else r.isd_as)
+
+    def query(self, kind=None, isd=None, isd_as=None, expires_before=None,
+              expires_after=None, latest=False):
+        '''
+        Returns matching records, sorted by expiration time.
+        :param kind: 'trc' or 'crt', None for both.
+        :param isd: ISD string of the records.
+        :param isd_as: ISD-AS string of certificate chains.
+        :param expires_before: Unix time the records expire by, including
+            records already expired unless expires_after is given.
+        :param expires_after: Unix time the records expire after.
+        :param latest: Only return the latest version per ISD or AS.
+        '''
+        if expires_before is not None or expires_after is not None:
+            lo = 0 if expires_after is None else bisect_right(
+                self._expires, expires_after)
+            hi = len(self._expires) if expires_before is None else (
+                bisect_right(self._expires, expires_before))
+            records = self.records[lo:hi]
+        elif isd_as is not None:
+            records = self._by_as.get(isd_as, [])
+        elif isd is not None:
+            records = self._by_isd.get(isd, [])
+        else:
+            records = self.records
+        return [r for r in records if
+                (kind is None or r.kind == kind) and
+                (isd is None or r.isd == isd) and
+                (isd_as is None or r.isd_as == isd_as) and
+                (not latest or self._latest[self._latest_key(r)] is r)]
@@ -0,0 +1,138 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from .caches import SingleFlight
+from .metrics import cache_lookup
+
+logging = logging.getLogger("asviz")
+
+# seconds to wait for the config service
+REQUEST_TIMEOUT = 5
+# seconds before retrying the config service after a failed request
+RETRY_INTERVAL = 30
+
+
+class ConfigError(Exception):
+    '''
+    No config available, from the service, memory or the fallback file.
+    '''
+
+
+class ConfigClient(object):
+    '''
+    Caching client of the remote visualization config service.
+
+    The config is kept in memory for ttl seconds, then revalidated with the
+    ETag and Last-Modified of the last response, so an unchanged config
+    costs a 304. Concurrent refreshes share one upstream request. Every new
+    config is saved to a local fallback file, which is served when the
+    service is unreachable and nothing is in memory yet, e.g. after a
+    restart while offline.
+    '''
+
+    def __init__(self, url, ttl, fallback_file=None, method='post',
+                 timeout=REQUEST_TIMEOUT, retry_interval=RETRY_INTERVAL):
+        self.url = url
+        self._ttl = ttl
+        self._fallback_file = fallback_file
+        self._method = method
+        self._timeout = timeout
+        self._retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._body = None
+        self._checked = 0
+        self._headers = {}
+        self._flight = SingleFlight()
+
+    def get(self):
+        '''
+        Returns the config as bytes, from memory while fresh. Raises
+        ConfigError when neither the service nor a fallback has one.
+        '''
+        with self._lock:
+            body = self._body
+            fresh = (body is not None and
+                     time.time() - self._checked < self._ttl)
+        cache_lookup('config', fresh)
+        if fresh:
+            return body
+        return self._flight.do(self.url, self._refresh)
+
+    def _refresh(self):
+        try:
+            resp = requests.request(
+                self._method, self.url, headers=self._headers,
+                timeout=self._timeout)
+            if resp.status_code == 304 and self._body is not None:
+                with self._lock:
+                    self._checked = time.time()
+                    return self._body
+            resp.raise_for_status()
+        except requests.RequestException as err:
+            logging.warning("config service %s: %s: %s" % (
+                self.url, err.__class__.__name__, err))
+            return self._fallback()
+        headers = {}
+        if resp.headers.get('ETag'):
+            headers['If-None-Match'] = resp.headers['ETag']
+        if resp.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = resp.headers['Last-Modified']
+        body = resp.content
+        logging.info("config updated from %s (%s bytes)" % (
+            self.url, len(body)))
+        with self._lock:
+            self._body = body
+            self._checked = time.time()
+            self._headers = headers
+        self._save(body)
+        return body
+
+    def _fallback(self):
+        # serve what we have and retry the service later
+        with self._lock:
+            if self._body is None and self._fallback_file:
+                try:
+                    with open(self._fallback_file, 'rb') as fin:
+                        self._body = fin.read()
+                    logging.info("config loaded from %s" %
+                                 self._fallback_file)
+                except OSError as err:
+                    logging.warning("%s: %s" % (err.__class__.__name__, err))
+            if self._body is None:
+                raise ConfigError("config unavailable from %s" % self.url)
+            self._checked = time.time() - self._ttl + self._retry_interval
+            return self._body
+
+    def _save(self, body):
+        if not self._fallback_file:
+            return
+        tmp = '%s.tmp' % self._fallback_file
+        try:
+            # the config may hold keys, only the server user may read it
+            os.makedirs(os.path.dirname(self._fallback_file), mode=0o700,
+                        exist_ok=True)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as fout:
+                os.fchmod(fd, 0o600)  # a stale tmp file keeps its mode
+                fout.write(body)
+            os.replace(tmp, self._fallback_file)
+        except OSError as err:
+            logging.warning("%s: %s" % (err.__class__.__name__, err))
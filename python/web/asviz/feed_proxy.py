@@ -0,0 +1,222 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from .http_cache import compress, content_etag
+from .metrics import cache_lookup
+
+logging = logging.getLogger("asviz")
+
+# bytes read from upstream at a time
+CHUNK_SIZE = 65536
+# seconds to wait for the feed server
+REQUEST_TIMEOUT = 10
+# redirects followed per feed request, each target is checked again
+MAX_REDIRECTS = 5
+
+
+def url_has_prefix(url, prefix):
+    '''
+    Returns whether url lies under the URL prefix: same scheme and host,
+    and a path starting with the prefix path at a segment boundary. A bare
+    string prefix would also accept https://good.example.evil.net for
+    https://good.example.
+    :param url: URL to check.
+    :param prefix: Allowed URL prefix.
+    '''
+    try:
+        url, prefix = urlsplit(url), urlsplit(prefix)
+        if (url.scheme.lower() != prefix.scheme.lower() or
+                url.netloc.lower() != prefix.netloc.lower() or
+                not url.hostname):
+            return False
+    except ValueError:
+        return False
+    path = prefix.path.rstrip('/')
+    return url.path == path or url.path.startswith(path + '/')
+
+
+class FeedError(Exception):
+    '''
+    Feed refused or not available, with the http status to answer.
+    '''
+
+    def __init__(self, msg, status):
+        super().__init__(msg)
+        self.status = status
+
+
+class FeedEntry(object):
+    '''
+    Feed response, either a cached body or a one-time stream of chunks.
+    Cached bodies carry the ETag of their content.
+    '''
+    __slots__ = ['body', 'stream', 'checked', 'headers', 'etag', '_encoded']
+
+    def __init__(self, body=None, stream=None, headers=None):
+        self.body = body
+        self.stream = stream
+        self.checked = time.time()
+        self.headers = headers or {}
+        self.etag = content_etag([body]) if body is not None else None
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        '''
+        Returns the cached body compressed with a content coding,
+        compressing it only once.
+        '''
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress(self.body, encoding)
+        return body
+
+
+class FeedProxy(object):
+    '''
+    Proxy of the remote label and location feeds.
+
+    Only URLs accepted by the allowed function are fetched. Bodies up to
+    cache_size bytes are cached per URL for ttl seconds, then revalidated
+    with the ETag and Last-Modified of the upstream response, and served
+    stale while the feed server is unreachable. Larger bodies are streamed
+    through without being held in memory. Bodies over max_size are refused,
+    or aborted mid-stream when they do not announce their length, and are
+    never cached. Redirects are only followed to allowed URLs.
+    '''
+
+    def __init__(self, allowed, ttl, max_size, cache_size, max_entries,
+                 timeout=REQUEST_TIMEOUT):
+        self._allowed = allowed
+        self._ttl = ttl
+        self._max_size = max_size
+        self._cache_size = cache_size
+        self._max_entries = max_entries
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, url):
+        '''
+        Returns the FeedEntry of a feed URL. Raises FeedError when the URL is
+        not allowed, too large or unavailable.
+        :param url: Feed URL.
+        '''
+        if not self._allowed(url):
+            raise FeedError("Feed URL not allowed: %s" % url, 403)
+        with self._lock:
+            entry = self._entries.get(url)
+            fresh = (entry is not None and
+                     time.time() - entry.checked < self._ttl)
+            if entry is not None:
+                self._entries.move_to_end(url)
+        cache_lookup('feed', fresh)
+        if fresh:
+            return entry
+        try:
+            return self._fetch(url, entry)
+        except requests.RequestException as err:
+            msg = "%s: %s" % (err.__class__.__name__, err)
+            if entry is None:
+                raise FeedError(msg, 502)
+            logging.warning("%s, serving cached %s" % (msg, url))
+            return entry
+
+    def _fetch(self, url, entry):
+        headers = entry.headers if entry is not None else {}
+        resp = self._request(url, headers)
+        if resp.status_code == 304 and entry is not None:
+            resp.close()
+            entry.checked = time.time()
+            return entry
+        try:
+            resp.raise_for_status()
+            length = int(resp.headers.get('Content-Length') or 0)
+            if length > self._max_size:
+                raise FeedError("Feed too large: %s bytes from %s" % (
+                    length, url), 502)
+        except BaseException:
+            resp.close()
+            raise
+        chunks = resp.iter_content(CHUNK_SIZE)
+        buf = []
+        size = 0
+        for chunk in chunks:
+            buf.append(chunk)
+            size += len(chunk)
+            if size > self._max_size:
+                resp.close()
+                raise FeedError("Feed too large: over %s bytes from %s" % (
+                    self._max_size, url), 502)
+            if size > self._cache_size:
+                # too large to cache, pass the rest through
+                logging.info("streaming uncached feed %s" % url)
+                return FeedEntry(
+                    stream=self._stream(url, resp, chunks, buf, size))
+        resp.close()
+        validators = {}
+        if resp.headers.get('ETag'):
+            validators['If-None-Match'] = resp.headers['ETag']
+        if resp.headers.get('Last-Modified'):
+            validators['If-Modified-Since'] = resp.headers['Last-Modified']
+        entry = FeedEntry(body=b''.join(buf), headers=validators)
+        logging.info("cached feed %s (%s bytes)" % (url, size))
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _request(self, url, headers):
+        '''
+        Requests a feed, following redirects only to allowed URLs.
+        '''
+        for _ in range(MAX_REDIRECTS + 1):
+            resp = requests.get(url, headers=headers, stream=True,
+                                timeout=self._timeout, allow_redirects=False)
+            if not resp.is_redirect:
+                return resp
+            resp.close()
+            location = urljoin(url, resp.headers['Location'])
+            if not self._allowed(location):
+                raise FeedError("Feed %s redirected to a URL not allowed: %s"
+                                % (url, location), 502)
+            url = location
+        raise FeedError("Too many redirects: %s" % url, 502)
+
+    def _stream(self, url, resp, chunks, buf, size):
+        '''
+        Yields the chunks of an uncached feed. The status is sent by then, so
+        a body over max_size raises FeedError to abort the response instead
+        of ending it as if the feed were complete.
+        '''
+        try:
+            for chunk in buf:
+                yield chunk
+            for chunk in chunks:
+                size += len(chunk)
+                if size > self._max_size:
+                    raise FeedError("Feed too large: over %s bytes from %s" % (
+                        self._max_size, url), 502)
+                yield chunk
+        finally:
+            resp.close()
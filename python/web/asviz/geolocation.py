@@ -0,0 +1,185 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ipaddress
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from .caches import SingleFlight, file_stamp
+from .metrics import cache_lookup
+
+logging = logging.getLogger("asviz")
+
+GOOGLE_GEOLOCATE_URL = "https://www.googleapis.com/geolocation/v1/geolocate"
+# seconds to wait for an online resolver
+REQUEST_TIMEOUT = 5
+
+
+class GoogleResolver(object):
+    '''
+    Resolves locations with the Google geolocation API, which needs the
+    api key of the page.
+
+    The API takes no address to look up: without wifi or cell data it
+    locates the address the request comes from, which is this server. The
+    result is therefore the server location, the same for every client.
+    '''
+    per_client = False
+
+    def resolve(self, ip, api_key=None):
+        '''
+        Returns the location json of the API for the server, or None on
+        failure. ip is ignored.
+        '''
+        if not api_key:
+            return None
+        try:
+            resp = requests.post(GOOGLE_GEOLOCATE_URL, params={'key': api_key},
+                                 timeout=REQUEST_TIMEOUT)
+            resp.raise_for_status()
+            return resp.json()
+        except (requests.RequestException, ValueError) as err:
+            logging.warning("geolocation failed: %s: %s" % (
+                err.__class__.__name__, err))
+            return None
+
+
+class CidrResolver(object):
+    '''
+    Offline resolver reading locations from a table file of lines
+    "<cidr> <lat> <lng> [accuracy]", '#' starting comments. The longest
+    matching prefix wins. The file is reloaded when it changes and a
+    missing file resolves nothing.
+    '''
+    per_client = True
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._tables = []
+
+    def resolve(self, ip, api_key=None):
+        '''
+        Returns the location json of the longest prefix containing ip, or
+        None.
+        '''
+        addr = ipaddress.ip_address(ip)
+        for version, prefixlen, table in self._load():
+            if version != addr.version:
+                continue
+            net = ipaddress.ip_network('%s/%s' % (ip, prefixlen), strict=False)
+            loc = table.get(int(net.network_address))
+            if loc is not None:
+                return loc
+        return None
+
+    def _load(self):
+        stamp = file_stamp([self._path])
+        with self._lock:
+            if stamp != self._stamp:
+                self._stamp = stamp
+                self._tables = self._parse() if stamp[0][1] else []
+            return self._tables
+
+    def _parse(self):
+        tables = {}
+        with open(self._path, 'r') as fin:
+            for num, line in enumerate(fin, 1):
+                fields = line.split('#', 1)[0].split()
+                if not fields:
+                    continue
+                try:
+                    net = ipaddress.ip_network(fields[0], strict=False)
+                    loc = {"location": {"lat": float(fields[1]),
+                                        "lng": float(fields[2])}}
+                    if len(fields) > 3:
+                        loc["accuracy"] = float(fields[3])
+                except (IndexError, ValueError) as err:
+                    logging.warning("%s:%s: %s" % (self._path, num, err))
+                    continue
+                key = (net.version, net.prefixlen)
+                tables.setdefault(key, {})[int(net.network_address)] = loc
+        logging.info("loaded %s geolocation prefixes from %s" % (
+            sum(len(t) for t in tables.values()), self._path))
+        # longest prefixes first
+        return [(v, plen, tables[(v, plen)])
+                for v, plen in sorted(tables, key=lambda k: -k[1])]
+
+
+class GeolocationCache(object):
+    '''
+    Caches client locations for ttl seconds.
+
+    Resolvers are tried in order until one answers. Locations of per_client
+    resolvers are cached per subnet, clients in the same /subnet_v4 or
+    /subnet_v6 share a location. The other resolvers locate the server, so
+    their answer is cached once under SERVER for all clients. Concurrent
+    lookups of a key share one resolution, and failed lookups are not
+    cached.
+    '''
+    SERVER = 'server'
+
+    def __init__(self, resolvers, ttl, subnet_v4, subnet_v6, max_entries):
+        self._resolvers = resolvers
+        self._ttl = ttl
+        self._prefix = {4: subnet_v4, 6: subnet_v6}
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+
+    def get(self, ip, api_key=None):
+        '''
+        Returns the location json of a client, or None when no resolver
+        knows it.
+        :param ip: Client IP address.
+        :param api_key: Api key for online resolvers.
+        '''
+        addr = ipaddress.ip_address(ip)
+        subnet = ipaddress.ip_network(
+            '%s/%s' % (ip, self._prefix[addr.version]), strict=False)
+        for resolver in self._resolvers:
+            key = subnet if resolver.per_client else self.SERVER
+            loc = self._cached(key)
+            if loc is None:
+                loc = self._flight.do((id(resolver), key), self._resolve,
+                                      resolver, key, ip, api_key)
+            if loc is not None:
+                return loc
+        return None
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            fresh = entry is not None and time.time() - entry[1] < self._ttl
+            if fresh:
+                self._entries.move_to_end(key)
+        cache_lookup('geolocation', fresh)
+        return entry[0] if fresh else None
+
+    def _resolve(self, resolver, key, ip, api_key):
+        loc = resolver.resolve(ip, api_key)
+        if loc is None:
+            return None
+        with self._lock:
+            self._entries[key] = (loc, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return loc
@@ -0,0 +1,284 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+
+from lib.packet.host_addr import HostAddrIPv4
+from lib.packet.scion_addr import ISD_AS
+
+# link types of the path topology, a link seen as several types keeps the
+# highest priority one
+LINK_PRIORITY = {
+    'CORE': 2,
+    'PARENT': 1,
+    'PEER': 0,
+    'CHILD': 0,
+}
+
+
+class ASNode(object):
+    '''
+    Interned ISD-AS, parsed once per graph.
+    '''
+    __slots__ = ['isdas', 'name', 'isd', 'as_']
+
+    def __init__(self, isdas):
+        isd_as = ISD_AS(isdas)
+        self.isdas = isdas
+        self.name = str(isd_as)
+        self.isd = isd_as.isd_str()
+        self.as_ = isd_as.as_str()
+
+
+class Hop(object):
+    '''
+    Interface of a path or segment.
+    '''
+    __slots__ = ['node', 'if_id']
+
+    def __init__(self, node, if_id):
+        self.node = node
+        self.if_id = if_id
+
+
+class PathRecord(object):
+    '''
+    Forwarding path announced by sciond.
+    '''
+    __slots__ = ['hops', 'mtu', 'ipv4', 'port']
+
+    def __init__(self, hops, mtu, ipv4, port):
+        self.hops = hops
+        self.mtu = mtu
+        self.ipv4 = ipv4
+        self.port = port
+
+
+class SegmentRecord(object):
+    '''
+    Core, up or down segment known to sciond.
+    '''
+    __slots__ = ['hops', 'timestamp', 'exp_time']
+
+    def __init__(self, hops, timestamp, exp_time):
+        self.hops = hops
+        self.timestamp = timestamp
+        self.exp_time = exp_time
+
+
+class Link(object):
+    '''
+    Link between two ASes of the path topology graph.
+    '''
+    __slots__ = ['a', 'b', 'ltype']
+
+    def __init__(self, a, b, ltype):
+        self.a = a
+        self.b = b
+        self.ltype = ltype
+
+
+class Neighbor(object):
+    '''
+    Neighbor AS behind an interface, with the link type learned from
+    segments, or None when only seen in paths.
+    '''
+    __slots__ = ['node', 'ltype']
+
+    def __init__(self, node, ltype):
+        self.node = node
+        self.ltype = ltype
+
+
+class EdgeIndex(object):
+    '''
+    Undirected AS links keyed by a canonical integer built from both raw
+    ISD-ASes, giving constant time dedup regardless of direction. A link
+    added again with a higher priority type is upgraded in place, links keep
+    the order in which they were first seen.
+    '''
+    __slots__ = ['_links']
+
+    def __init__(self):
+        self._links = {}
+
+    def add(self, a, b, ltype):
+        '''
+        Adds a link between two nodes, returns True when it is new.
+        :param a: ASNode of one end.
+        :param b: ASNode of the other end.
+        :param ltype: Link type, a key of LINK_PRIORITY.
+        '''
+        key = edge_key(a, b)
+        link = self._links.get(key)
+        if link is None:
+            self._links[key] = Link(a, b, ltype)
+            return True
+        if LINK_PRIORITY[ltype] > LINK_PRIORITY[link.ltype]:
+            link.ltype = ltype
+        return False
+
+    def __contains__(self, nodes):
+        return edge_key(*nodes) in self._links
+
+    def __len__(self):
+        return len(self._links)
+
+    def __iter__(self):
+        return iter(self._links.values())
+
+
+class PathGraph(object):
+    '''
+    Compact model of the paths and segments returned by sciond.
+
+    Paths and segments are ingested once, ISD-ASes are interned so each one
+    is only parsed once, and the AS links of the path topology are derived
+    with an undirected EdgeIndex. Interfaces are indexed by (raw ISD-AS,
+    ifID) to the neighbor AS they lead to. All path and segment view outputs
+    are rendered from this model.
+    '''
+
+    def __init__(self, paths, csegs, usegs, dsegs):
+        '''
+        :param paths: PathInfo objects from lib_sciond.get_paths.
+        :param csegs: Core segments from lib_sciond.get_segtype_hops.
+        :param usegs: Up segments from lib_sciond.get_segtype_hops.
+        :param dsegs: Down segments from lib_sciond.get_segtype_hops.
+        '''
+        self._nodes = {}
+        self.paths = [self._add_path(path) for path in paths]
+        self.csegs = [self._add_segment(seg) for seg in csegs]
+        self.usegs = [self._add_segment(seg) for seg in usegs]
+        self.dsegs = [self._add_segment(seg) for seg in dsegs]
+        self.links = EdgeIndex()
+        self._add_links()
+        self._neighbors = {}
+        self._add_neighbors()
+
+    def node(self, isdas):
+        '''
+        Returns the interned node of a raw ISD-AS.
+        '''
+        node = self._nodes.get(isdas)
+        if node is None:
+            node = ASNode(isdas)
+            self._nodes[isdas] = node
+        return node
+
+    def digest(self):
+        '''
+        Returns a hash of the paths and segments of the graph, identifying
+        all outputs rendered from it without rendering them.
+        '''
+        h = hashlib.sha1()
+        for path in self.paths:
+            h.update(repr((hop_keys(path.hops), path.mtu, path.ipv4,
+                           path.port)).encode('utf-8'))
+        for segs in [self.csegs, self.usegs, self.dsegs]:
+            h.update(b'|')
+            for seg in segs:
+                h.update(repr((hop_keys(seg.hops), seg.timestamp,
+                               seg.exp_time)).encode('utf-8'))
+        return h.hexdigest()
+
+    def neighbor(self, isdas, if_id):
+        '''
+        Returns the Neighbor behind an interface, or None when the interface
+        is not part of any path or segment.
+        :param isdas: Raw ISD-AS owning the interface.
+        :param if_id: Interface ID.
+        '''
+        return self._neighbors.get((isdas, if_id))
+
+    def _hops(self, interfaces):
+        return [Hop(self.node(i.isdas), i.ifID) for i in interfaces]
+
+    def _add_path(self, path):
+        return PathRecord(
+            self._hops(path.p.path.interfaces), path.p.path.mtu,
+            str(HostAddrIPv4(path.p.hostInfo.addrs.ipv4)),
+            path.p.hostInfo.port)
+
+    def _add_segment(self, seg):
+        return SegmentRecord(
+            self._hops(seg.p.interfaces), seg.p.timestamp, seg.p.expTime)
+
+    def _add_links(self):
+        if self.csegs or self.usegs or self.dsegs:
+            nonseg_ltype = "PEER"
+        else:
+            nonseg_ltype = "CHILD"
+        self._add_seg_links(self.csegs, "CORE")
+        self._add_seg_links(self.usegs, "PARENT")
+        self._add_seg_links(self.dsegs, "PARENT")
+        self._add_nonseg_links(self.paths, nonseg_ltype)
+
+    def _add_neighbors(self):
+        # segments list hops starting at the originating core AS, so the
+        # earlier AS of each link is the parent of the later one
+        for seg in self.csegs:
+            self._add_hop_neighbors(seg.hops, "CORE", "CORE")
+        for seg in self.usegs + self.dsegs:
+            self._add_hop_neighbors(seg.hops, "CHILD", "PARENT")
+        # paths only name neighbors not already known from segments
+        for path in self.paths:
+            self._add_hop_neighbors(path.hops, None, None)
+
+    def _add_hop_neighbors(self, hops, ltype, rev_ltype):
+        for x in range(1, len(hops)):
+            a, b = hops[x - 1], hops[x]
+            if a.node is b.node:
+                continue  # AS internal hop
+            key = (a.node.isdas, a.if_id)
+            if ltype or key not in self._neighbors:
+                self._neighbors[key] = Neighbor(b.node, ltype)
+            key = (b.node.isdas, b.if_id)
+            if rev_ltype or key not in self._neighbors:
+                self._neighbors[key] = Neighbor(a.node, rev_ltype)
+
+    def _add_seg_links(self, segs, ltype):
+        '''
+        Add standard links to paths graph
+        '''
+        for seg in segs:
+            hops = seg.hops
+            for x in range(1, len(hops)):
+                self.links.add(hops[x - 1].node, hops[x].node, ltype)
+
+    def _add_nonseg_links(self, paths, ltype):
+        '''
+        Add remaining peering links to path graph
+        '''
+        for path in paths:
+            hops = path.hops
+            for x in range(1, len(hops)):
+                self.links.add(hops[x - 1].node, hops[x].node, ltype)
+
+
+def edge_key(a, b):
+    '''
+    Canonical undirected edge key of two nodes, the smaller raw 64 bit
+    ISD-AS in the high bits.
+    '''
+    if a.isdas <= b.isdas:
+        return (a.isdas << 64) | b.isdas
+    return (b.isdas << 64) | a.isdas
+
+
+def hop_keys(hops):
+    '''
+    Raw ISD-AS and interface ID pairs of hops.
+    '''
+    return [(hop.node.isdas, hop.if_id) for hop in hops]
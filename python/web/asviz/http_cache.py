@@ -0,0 +1,117 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import hashlib
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    # optional, responses are only gzip compressed without it
+    brotli = None
+
+# smallest body worth compressing toward the browser
+COMPRESS_MIN_SIZE = 1024
+# brotli quality, lower than the default to keep dynamic responses fast
+BROTLI_QUALITY = 5
+# content codings in order of preference
+ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+
+
+def content_etag(chunks):
+    '''
+    Returns a weak ETag hashing the content of a response. Weak tags stay
+    valid across the content codings of the same content.
+    :param chunks: Str or bytes chunks of the content.
+    '''
+    h = hashlib.sha1()
+    for chunk in chunks:
+        h.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    return 'W/"%s"' % h.hexdigest()
+
+
+def input_etag(*inputs):
+    '''
+    Returns a weak ETag hashing the inputs a response is built from, so it
+    is known before the content is built and sent.
+    :param inputs: Values whose repr identifies the content.
+    '''
+    return 'W/"%s"' % hashlib.sha1(repr(inputs).encode('utf-8')).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    '''
+    Returns whether an If-None-Match header matches an ETag, compared
+    weakly.
+    '''
+    if if_none_match.strip() == '*':
+        return True
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return etag[2:] in [t[2:] if t.startswith('W/') else t for t in tags]
+
+
+def accepted_encoding(accept_encoding):
+    '''
+    Returns the preferred content coding accepted by an Accept-Encoding
+    header, or None for identity.
+    '''
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    '''
+    Compresses a body with a content coding of ENCODINGS.
+    '''
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body)
+
+
+def compress_chunks(chunks, encoding):
+    '''
+    Compresses a stream of str or bytes chunks on the fly. The compressor is
+    flushed after every chunk, so each chunk reaches the browser when it is
+    produced instead of when the compressor's window fills up.
+    '''
+    if encoding == 'br':
+        z = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress_chunk, flush, finish = z.process, z.flush, z.finish
+    else:
+        z = zlib.compressobj(wbits=31)
+        compress_chunk, finish = z.compress, z.flush
+
+        def flush():
+            return z.flush(zlib.Z_SYNC_FLUSH)
+    for chunk in chunks:
+        data = compress_chunk(
+            chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        data += flush()
+        if data:
+            yield data
+    yield finish()
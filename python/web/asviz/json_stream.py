@@ -0,0 +1,146 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+# bytes of encoded json collected before yielding a chunk to the response
+CHUNK_SIZE = 16384
+# keys of graph nodes stored positionally in the compact schema
+NODE_KEYS = ['name', 'type', 'icon', 'group']
+
+_encoder = json.JSONEncoder(separators=(',', ':'))
+
+
+def iter_json(data, chunk_size=CHUNK_SIZE):
+    '''
+    Encodes data incrementally, yielding chunks of about chunk_size bytes
+    so the whole document is never held as a single string.
+    :param data: Json serializable data.
+    :param chunk_size: Minimum size of yielded chunks.
+    '''
+    buf = []
+    size = 0
+    for part in _encoder.iterencode(data):
+        buf.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield ''.join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield ''.join(buf)
+
+
+class StringTable(object):
+    '''
+    Interned strings of a compact response, referenced by their index.
+    '''
+    __slots__ = ['strings', '_index']
+
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def index(self, s):
+        '''
+        Returns the index of a string, adding it when new.
+        '''
+        i = self._index.get(s)
+        if i is None:
+            i = len(self.strings)
+            self._index[s] = i
+            self.strings.append(s)
+        return i
+
+
+def compact_response(data, table):
+    '''
+    Completes the tab data of an api response in the compact schema, in
+    place. ISD-ASes, node names and types are interned into a shared string
+    table, interfaces, nodes and links become index arrays:
+
+    - interfaces: flat [ia, ifid, ia, ifid, ...] arrays
+    - segments: [interfaces, timestamp, expTime]
+    - path topology links: [a, b, ltype]
+    - graph nodes: [name, type, icon, group] plus a dict of other keys
+    - graph links: [source, target, type]
+
+    Paths, segments and path topology links are built compact from the
+    PathGraph with the same table, so their verbose form never exists. The
+    AS topology graph of a single AS is small and converted here.
+    :param data: Api response dictionary.
+    :param table: StringTable the compact data was built with.
+    '''
+    if data.get('as_topo') is not None:
+        data['as_topo'] = compact_graph(data['as_topo'], table)
+    data['schema'] = 'compact'
+    data['strings'] = table.strings
+    return data
+
+
+def compact_hops(hops, table):
+    '''
+    Returns the flat [ia, ifid, ...] array of path or segment hops.
+    '''
+    ifs = []
+    for hop in hops:
+        ifs.append(table.index(hop.node.name))
+        ifs.append(hop.if_id)
+    return ifs
+
+
+def compact_paths(graph, table):
+    '''
+    Returns the paths of a PathGraph as interface arrays.
+    '''
+    return [compact_hops(path.hops, table) for path in graph.paths]
+
+
+def compact_segments(graph, table):
+    '''
+    Returns the core, up and down segments of a PathGraph as [interfaces,
+    timestamp, expTime] arrays.
+    '''
+    data = {}
+    for key, segs in [('core_segments', graph.csegs),
+                      ('up_segments', graph.usegs),
+                      ('down_segments', graph.dsegs)]:
+        data[key] = [[compact_hops(seg.hops, table), seg.timestamp,
+                      seg.exp_time] for seg in segs]
+    return data
+
+
+def compact_links(graph, table):
+    '''
+    Returns the path topology links of a PathGraph as [a, b, ltype] arrays.
+    '''
+    return [[table.index(link.a.name), table.index(link.b.name),
+             table.index(link.ltype)] for link in graph.links]
+
+
+def compact_graph(graph, table):
+    '''
+    Compacts an AS topology graph of nodes and links.
+    '''
+    nodes = []
+    for node in graph['nodes']:
+        n = [table.index(node['name']), table.index(node['type']),
+             table.index(node['icon']), node['group']]
+        extra = {k: v for k, v in node.items() if k not in NODE_KEYS}
+        if extra:
+            n.append(extra)
+        nodes.append(n)
+    links = [[table.index(link['source']), table.index(link['target']),
+              table.index(link['type'])] for link in graph['links']]
+    return {'nodes': nodes, 'links': links}
@@ -0,0 +1,123 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import math
+from xml.etree.ElementTree import XMLPullParser
+
+logging = logging.getLogger("asviz")
+
+# degrees of latitude and longitude covered by one grid cell
+GRID_CELL = 5.0
+
+
+class Location(object):
+    '''
+    Location of one host of an AS from the nodes feed.
+    '''
+    __slots__ = ['ia', 'host', 'lat', 'lng']
+
+    def __init__(self, ia, host, lat, lng):
+        self.ia = ia
+        self.host = host
+        self.lat = lat
+        self.lng = lng
+
+    def to_json(self):
+        return {
+            "ia": self.ia,
+            "host": self.host,
+            "lat": self.lat,
+            "lng": self.lng,
+        }
+
+
+class LocationIndex(object):
+    '''
+    Locations of the nodes feed indexed by ISD-AS and by a grid of
+    GRID_CELL degree cells for bounding box queries.
+
+    The feed is parsed incrementally from chunks, elements are dropped once
+    indexed so the document is never held as a tree.
+    '''
+
+    def __init__(self, chunks, cell=GRID_CELL):
+        '''
+        :param chunks: Chunks of the nodes xml feed.
+        :param cell: Grid cell size in degrees.
+        '''
+        self._cell = cell
+        self._by_ia = {}
+        self._grid = {}
+        self.count = 0
+        parser = XMLPullParser(events=['end'])
+        for chunk in chunks:
+            parser.feed(chunk)
+            self._add_nodes(parser)
+        parser.close()
+        self._add_nodes(parser)
+
+    def _add_nodes(self, parser):
+        for event, elem in parser.read_events():
+            if elem.tag != 'node':
+                continue
+            try:
+                loc = Location(elem.get('ia'), elem.get('host'),
+                               float(elem.get('lat')),
+                               float(elem.get('long')))
+            except (TypeError, ValueError):
+                logging.warning("invalid location node: %s" % elem.attrib)
+                continue
+            finally:
+                elem.clear()
+            self._by_ia.setdefault(loc.ia, []).append(loc)
+            self._grid.setdefault(self._cell_of(loc.lat, loc.lng),
+                                  []).append(loc)
+            self.count += 1
+
+    def _cell_of(self, lat, lng):
+        return (math.floor(lat / self._cell), math.floor(lng / self._cell))
+
+    def by_ia(self, ias):
+        '''
+        Returns the locations of ISD-ASes, in the order given.
+        :param ias: ISD-AS strings.
+        '''
+        locs = []
+        for ia in ias:
+            locs.extend(self._by_ia.get(ia, []))
+        return locs
+
+    def in_bbox(self, south, west, north, east):
+        '''
+        Returns the locations inside a bounding box. A box with west > east
+        crosses the antimeridian.
+        '''
+        if west > east:
+            return (self.in_bbox(south, west, north, 180.0) +
+                    self.in_bbox(south, -180.0, north, east))
+        (lat0, lng0), (lat1, lng1) = (self._cell_of(south, west),
+                                      self._cell_of(north, east))
+        if (lat1 - lat0 + 1) * (lng1 - lng0 + 1) > len(self._grid):
+            cells = [c for c in self._grid
+                     if lat0 <= c[0] <= lat1 and lng0 <= c[1] <= lng1]
+        else:
+            cells = [(y, x) for y in range(lat0, lat1 + 1)
+                     for x in range(lng0, lng1 + 1)]
+        locs = []
+        for c in cells:
+            for loc in self._grid.get(c, []):
+                if south <= loc.lat <= north and west <= loc.lng <= east:
+                    locs.append(loc)
+        return locs
@@ -0,0 +1,245 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from bisect import bisect_left
+
+# upper bounds of latency histogram buckets, in seconds
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0]
+# upper bounds of response size histogram buckets, in bytes
+SIZE_BUCKETS = [1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+                16777216]
+
+
+def format_labels(names, values, extra=''):
+    pairs = ['%s="%s"' % (n, str(v).replace('\\', r'\\').replace(
+        '"', r'\"').replace('\n', r'\n')) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+def format_value(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter(object):
+    '''
+    Monotonic counter per combination of label values.
+    '''
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = (
+                self._values.get(label_values, 0) + amount)
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def expose(self):
+        lines = ['# HELP %s %s' % (self.name, self.help),
+                 '# TYPE %s counter' % self.name]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, v in values:
+            lines.append('%s%s %s' % (
+                self.name, format_labels(self.labels, label_values),
+                format_value(v)))
+        return lines
+
+
+class Histogram(object):
+    '''
+    Distribution of observed values in cumulative buckets per combination
+    of label values.
+    '''
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._values = {}
+
+    def observe(self, value, *label_values):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                counts = self._values[label_values] = [0] * (
+                    len(self.buckets) + 2)
+            counts[idx] += 1
+            counts[-1] += value
+
+    def time(self, *label_values):
+        '''
+        Returns a context manager observing the seconds spent in its block.
+        '''
+        return Timer(self, label_values)
+
+    def count(self, *label_values):
+        with self._lock:
+            counts = self._values.get(label_values)
+            return sum(counts[:-1]) if counts else 0
+
+    def expose(self):
+        lines = ['# HELP %s %s' % (self.name, self.help),
+                 '# TYPE %s histogram' % self.name]
+        with self._lock:
+            values = sorted((k, list(v)) for k, v in self._values.items())
+        for label_values, counts in values:
+            total = 0
+            bounds = [format_value(float(b)) for b in self.buckets] + ['+Inf']
+            for bound, n in zip(bounds, counts[:-1]):
+                total += n
+                lines.append('%s_bucket%s %s' % (
+                    self.name, format_labels(self.labels, label_values,
+                                             'le="%s"' % bound), total))
+            labels = format_labels(self.labels, label_values)
+            lines.append('%s_sum%s %s' % (self.name, labels,
+                                          format_value(counts[-1])))
+            lines.append('%s_count%s %s' % (self.name, labels, total))
+        return lines
+
+
+class Timer(object):
+    __slots__ = ['histogram', 'label_values', 'start']
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start,
+                               *self.label_values)
+
+
+class Registry(object):
+    '''
+    Metrics of the process, exposed in the Prometheus text format.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def expose(self):
+        '''
+        Returns all metrics in the text exposition format.
+        '''
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+SCIOND_LATENCY = REGISTRY.histogram(
+    'asviz_sciond_request_seconds', 'Latency of sciond API calls.', ['call'])
+VIEW_LATENCY = REGISTRY.histogram(
+    'asviz_view_seconds',
+    'Time to compute and send the response of a view.', ['view'])
+RESPONSE_SIZE = REGISTRY.histogram(
+    'asviz_response_bytes', 'Size of view responses as sent.', ['view'],
+    SIZE_BUCKETS)
+ERRORS = REGISTRY.counter(
+    'asviz_errors_total', 'Errors by exception class.', ['type'])
+CACHE_LOOKUPS = REGISTRY.counter(
+    'asviz_cache_lookups_total', 'Cache lookups by cache and result.',
+    ['cache', 'result'])
+
+
+def error_message(err):
+    '''
+    Counts an error by its class and returns its message for logs and
+    responses.
+    '''
+    ERRORS.inc(err.__class__.__name__)
+    return "%s: %s" % (err.__class__.__name__, err)
+
+
+def cache_lookup(cache, hit):
+    '''
+    Counts a hit or miss of a cache.
+    '''
+    CACHE_LOOKUPS.inc(cache, 'hit' if hit else 'miss')
+
+
+class MetricsMiddleware(object):
+    '''
+    Records the time and response size of each view, including streamed
+    responses until their last chunk, and counts uncaught exceptions.
+    '''
+
+    def process_request(self, request):
+        request.metrics_start = time.perf_counter()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = getattr(view_func, '__name__', 'unknown')
+
+    def process_exception(self, request, exception):
+        ERRORS.inc(exception.__class__.__name__)
+
+    def process_response(self, request, response):
+        start = getattr(request, 'metrics_start', None)
+        view = getattr(request, 'metrics_view', None)
+        if start is None or view is None:
+            return response
+        if response.streaming:
+            response.streaming_content = self._observe_stream(
+                response.streaming_content, view, start)
+        else:
+            VIEW_LATENCY.observe(time.perf_counter() - start, view)
+            RESPONSE_SIZE.observe(len(response.content), view)
+        return response
+
+    def _observe_stream(self, chunks, view, start):
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            VIEW_LATENCY.observe(time.perf_counter() - start, view)
+            RESPONSE_SIZE.observe(size, view)
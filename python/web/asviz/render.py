@@ -0,0 +1,593 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from html import escape
+
+from lib.app.sciond import SCIONDResponseError
+from lib.packet.host_addr import HostAddrIPv4
+from lib.packet.scion_addr import ISD_AS
+from lib.types import ServiceType
+from lib.util import iso_timestamp
+
+from .metrics import error_message
+from .timing import phase
+
+# topology class definitions
+topo_servers = ['BEACON', 'CERTIFICATE', 'PATH', 'SIBRA']
+topo_br = ['CORE_BR', 'PARENT_BR', 'CHILD_BR', 'PEER_BR', 'BORDER']
+topo_if = ['CORE_IF', 'PARENT_IF', 'CHILD_IF', 'PEER_IF']
+topo_zk = ['ZOOKEEPER']
+
+logging = logging.getLogger("asviz")
+
+
+def get_as_view_html(graph):
+    '''
+    Formats paths and segments into nested html.
+    :param graph: PathGraph of paths and segments.
+    '''
+    with phase('html'):
+        return ''.join(iter_as_view_html(graph))
+
+
+def iter_as_view_html(graph):
+    '''
+    Yields the nested html of paths and segments one path or segment at a
+    time, for streaming responses.
+    :param graph: PathGraph of paths and segments.
+    '''
+    yield "<ul class='tree'>\n"
+    for i, path in enumerate(graph.paths):
+        s = []
+        html_path(s, path, i)
+        yield html_lines(s)
+    for segs, name, color, rev in [
+            (graph.csegs, "CORE", "red", True),
+            (graph.dsegs, "DOWN", "blue", False),
+            (graph.usegs, "UP", "green", True)]:
+        for i, seg in enumerate(segs):
+            s = []
+            p_segment(s, seg, i, name, color, rev)
+            yield html_lines(s)
+    yield "</ul>\n"
+
+
+def html_lines(s):
+    '''
+    Joins html list lines into one fragment.
+    :param s: Html output lines.
+    '''
+    return ''.join([line + '\n' for line in s])
+
+
+def html_path(s, path, idx):
+    '''
+    Formats a single path to nested html
+    :param path: PathRecord of a PathGraph.
+    :param idx: Index of the path.
+    '''
+    list_add_head(s, idx, "PATH", "black")
+    indent_open(s)
+    list_add(s, "MTU: %s" % path.mtu)
+    list_add(s, "IPV4: %s" % path.ipv4)
+    list_add(s, "Port: %s" % path.port)
+    list_add(s, "Hops: %i" % (len(path.hops) / 2))
+    # enumerate path interfaces
+    for hop in path.hops:
+        list_add(s, "%s (%s)" % (hop.node.name, hop.if_id))
+    indent_close(s)
+
+
+def get_json_hops(hops):
+    '''
+    Formats path or segment interfaces to json.
+    '''
+    return [{
+        "ISD": hop.node.isd,
+        "AS": hop.node.as_,
+        "IFID": hop.if_id,
+    } for hop in hops]
+
+
+def get_json_segments(segs):
+    '''
+    Formats segments to json.
+    '''
+    cores = []
+    for seg in segs:
+        cores.append({
+            "interfaces": get_json_hops(seg.hops),
+            "timestamp": seg.timestamp,
+            "expTime": seg.exp_time,
+        })
+    path = {}
+    path["if_lists"] = cores
+    return path
+
+
+def get_json_all_segments(graph):
+    '''
+    Format all segments to json.
+    :param graph: PathGraph of paths and segments.
+    '''
+    data = {}
+    data["core_segments"] = get_json_segments(graph.csegs)
+    data["up_segments"] = get_json_segments(graph.usegs)
+    data["down_segments"] = get_json_segments(graph.dsegs)
+    logging.debug(data)
+    return data
+
+
+def get_json_paths(graph):
+    '''
+    Formats all paths to json for path graph.
+    :param graph: PathGraph of paths and segments.
+    '''
+    cores = []
+    logging.info("\n-------- SCIOND: Paths")
+    for path in graph.paths:
+        cores.append({
+            "interfaces": get_json_hops(path.hops),
+        })
+    path = {}
+    path["if_lists"] = cores
+    logging.debug(path)
+    return path
+
+
+def json_append_server(nodes, links, isd_as, label, type, addr, port):
+    '''
+    Creates json format server data for AS topology graph
+    '''
+    nodes.append(get_json_server_node(label, type, addr, port))
+    links.append(get_json_internal_link(isd_as, label))
+    return nodes, links
+
+
+def json_append_router(nodes, links, isd_as, label, type, addr, port, ifID):
+    '''
+    Create json formatted router data for AS topology graph
+    '''
+    nodes.append(get_json_router_node(label, type, addr, port, ifID))
+    links.append(get_json_internal_link(isd_as, label))
+    return nodes, links
+
+
+def json_append_zookeeper(nodes, links, isd_as, v, name, idx):
+    '''
+    Create json formatted zookeeper for AS topology graph
+    '''
+    nodes.append(get_json_zookeeper_node(v, name, idx))
+    links.append(get_json_internal_link(isd_as, "zk-%s" % idx))
+    return nodes, links
+
+
+def get_json_as_topology_sciond(s_isd_as, graph, infos):
+    '''
+    Format all sciond AS topology data as a graph.
+    Data comes from the sciond AS, interface and service info of s_isd_as,
+    interface neighbors and link types from the PathGraph.
+    '''
+    nodes = []
+    links = []
+    with phase('json'):
+        return as_topology_sciond_graph(s_isd_as, graph, infos, nodes, links)
+
+
+def as_topology_sciond_graph(s_isd_as, graph, infos, nodes, links):
+    try:
+        logging.info("\n-------- SCIOND: AS Info")
+        t = sciond_result(infos[0])
+        for v in t:
+            logging.debug(v.__dict__)
+            local_isdas = v.p.isdas
+            isd_as = str(ISD_AS(v.p.isdas))
+            nodes.append(get_root_as_node(isd_as, v.p.isCore, v.p.mtu))
+
+        logging.info("\n-------- SCIOND: Interface Info")
+        if_idx = 0
+        i = sciond_result(infos[1])
+        for key, v in i.items():
+            logging.debug('%s: %s' % (key, v.__dict__))
+            addr = v.p.hostInfo.addrs.ipv4
+            port = v.p.hostInfo.port
+            label = '%s-%s' % (ServiceType.BR, if_idx + 1)
+            type = ServiceType.BR
+            ifID = v.p.ifID
+            nodes, links = json_append_router(
+                nodes, links, isd_as, label, type, addr, port, ifID)
+
+            # find neighbor AS and link type from paths and segments
+            if_isd_as = "(%s)" % ifID
+            link_type = "PARENT"
+            neighbor = graph.neighbor(local_isdas, ifID)
+            if neighbor:
+                if_isd_as = "%s (%s)" % (neighbor.node.name, ifID)
+                link_type = neighbor.ltype or link_type
+
+            nodes.append(get_json_interface_node_sciond(if_isd_as))
+            links.append(get_json_interface_link(label, if_isd_as, link_type))
+            if_idx += 1
+
+        logging.info("\n-------- SCIOND: Service Info")
+        v = sciond_result(infos[2])
+        for key in v:
+            logging.debug(v[key].__dict__)
+            sidx = 0
+            for hi in v[key].p.hostInfos:
+                addr = hi.addrs.ipv4
+                port = hi.port
+                label = '%s-%s' % (v[key].p.serviceType, sidx + 1)
+                type = str(v[key].p.serviceType)
+                nodes, links = json_append_server(
+                    nodes, links, isd_as, label, type, addr, port)
+                sidx += 1
+
+    except (SCIONDResponseError) as err:
+        logging.error(error_message(err))
+
+    graph = {}
+    graph["nodes"] = nodes
+    graph["links"] = links
+    logging.debug(graph)
+    return graph
+
+
+def sciond_result(result):
+    '''
+    Returns a result of a gathered sciond request, raising it when it is an
+    error.
+    '''
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def get_json_as_topology(t, topo):
+    '''
+    Format all sciond AS topology data as a graph.
+    Data comes from SCIONDaemon.topology.
+    '''
+    nodes = []
+    links = []
+    isd_as = str(t.isd_as)
+    nodes.append(get_root_as_node(str(t.isd_as), t.is_core_as, t.mtu))
+    for servers in topo:
+        idx = 1
+        for v in topo[servers]:
+            if servers in topo_servers:
+                addr = v.public[0]
+                port = v.public[1]
+                nodes, links = json_append_server(
+                    nodes, links, isd_as, v.name, servers, addr, port)
+            elif servers in topo_br:
+                logging.info(v.interfaces)
+                interface = list(v.interfaces.values())[0]
+                addr = v.int_addrs.public[0]
+                port = v.int_addrs.public[1]
+                link_type = interface.link_type
+                ifID = interface.if_id
+                nodes, links = json_append_router(
+                    nodes, links, isd_as, v.name, servers, addr, port, ifID)
+                nodes.append(get_json_interface_node(interface))
+                links.append(get_json_interface_link(
+                    v.name, interface.isd_as, link_type))
+            elif servers in topo_zk:
+                nodes, links = json_append_zookeeper(
+                    nodes, links, isd_as, v, servers, idx)
+            idx += 1
+    graph = {}
+    graph["nodes"] = nodes
+    graph["links"] = links
+    logging.debug(graph)
+    return graph
+
+
+def get_root_as_node(name, is_core, mtu):
+    '''
+    Get AS Info for json graph
+    '''
+    return {
+        "name": name,
+        "type": "root",
+        "icon": get_service_type_name("ISD-AS"),
+        "group": get_grouping_index("ISD-AS"),
+        "is_core_as": is_core,
+        "mtu": mtu
+    }
+
+
+def get_json_internal_link(src, dst):
+    '''
+    Get AS internal node link for json graph
+    '''
+    return {
+        "source": src,
+        "target": dst,
+        "type": "as-in"
+    }
+
+
+def get_json_zookeeper_node(addr, name, idx):
+    '''
+    Create zookeeper node for graph
+    '''
+    return {
+        "name": "zk-%s" % idx,
+        "type": "server",
+        "icon": get_service_type_name(name),
+        "group": get_grouping_index(name),
+        "addr": addr,
+    }
+
+
+def get_json_server_node(label, name, addr, port):
+    '''
+    Create server node for graph
+    '''
+    return {
+        "name": label,
+        "type": "server",
+        "icon": get_service_type_name(name),
+        "group": get_grouping_index(name),
+        "addr": str(HostAddrIPv4(addr)),
+        "port": port
+    }
+
+
+def get_json_router_node(label, name, addr, port, ifID):
+    '''
+    Create router node for graph
+    '''
+    return {
+        "name": label,
+        "type": "router",
+        "icon": get_service_type_name(name),
+        "group": get_grouping_index(name),
+        "addr": str(HostAddrIPv4(addr)),
+        "port": port,
+        "if_id": ifID,
+    }
+
+
+def get_json_interface(i):
+    '''
+    Create external AS interface node for graph
+    '''
+    addr = i.public[0][0]
+    port = i.public[0][1]
+    to_addr = i.remote[0][0]
+    to_port = i.remote[0][1]
+    return {
+        "if_addr": str(HostAddrIPv4(addr)),
+        "if_bandwidth": i.bandwidth,
+        "if_id": i.if_id,
+        "if_isd_as": str(i.isd_as),
+        "if_link_type": i.link_type,
+        "if_mtu": i.mtu,
+        "if_name": i.name,
+        "if_port": port,
+        "if_to_addr": str(HostAddrIPv4(to_addr)),
+        "if_to_if_id": i.to_if_id,
+        "if_to_port": to_port,
+    }
+
+
+def get_json_interface_link(src, isd_as, link_type):
+    '''
+    Create external AS interface link for graph
+    '''
+    return {
+        "source": src,
+        "target": str(isd_as),
+        "type": "as-%s" % link_type.lower(),
+    }
+
+
+def get_json_interface_node(i):
+    '''
+    Create external AS interface node for graph direct bind
+    '''
+    return {
+        "name": str(i.isd_as),
+        "type": "interface",
+        "icon": get_service_type_name("ISD_AS"),
+        "group": get_grouping_index("ISD-AS"),
+        "public addr": str(HostAddrIPv4(i.public[0])),
+        "public port": i.public[1],
+        "remote addr": str(HostAddrIPv4(i.remote[0])),
+        "remote port": i.remote[1],
+        "link_type": i.link_type,
+        "bandwidth": i.bandwidth,
+        "mtu": i.mtu,
+        "overlay": i.overlay,
+        "to_if_id": i.to_if_id,
+    }
+
+
+def get_json_interface_node_sciond(isd_as):
+    '''
+    Create external AS interface node for graph socket bind
+    '''
+    return {
+        "name": str(isd_as),
+        "type": "interface",
+        "icon": "ISD-AS",
+        "group": get_grouping_index("ISD-AS"),
+    }
+
+
+def get_grouping_index(name):
+    '''
+    Return consistent node type id for graph
+    '''
+    group = {
+        'ISD-AS': 0,
+        'isdas': 0,
+        'BORDER': 1,
+        'br': 1,
+        'BEACON': 2,
+        'bs': 2,
+        'CERTIFICATE': 3,
+        'cs': 3,
+        'PATH': 4,
+        'ps': 4,
+        'SIBRA': 5,
+        'sb': 5,
+        'ZOOKEEPER': 6,
+        'zk': 6,
+    }
+    for type in group:
+        if type in name:
+            return group[type]
+
+
+def get_service_type_name(name):
+    '''
+    Get human readable name for service type
+    '''
+    group = {
+        'isdas': 'ISD-AS',
+        'br': 'BORDER',
+        'bs': 'BEACON',
+        'cs': 'CERTIFICATE',
+        'ps': 'PATH',
+        'sb': 'SIBRA',
+        'zk': 'ZOOKEEPER',
+    }
+    for type in group:
+        if type in name:
+            return group[type]
+    # default
+    return name
+
+
+def get_json_path_interfaces(path):
+    '''
+    Format json data for paths graph
+    '''
+    data = []
+    last_i = None
+    # enumerate path interfaces
+    for interface in path.interfaces:
+        if last_i:
+            p = ISD_AS(interface.isdas)
+            link_p = interface.ifID
+            n = ISD_AS(last_i.isdas)
+            link_n = last_i.ifID
+            data.append({"a": str(p), "b": str(n), "al": link_p,
+                         "bl": link_n, "ltype": "CHILD"})
+            last_i = None
+
+        last_i = interface
+
+    return data
+
+
+def get_json_path_segs(graph):
+    '''
+    Create path segments for graph overlay
+    :param graph: PathGraph of paths and segments.
+    '''
+    data = [{"a": link.a.name, "b": link.b.name, "ltype": link.ltype}
+            for link in graph.links]
+    logging.debug(data)
+    return data
+
+
+def p_segment(s, seg, idx, name, color, rev):
+    '''
+    Add segment to html list
+    '''
+    list_add_head(s, idx, name, color)
+    indent_open(s)
+    list_add(s, "Creation: %s" % iso_timestamp(seg.timestamp))
+    list_add(s, "Expiration: %s" % iso_timestamp(seg.exp_time))
+    list_add(s, "Hops: %i" % (len(seg.hops) / 2))
+    # enumerate path interfaces
+    if rev:
+        hops = reversed(seg.hops)
+    else:
+        hops = seg.hops
+    for hop in hops:
+        list_add(s, "%s (%s)" % (hop.node.name, hop.if_id))
+    indent_close(s)
+
+
+def indent_open(s):
+    '''
+    Open html list
+    '''
+    s.append("<ul>")
+
+
+def indent_close(s):
+    '''
+    Close html list
+    '''
+    s.append("</ul>")
+
+
+def list_add(s, str):
+    '''
+    Add individual data element to html list
+    '''
+    s.append("<li><a href='#'>%s</a>" % str)
+
+
+def list_lazy_add(s, str, file, pointer):
+    '''
+    Add json list element whose children are loaded when opened
+    '''
+    s.append("<li data-json-file='%s' data-json-pointer='%s'>" % (
+        escape(file), escape(pointer)))
+    s.append("<a href='#'>%s</a><ul class='lazy'></ul>" % str)
+
+
+def list_attr_add(s, name, idx):
+    '''
+    Add html path segment data to string
+    '''
+    s.append("<li seg-type='%s' seg-num=%s>" % (name, idx))
+
+
+def list_add_head(s, idx, name, color):
+    '''
+    Add html segment header to string
+    '''
+    list_attr_add(s, name, idx)
+    s.append("<a href='#' >%s " % name)
+    if (name != 'PATH'):
+        s.append("SEGMENT ")
+    s.append("%s</a>" % (idx + 1))
+
+
+def organize_topo(t):
+    '''
+    Filters topology object array into type pairs.
+    :param t: Topology array.
+    '''
+    return {  # current  api
+        'BEACON': t.beacon_servers,
+        'CERTIFICATE': t.certificate_servers,
+        'PATH': t.path_servers,
+        'SIBRA': t.sibra_servers,
+        'BORDER': t.border_routers,
+        'CORE_IF': t.core_interfaces,
+        'PARENT_IF': t.parent_interfaces,
+        'CHILD_IF': t.child_interfaces,
+        'PEER_IF': t.peer_interfaces,
+        'ZOOKEEPER': t.zookeepers,
+    }
@@ -0,0 +1,293 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import random
+import struct
+import threading
+import time
+
+from lib.app.sciond import SCIONDConnectionError, SCIONDResponseError
+from lib.errors import SCIONParseError
+from lib.packet.host_addr import haddr_get_type
+from lib.sciond_api.as_req import SCIONDASInfoRequest
+from lib.sciond_api.if_req import SCIONDIFInfoRequest
+from lib.sciond_api.parse import parse_sciond_msg
+from lib.sciond_api.path_req import SCIONDPathReplyError, SCIONDPathRequest
+from lib.sciond_api.segment_req import SCIONDSegTypeHopRequest
+from lib.sciond_api.service_req import SCIONDServiceInfoRequest
+from lib.socket import ReliableSocket
+from lib.types import AddrType, SCIONDMsgType as SMT
+
+from .metrics import SCIOND_LATENCY
+
+# concurrent sciond requests per AS
+MAX_PER_AS = 4
+# seconds before a sciond request is abandoned
+REQUEST_TIMEOUT = 10
+# seconds AS, interface and service info are reused
+INFO_TTL = 300
+# ReliableSocket message header: cookie, address type, payload length
+HEADER = struct.Struct("!8sBI")
+# lib.app.sciond call names of the replies, labels of SCIOND_LATENCY
+CALLS = {
+    SMT.PATH_REPLY: 'get_paths',
+    SMT.AS_REPLY: 'get_as_info',
+    SMT.IF_REPLY: 'get_if_info',
+    SMT.SERVICE_REPLY: 'get_service_info',
+    SMT.SEGTYPEHOP_REPLY: 'get_segtype_hops',
+}
+
+
+def frame(data):
+    '''
+    Frames a message like ReliableSocket.send does without a destination.
+    '''
+    return HEADER.pack(ReliableSocket.COOKIE, AddrType.NONE, len(data)) + data
+
+
+async def read_frame(reader):
+    '''
+    Reads one ReliableSocket framed message and returns its payload.
+    :param reader: asyncio.StreamReader of the sciond connection.
+    '''
+    try:
+        cookie, addr_type, length = HEADER.unpack(
+            await reader.readexactly(HEADER.size))
+    except asyncio.IncompleteReadError:
+        raise SCIONDResponseError("Received empty response from SCIOND.")
+    if cookie != ReliableSocket.COOKIE:
+        raise SCIONDResponseError("SCIOND socket out of sync.")
+    addr_len = haddr_get_type(addr_type).LEN
+    if addr_len:
+        addr_len += 2  # port
+    try:
+        data = await reader.readexactly(addr_len + length)
+    except asyncio.IncompleteReadError:
+        raise SCIONDResponseError("Truncated response from SCIOND.")
+    return data[addr_len:]
+
+
+def parse_reply(data, req_id, reply_type):
+    '''
+    Parses a sciond reply, checking it answers the request.
+    '''
+    try:
+        reply = parse_sciond_msg(data)
+    except SCIONParseError as err:
+        raise SCIONDResponseError(str(err))
+    if reply.MSG_TYPE != reply_type:
+        raise SCIONDResponseError(
+            "Unexpected SCIOND msg type received: %s" % reply.MSG_TYPE)
+    if reply.id != req_id:
+        raise SCIONDResponseError("Wrong response ID: %s (expected %s)" % (
+            reply.id, req_id))
+    return reply
+
+
+class AsyncSciond(object):
+    '''
+    Asyncio client of the sciond API.
+
+    Requests are built and replies parsed with lib.sciond_api like
+    lib.app.sciond does, but exchanged over non-blocking connections to the
+    sciond unix socket on an event loop running on its own thread. An
+    outstanding request holds no thread while sciond works on it, so the
+    loop multiplexes any number of them. Identical requests in flight share
+    one exchange, at most max_per_as requests per AS are sent at a time, and
+    a request sciond does not answer within timeout seconds is abandoned
+    and its connection closed. AS, interface and service info is reused for
+    INFO_TTL seconds. The socket of each AS comes from the connector pool.
+
+    Coroutines awaiting the get_* methods on the loop can gather any number
+    of requests, sync code hands them to the loop with submit() or run().
+    '''
+
+    def __init__(self, pool, max_per_as=MAX_PER_AS, timeout=REQUEST_TIMEOUT):
+        '''
+        :param pool: SciondConnectorPool knowing the socket of each AS.
+        :param max_per_as: Concurrent sciond requests per AS.
+        :param timeout: Seconds to wait for a sciond reply.
+        '''
+        self._pool = pool
+        self._max_per_as = max_per_as
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._loop = None
+        # only used on the loop thread
+        self._req_id = random.randint(0, 2 ** 32)
+        self._inflight = {}
+        self._limits = {}
+        self._infos = {}
+
+    @property
+    def loop(self):
+        '''
+        The event loop of the client, started on first use.
+        '''
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=self._run_loop, args=(loop,),
+                                     name="sciond-async", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _run_loop(self, loop):
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def get_paths(self, isd_as, dst_ia, src_ia=None, max_paths=5):
+        '''
+        Returns the path reply entries to dst_ia, like
+        lib.app.sciond.get_paths.
+        :param isd_as: ISD_AS of the sciond to ask, must already be pooled.
+        '''
+        reply = await self.request(isd_as, SMT.PATH_REPLY,
+                                   SCIONDPathRequest.from_values, dst_ia,
+                                   src_ia, max_paths=max_paths)
+        if reply.p.errorCode != SCIONDPathReplyError.OK:
+            raise SCIONDResponseError(
+                SCIONDPathReplyError.describe(reply.p.errorCode))
+        return list(reply.iter_entries())
+
+    async def get_as_info(self, isd_as):
+        '''
+        Returns the AS info reply entries, like lib.app.sciond.get_as_info.
+        '''
+        reply = await self._info(isd_as, SMT.AS_REPLY,
+                                 SCIONDASInfoRequest.from_values)
+        return list(reply.iter_entries())
+
+    async def get_if_info(self, isd_as):
+        '''
+        Returns the interface info reply entries of all interfaces keyed by
+        interface ID, like lib.app.sciond.get_if_info.
+        '''
+        reply = await self._info(isd_as, SMT.IF_REPLY,
+                                 SCIONDIFInfoRequest.from_values)
+        return {entry.p.ifID: entry for entry in reply.iter_entries()}
+
+    async def get_service_info(self, isd_as, service_types=None):
+        '''
+        Returns the service info reply entries keyed by service type, like
+        lib.app.sciond.get_service_info.
+        '''
+        if service_types is not None:
+            service_types = tuple(service_types)
+        reply = await self._info(isd_as, SMT.SERVICE_REPLY,
+                                 SCIONDServiceInfoRequest.from_values,
+                                 service_types)
+        return {entry.p.serviceType: entry for entry in reply.iter_entries()}
+
+    async def get_segtype_hops(self, isd_as, seg_type):
+        '''
+        Returns the segment reply entries of a segment type, like
+        lib.app.sciond.get_segtype_hops.
+        '''
+        reply = await self.request(isd_as, SMT.SEGTYPEHOP_REPLY,
+                                   SCIONDSegTypeHopRequest.from_values,
+                                   seg_type)
+        return list(reply.iter_entries())
+
+    async def _info(self, isd_as, reply_type, factory, *args):
+        key = (isd_as, reply_type, args)
+        cached = self._infos.get(key)
+        if cached is not None and time.time() - cached[1] < INFO_TTL:
+            return cached[0]
+        reply = await self.request(isd_as, reply_type, factory, *args)
+        self._infos[key] = (reply, time.time())
+        return reply
+
+    async def request(self, isd_as, reply_type, factory, *args, **kwargs):
+        '''
+        Sends the request factory(request id, *args, **kwargs) to the sciond
+        of an AS and returns its reply, sharing the exchange with identical
+        requests in flight. Must be awaited on the loop of the client.
+        :param isd_as: ISD_AS of the sciond to ask, must already be pooled.
+        :param reply_type: SCIONDMsgType of the expected reply.
+        :param factory: from_values of a lib.sciond_api request class.
+        '''
+        key = (isd_as, factory, args, tuple(sorted(kwargs.items())))
+        call = self._inflight.get(key)
+        if call is None:
+            call = asyncio.ensure_future(self._call(
+                key, isd_as, reply_type, factory, args, kwargs))
+            self._inflight[key] = call
+        # a cancelled waiter must not cancel the shared call
+        return await asyncio.shield(call)
+
+    async def _call(self, key, isd_as, reply_type, factory, args, kwargs):
+        try:
+            limit = self._limits.get(isd_as)
+            if limit is None:
+                limit = self._limits[isd_as] = asyncio.Semaphore(
+                    self._max_per_as)
+            async with limit:
+                with SCIOND_LATENCY.time(CALLS[reply_type]):
+                    return await asyncio.wait_for(self._exchange(
+                        isd_as, reply_type, factory(
+                            self._next_id(), *args, **kwargs)),
+                        self._timeout)
+        except asyncio.TimeoutError:
+            raise SCIONDConnectionError(
+                "sciond for %s did not answer %s within %ss" % (
+                    isd_as, CALLS[reply_type], self._timeout))
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _exchange(self, isd_as, reply_type, request):
+        sock_file = self._pool.sock_file(isd_as)
+        try:
+            reader, writer = await asyncio.open_unix_connection(sock_file)
+        except OSError as err:
+            raise SCIONDConnectionError("%s: %s" % (sock_file, err))
+        try:
+            writer.write(frame(request.pack_full()))
+            await writer.drain()
+            data = await read_frame(reader)
+        except ConnectionError as err:
+            raise SCIONDConnectionError("%s: %s" % (sock_file, err))
+        finally:
+            writer.close()
+        return parse_reply(data, request.id, reply_type)
+
+    def _next_id(self):
+        self._req_id += 1
+        return self._req_id
+
+    def submit(self, coro):
+        '''
+        Schedules a coroutine on the loop, returning a
+        concurrent.futures.Future of its result.
+        '''
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        '''
+        Runs a coroutine on the loop and waits for its result.
+        '''
+        return self.submit(coro).result()
+
+    def close(self):
+        '''
+        Stops the event loop.
+        '''
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
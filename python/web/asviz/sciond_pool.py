@@ -0,0 +1,176 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import socket
+import threading
+
+import lib.app.sciond as lib_sciond
+from lib.app.sciond import SCIONDConnectionError
+
+
+logging = logging.getLogger("asviz")
+
+# seconds to wait for a unix socket connect when checking sciond liveness
+SOCKET_CHECK_TIMEOUT = 0.5
+
+
+def sciond_socket_alive(sock_file, timeout=SOCKET_CHECK_TIMEOUT):
+    '''
+    Tests whether a sciond API socket accepts connections, without sending a
+    request to sciond.
+    :param sock_file: Path to the sciond API unix socket.
+    :param timeout: Seconds to wait for the connection.
+    '''
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        s.connect(sock_file)
+        return True
+    except (OSError, socket.timeout):
+        return False
+    finally:
+        s.close()
+
+
+class PoolEntry(object):
+    '''
+    Pooled connector state for a single ISD-AS.
+    '''
+    __slots__ = ['lock', 'sock_file', 'connector', 'healthy']
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sock_file = None
+        self.connector = None
+        self.healthy = False
+
+
+class SciondConnectorPool(object):
+    '''
+    Thread-safe pool of long-lived sciond connectors keyed by ISD_AS.
+
+    The pool knows the API socket of each AS and whether sciond is
+    listening on it. Connectors are created once per AS for lib.app.sciond
+    callers, the asyncio client only reads sock_file(). Each AS has its own
+    lock guarding (re)initialization and a background thread checks the API
+    sockets.
+    '''
+
+    def __init__(self, check_interval):
+        '''
+        :param check_interval: Seconds between background socket checks.
+        '''
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._check_interval = check_interval
+        self._checker = None
+        self._stop = threading.Event()
+
+    def _entry(self, isd_as):
+        with self._lock:
+            entry = self._entries.get(isd_as)
+            if entry is None:
+                entry = PoolEntry()
+                self._entries[isd_as] = entry
+            return entry
+
+    def get(self, isd_as, sock_file):
+        '''
+        Returns the pooled connector for an AS, creating it when missing, when
+        the socket path changed, or after a failed health check.
+        :param isd_as: ISD_AS key of the source AS.
+        :param sock_file: Path to the sciond API unix socket.
+        '''
+        entry = self._entry(isd_as)
+        with entry.lock:
+            if (entry.connector is None or entry.sock_file != sock_file or
+                    not entry.healthy):
+                self._connect(entry, sock_file)
+        self._start_checker()
+        return entry.connector
+
+    def is_healthy(self, isd_as):
+        '''
+        Returns the last known socket status for an AS connector.
+        :param isd_as: ISD_AS key of the source AS.
+        '''
+        with self._lock:
+            entry = self._entries.get(isd_as)
+        return entry is not None and entry.healthy
+
+    def reconnect(self, isd_as, stale=None):
+        '''
+        Replaces the connector for an AS. When stale is given, the connector
+        is only replaced if no other thread has replaced it already.
+        :param isd_as: ISD_AS key of the source AS.
+        :param stale: Connector which failed, or None to force.
+        '''
+        entry = self._entry(isd_as)
+        with entry.lock:
+            if stale is None or entry.connector is stale:
+                self._connect(entry, entry.sock_file)
+            return entry.connector
+
+    def sock_file(self, isd_as):
+        '''
+        Returns the sciond API socket path of a pooled AS.
+        :param isd_as: ISD_AS key of the source AS.
+        '''
+        with self._lock:
+            entry = self._entries.get(isd_as)
+        if entry is None or entry.sock_file is None:
+            raise SCIONDConnectionError("No sciond socket for %s" % isd_as)
+        return entry.sock_file
+
+    def close(self):
+        '''
+        Stops the health check thread and drops all pooled connectors.
+        '''
+        self._stop.set()
+        with self._lock:
+            self._entries.clear()
+
+    def _connect(self, entry, sock_file):
+        entry.sock_file = sock_file
+        entry.connector = lib_sciond.init(sock_file)
+        entry.healthy = sciond_socket_alive(sock_file)
+        logging.info("sciond connector %s (healthy: %s)" % (
+            entry.connector._api_addr, entry.healthy))
+
+    def _start_checker(self):
+        if self._checker is not None:
+            return
+        with self._lock:
+            if self._checker is None:
+                self._checker = threading.Thread(
+                    target=self._check_loop, name="sciond-pool-check",
+                    daemon=True)
+                self._checker.start()
+
+    def _check_loop(self):
+        while not self._stop.wait(self._check_interval):
+            with self._lock:
+                entries = list(self._entries.items())
+            for isd_as, entry in entries:
+                alive = sciond_socket_alive(entry.sock_file)
+                if alive != entry.healthy:
+                    logging.info("sciond for %s %s" % (
+                        isd_as, "recovered" if alive else "unreachable"))
+                if alive and not entry.healthy:
+                    # sciond came back, start over with a fresh connector
+                    with entry.lock:
+                        self._connect(entry, entry.sock_file)
+                else:
+                    entry.healthy = alive
@@ -0,0 +1,188 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import logging
+import os
+import subprocess
+import threading
+import time
+
+from .sciond_pool import sciond_socket_alive
+
+logging = logging.getLogger("asviz")
+
+# seconds between process and socket checks of supervised sciond instances
+CHECK_INTERVAL = 0.25
+# longest delay in seconds between restarts of a crashing sciond
+MAX_RESTART_DELAY = 30
+
+
+class SupervisedSciond(object):
+    '''
+    State of one sciond instance owned by the supervisor.
+    '''
+    __slots__ = ['isd_as', 'cmd', 'sock_file', 'proc', 'ready', 'restarts',
+                 'next_start', 'probed']
+
+    def __init__(self, isd_as, cmd, sock_file):
+        self.isd_as = isd_as
+        self.cmd = cmd
+        self.sock_file = sock_file
+        self.proc = None
+        self.ready = threading.Event()
+        self.restarts = 0
+        self.next_start = 0
+        # False until ensure() found out whether sciond is already running
+        self.probed = False
+
+
+class SciondSupervisor(object):
+    '''
+    Owns at most one sciond process per ISD-AS.
+
+    Processes are started in the background and declared ready once their
+    API socket accepts connections. Concurrent requests for the same AS share
+    one readiness event instead of each starting their own process, and
+    crashed processes are restarted with an exponential backoff.
+    '''
+
+    def __init__(self, scion_root, check_interval=CHECK_INTERVAL):
+        self._scion_root = scion_root
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._procs = {}
+        self._monitor = None
+        self._stop = threading.Event()
+        atexit.register(self.stop)
+
+    def ensure(self, isd_as, sock_file, conf_dir, addr):
+        '''
+        Makes sure a sciond is serving an AS, starting one when needed, or
+        restarting it when its socket path or address changed. Returns the
+        readiness event of the AS, without waiting for it. The socket of a
+        new AS is probed without holding the supervisor lock, so requests
+        for other ASes are not held up by it.
+        :param isd_as: ISD_AS served by sciond.
+        :param sock_file: Path to the sciond API unix socket.
+        :param conf_dir: Endhost configuration directory of the AS.
+        :param addr: Optional IP address to bind to when not localhost.
+        '''
+        cmd = self._command(sock_file, conf_dir, addr, isd_as)
+        with self._lock:
+            sd = self._procs.get(isd_as)
+            if sd is not None and sd.cmd != cmd:
+                logging.warning("sciond command for %s changed, restarting: "
+                                "%s" % (isd_as, ' '.join(cmd)))
+                self._terminate(sd)
+                sd = None
+            new = sd is None
+            if new:
+                sd = SupervisedSciond(isd_as, cmd, sock_file)
+                self._procs[isd_as] = sd
+            if self._monitor is None:
+                self._monitor = threading.Thread(
+                    target=self._monitor_loop, name="sciond-supervisor",
+                    daemon=True)
+                self._monitor.start()
+        if new:
+            # concurrent requests for the AS share the event meanwhile
+            alive = sciond_socket_alive(sock_file)
+            with self._lock:
+                if alive:
+                    # already served by a sciond we don't own
+                    sd.ready.set()
+                elif (not self._stop.is_set() and
+                        self._procs.get(isd_as) is sd):
+                    self._start(sd)
+                sd.probed = True
+        return sd.ready
+
+    def stop(self):
+        '''
+        Stops monitoring and terminates all sciond processes we started.
+        '''
+        self._stop.set()
+        with self._lock:
+            for sd in self._procs.values():
+                self._terminate(sd)
+
+    def _terminate(self, sd):
+        if sd.proc and sd.proc.poll() is None:
+            sd.proc.terminate()
+
+    def _command(self, sock_file, conf_dir, addr, isd_as):
+        cmd = [os.path.join(self._scion_root, 'python/bin/sciond'),
+               '--api-addr', sock_file, 'sd%s' % isd_as.file_fmt(), conf_dir]
+        if addr and addr != '':
+            cmd += ['--addr', addr]
+        return cmd
+
+    def _start(self, sd):
+        logging.info("Launching sciond: %s" % ' '.join(sd.cmd))
+        sd.ready.clear()
+        try:
+            sd.proc = subprocess.Popen(sd.cmd, cwd=self._scion_root)
+        except OSError as err:
+            logging.error("%s: %s" % (err.__class__.__name__, err))
+            sd.proc = None
+            self._backoff(sd)
+
+    def _backoff(self, sd):
+        delay = min(2 ** sd.restarts, MAX_RESTART_DELAY)
+        sd.restarts += 1
+        sd.next_start = time.time() + delay
+        logging.warning("sciond for %s down, restarting in %ss" % (
+            sd.isd_as, delay))
+
+    def _monitor_loop(self):
+        while not self._stop.wait(self._check_interval):
+            with self._lock:
+                procs = list(self._procs.values())
+            for sd in procs:
+                self._check(sd)
+
+    def _check(self, sd):
+        with self._lock:
+            if self._procs.get(sd.isd_as) is not sd or not sd.probed:
+                return  # replaced by a changed command, or still probed
+        if sd.proc is None and sd.next_start == 0:
+            # externally managed sciond, only track the socket
+            if sciond_socket_alive(sd.sock_file):
+                sd.ready.set()
+            else:
+                sd.ready.clear()
+                self._backoff(sd)
+            return
+        if sd.proc is None or sd.proc.poll() is not None:
+            if sd.proc is not None:
+                logging.error("sciond for %s exited with %s" % (
+                    sd.isd_as, sd.proc.returncode))
+                sd.proc = None
+                sd.ready.clear()
+                self._backoff(sd)
+            if time.time() >= sd.next_start:
+                with self._lock:
+                    if (not self._stop.is_set() and
+                            self._procs.get(sd.isd_as) is sd):
+                        self._start(sd)
+            return
+        alive = sciond_socket_alive(sd.sock_file)
+        if alive and not sd.ready.is_set():
+            logging.info("sciond for %s ready at %s" % (
+                sd.isd_as, sd.sock_file))
+            sd.restarts = 0
+            sd.ready.set()
+        elif not alive and sd.ready.is_set():
+            sd.ready.clear()
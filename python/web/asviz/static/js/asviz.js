@@ -215,10 +215,17 @@ function isCoreInverted(csegs, usegs) {
 
 /*
  * Handle open and close of data tree suggested by stackoverflow.com/a/38765843
- * and stackoverflow.com/a/38765843.
+ * and stackoverflow.com/a/38765843. Optionally limited to trees below root, so
+ * trees loaded later can be setup without binding existing ones twice.
  */
-function setupListTree() {
-    var tree = document.querySelectorAll('ul.tree a:not(:last-child)');
+function setupListTree(root) {
+    var tree;
+    if (root instanceof Element) {
+        tree = root.querySelectorAll('a:not(:last-child)');
+    } else {
+        var sel = (root ? root + ' ' : '') + 'ul.tree a:not(:last-child)';
+        tree = document.querySelectorAll(sel);
+    }
     for (var i = 0; i < tree.length; i++) {
         tree[i].addEventListener('click', function(e) {
             var parent = e.target.parentElement;
@@ -240,6 +247,111 @@ function setupListTree() {
     }
 }
 
+/*
+ * Loads the children of lazy json tree items under root from url the first
+ * time they are opened.
+ */
+function setupLazyTree(root, url, params, onError) {
+    $(root).on('click', 'li[data-json-pointer] > a', function(e) {
+        var li = $(this).parent();
+        var ul = li.children('ul.lazy');
+        if (ul.length == 0) {
+            return;
+        }
+        ul.removeClass('lazy');
+        $.get(url, $.extend({
+            file : li.attr('data-json-file'),
+            pointer : li.attr('data-json-pointer'),
+        }, params)).done(function(html) {
+            ul.html(html);
+            setupListTree(ul[0]);
+        }).fail(function(jqXHR) {
+            ul.addClass('lazy');
+            onError(jqXHR.responseText);
+        });
+    });
+}
+
+/*
+ * Expands an api response in the compact schema back to the full schema,
+ * responses in the full schema are returned unchanged.
+ */
+function decodeCompact(data) {
+    if (data.schema != 'compact') {
+        return data;
+    }
+    var str = data.strings;
+    function interfaces(ifs) {
+        var out = [];
+        for (var i = 0; i < ifs.length; i += 2) {
+            var ia = str[ifs[i]];
+            var sep = ia.indexOf('-');
+            out.push({
+                ISD : ia.substring(0, sep),
+                AS : ia.substring(sep + 1),
+                IFID : ifs[i + 1],
+            });
+        }
+        return out;
+    }
+    function segments(segs) {
+        return {
+            if_lists : segs.map(function(s) {
+                return {
+                    interfaces : interfaces(s[0]),
+                    timestamp : s[1],
+                    expTime : s[2],
+                };
+            })
+        };
+    }
+    if (data.paths) {
+        data.paths = {
+            if_lists : data.paths.map(function(p) {
+                return {
+                    interfaces : interfaces(p)
+                };
+            })
+        };
+    }
+    if (data.segments) {
+        for ( var key in data.segments) {
+            data.segments[key] = segments(data.segments[key]);
+        }
+    }
+    if (data.path_topo) {
+        data.path_topo = data.path_topo.map(function(l) {
+            return {
+                a : str[l[0]],
+                b : str[l[1]],
+                ltype : str[l[2]],
+            };
+        });
+    }
+    if (data.as_topo) {
+        data.as_topo = {
+            nodes : data.as_topo.nodes.map(function(n) {
+                var node = $.extend({}, n[4]);
+                node.name = str[n[0]];
+                node.type = str[n[1]];
+                node.icon = str[n[2]];
+                node.group = n[3];
+                return node;
+            }),
+            links : data.as_topo.links.map(function(l) {
+                return {
+                    source : str[l[0]],
+                    target : str[l[1]],
+                    type : str[l[2]],
+                };
+            }),
+        };
+    }
+    delete data.schema;
+    delete data.strings;
+    return data;
+}
+
 /*
  * Translates incoming AS topology data to D3-compatible json.
  */
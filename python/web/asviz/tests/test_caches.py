@@ -0,0 +1,159 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from lib.types import PathSegmentType as PST
+
+from asviz.caches import FileCache, SegmentCache, SingleFlight
+
+
+class Seg(object):
+    '''
+    Segment with the expTime SegmentCache reads.
+    '''
+
+    def __init__(self, exp_time):
+        self.p = self
+        self.expTime = exp_time
+
+
+class TestSegmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SegmentCache(max_entries=16, max_age=60)
+        self.segs = [Seg(time.time() + 3600)]
+
+    def test_up_segments_shared_by_destinations(self):
+        self.cache.put('1-11', PST.UP, self.segs, dst='1-12')
+        self.assertIs(self.cache.get('1-11', PST.UP, dst='2-21'), self.segs)
+
+    def test_core_and_down_segments_refetched_for_new_destination(self):
+        for seg_type in [PST.CORE, PST.DOWN]:
+            self.cache.put('1-11', seg_type, self.segs, dst='1-12')
+            self.assertIs(self.cache.get('1-11', seg_type, dst='1-12'),
+                          self.segs)
+            self.assertIsNone(self.cache.get('1-11', seg_type, dst='2-21'))
+
+    def test_destinations_accumulate(self):
+        self.cache.put('1-11', PST.CORE, self.segs, dst='1-12')
+        segs = [Seg(time.time() + 3600)]
+        self.cache.put('1-11', PST.CORE, segs, dst='2-21')
+        self.assertIs(self.cache.get('1-11', PST.CORE, dst='1-12'), segs)
+        self.assertIs(self.cache.get('1-11', PST.CORE, dst='2-21'), segs)
+
+    def test_expired_segments_dropped(self):
+        self.cache.put('1-11', PST.UP, [Seg(time.time() - 1)], dst='1-12')
+        self.assertIsNone(self.cache.get('1-11', PST.UP, dst='1-12'))
+
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = FileCache(max_entries=16)
+        self.builds = 0
+
+    def build(self, invalidate=False):
+        self.builds += 1
+        if invalidate:
+            self.cache.invalidate()
+        return self.builds
+
+    def test_value_cached_while_files_unchanged(self):
+        self.assertEqual(self.cache.get('k', [__file__], self.build), 1)
+        self.assertEqual(self.cache.get('k', [__file__], self.build), 1)
+
+    def test_invalidate_during_build_not_lost(self):
+        self.assertEqual(
+            self.cache.get('k', [__file__], self.build, True), 1)
+        self.assertEqual(self.cache.get('k', [__file__], self.build), 2)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def work(self, result):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def run_callers(self, result, count=8):
+        '''
+        Runs count concurrent callers of one key while the first call is
+        held in flight. Returns the results or exceptions of the callers.
+        '''
+        outcomes = []
+        lock = threading.Lock()
+
+        def caller():
+            try:
+                outcome = self.flight.do('k', self.work, result)
+            except Exception as err:
+                outcome = err
+            with lock:
+                outcomes.append(outcome)
+        threads = [threading.Thread(target=caller) for _ in range(count)]
+        threads[0].start()
+        self.assertTrue(self.started.wait(5))
+        for thread in threads[1:]:
+            thread.start()
+        # let the followers reach the in flight call before it finishes
+        time.sleep(0.2)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_result_shared(self):
+        result = object()
+        outcomes = self.run_callers(result)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(outcomes), 8)
+        self.assertTrue(all(o is result for o in outcomes))
+
+    def test_exception_shared(self):
+        err = ValueError("boom")
+        outcomes = self.run_callers(err)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(outcomes), 8)
+        self.assertTrue(all(o is err for o in outcomes))
+
+    def test_key_released(self):
+        self.run_callers(1)
+        self.assertEqual(self.flight._calls, {})
+        self.assertEqual(self.flight.do('k', self.work, 2), 2)
+        self.assertEqual(self.calls, 2)
+        self.run_callers(ValueError("boom"), count=1)
+        self.assertEqual(self.flight._calls, {})
+        self.assertEqual(self.flight.do('k', self.work, 3), 3)
+
+    def test_keys_independent(self):
+        self.release.set()
+        self.assertEqual(self.flight.do('a', self.work, 1), 1)
+        self.assertEqual(self.flight.do('b', self.work, 2), 2)
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from asviz.cert_index import CertIndex, chain_record, trc_record
+
+
+def trc(as_dir, isd, version, expires):
+    return trc_record('%s/ISD%s-V%s.trc' % (as_dir, isd, version), {
+        'ISD': isd, 'Version': version, 'CreationTime': 0,
+        'ExpirationTime': expires})
+
+
+def chain(isd_as, version, expires):
+    return chain_record('ISD-AS-V%s.crt' % version, {'0': {
+        'Subject': isd_as, 'Version': version, 'IssuingTime': 0,
+        'ExpirationTime': expires}})
+
+
+class TestCertIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CertIndex([
+            trc('AS110', 1, 0, 100), trc('AS111', 1, 0, 100),
+            trc('AS110', 1, 1, 300), trc('AS111', 1, 1, 300),
+            chain('1-ff00:0:110', 0, 50), chain('1-ff00:0:111', 0, 200),
+        ])
+
+    def test_trc_copies_indexed_once(self):
+        trcs = self.index.query(kind='trc')
+        self.assertEqual([(r.isd, r.version) for r in trcs],
+                         [('1', 0), ('1', 1)])
+        self.assertTrue(all(r.path.startswith('AS110/') for r in trcs))
+
+    def test_expires_before_includes_expired(self):
+        records = self.index.query(expires_before=150)
+        self.assertEqual([r.expires for r in records], [50, 100])
+
+    def test_expires_after_excludes_expired(self):
+        records = self.index.query(expires_before=250, expires_after=60)
+        self.assertEqual([r.expires for r in records], [100, 200])
+
+    def test_latest(self):
+        records = self.index.query(kind='trc', latest=True)
+        self.assertEqual([r.version for r in records], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from asviz.config_client import ConfigClient, ConfigError
+
+CONFIG = b'{"labels_url": "https://example.org/labels.json"}'
+ETAG = '"v1"'
+
+
+class ConfigHandler(BaseHTTPRequestHandler):
+    '''
+    Stand-in config service answering POSTs with the config of its server,
+    304 when the ETag matches and 500 while the server is failing.
+    '''
+
+    def do_POST(self):
+        self.server.requests.append(dict(self.headers))
+        if self.server.failing:
+            self.send_response(500)
+            self.end_headers()
+        elif self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', str(len(CONFIG)))
+            self.end_headers()
+            self.wfile.write(CONFIG)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConfigClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), ConfigHandler)
+        self.server.requests = []
+        self.server.failing = False
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%s/getconfig' % self.server.server_port
+        self.tmp = tempfile.mkdtemp()
+        self.fallback = os.path.join(self.tmp, 'cache', 'config-cache.json')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp)
+
+    def client(self, ttl=300, retry_interval=30):
+        return ConfigClient(self.url, ttl, self.fallback,
+                            retry_interval=retry_interval)
+
+    def test_fetches_and_saves_fallback(self):
+        client = self.client()
+        self.assertEqual(client.get(), CONFIG)
+        self.assertEqual(client.get(), CONFIG)
+        self.assertEqual(len(self.server.requests), 1)
+        with open(self.fallback, 'rb') as fin:
+            self.assertEqual(fin.read(), CONFIG)
+
+    def test_fallback_private(self):
+        umask = os.umask(0o022)
+        try:
+            # a stale tmp file readable by others must not leak its mode
+            os.makedirs(os.path.dirname(self.fallback))
+            os.chmod(os.path.dirname(self.fallback), 0o755)
+            with open(self.fallback + '.tmp', 'wb'):
+                pass
+            self.client().get()
+            self.assertEqual(stat.S_IMODE(os.stat(self.fallback).st_mode),
+                             0o600)
+            shutil.rmtree(os.path.dirname(self.fallback))
+            self.client().get()
+        finally:
+            os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(self.fallback).st_mode), 0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(
+            os.path.dirname(self.fallback)).st_mode), 0o700)
+
+    def test_revalidates_with_etag(self):
+        client = self.client(ttl=0)
+        self.assertEqual(client.get(), CONFIG)
+        self.assertEqual(client.get(), CONFIG)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[1].get('If-None-Match'), ETAG)
+
+    def test_error_serves_fallback_file(self):
+        self.client().get()
+        self.server.failing = True
+        self.assertEqual(self.client().get(), CONFIG)
+
+    def test_error_without_fallback(self):
+        self.server.failing = True
+        with self.assertRaises(ConfigError):
+            self.client().get()
+
+    def test_error_retried_after_interval(self):
+        client = self.client(ttl=0, retry_interval=0.2)
+        client.get()
+        self.server.failing = True
+        self.assertEqual(client.get(), CONFIG)
+        self.assertEqual(client.get(), CONFIG)
+        self.assertEqual(len(self.server.requests), 2)
+        time.sleep(0.3)
+        self.server.failing = False
+        self.assertEqual(client.get(), CONFIG)
+        self.assertEqual(len(self.server.requests), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from asviz.feed_proxy import FeedError, FeedProxy, url_has_prefix
+
+FEED = b'{"ISD": {"1": "Europe"}}'
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    '''
+    Stand-in feed server: /feed answers the feed, /big a body of unknown
+    length and /moved and /away redirect inside and outside of /feed.
+    '''
+
+    def do_GET(self):
+        if self.path in ['/moved', '/away']:
+            self.send_response(302)
+            self.send_header('Location', '/feed' if self.path == '/moved'
+                             else 'http://evil.example/feed')
+            self.end_headers()
+        elif self.path == '/big':
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'x' * 200000)
+        else:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(FEED)))
+            self.end_headers()
+            self.wfile.write(FEED)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestUrlHasPrefix(unittest.TestCase):
+
+    def test_matches_scheme_host_and_path(self):
+        prefix = 'https://good.example/feeds'
+        self.assertTrue(url_has_prefix('https://good.example/feeds', prefix))
+        self.assertTrue(url_has_prefix('https://GOOD.example/feeds/a.xml',
+                                       prefix))
+        for url in ['https://good.example.evil.net/feeds',
+                    'https://good.example@evil.net/feeds',
+                    'http://good.example/feeds',
+                    'https://good.example/feedsx',
+                    'https://good.example:8443/feeds']:
+            self.assertFalse(url_has_prefix(url, prefix), url)
+
+
+class TestFeedProxy(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FeedHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.base = 'http://127.0.0.1:%s' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def proxy(self, cache_size=1024):
+        return FeedProxy(lambda url: url_has_prefix(url, self.base),
+                         ttl=60, max_size=100000, cache_size=cache_size,
+                         max_entries=4)
+
+    def test_redirect_followed_to_allowed_url(self):
+        self.assertEqual(self.proxy().get(self.base + '/moved').body, FEED)
+
+    def test_redirect_to_url_not_allowed_refused(self):
+        with self.assertRaises(FeedError) as ctx:
+            self.proxy().get(self.base + '/away')
+        self.assertEqual(ctx.exception.status, 502)
+
+    def test_oversize_stream_aborted(self):
+        entry = self.proxy().get(self.base + '/big')
+        with self.assertRaises(FeedError):
+            b''.join(entry.stream)
+
+    def test_oversize_body_not_cached(self):
+        proxy = self.proxy(cache_size=150000)
+        with self.assertRaises(FeedError) as ctx:
+            proxy.get(self.base + '/big')
+        self.assertEqual(ctx.exception.status, 502)
+        self.assertEqual(len(proxy._entries), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from asviz.geolocation import GeolocationCache
+
+
+class Resolver(object):
+    '''
+    Resolver answering the location of the addresses in 10.0.0.0/8, or of
+    every address when it locates the server.
+    '''
+
+    def __init__(self, per_client):
+        self.per_client = per_client
+        self.calls = []
+
+    def resolve(self, ip, api_key=None):
+        self.calls.append(ip)
+        if not self.per_client:
+            return {'server': True}
+        return {'ip': ip} if ip.startswith('10.') else None
+
+
+class TestGeolocationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Resolver(per_client=True)
+        self.server = Resolver(per_client=False)
+        self.cache = GeolocationCache([self.client, self.server], ttl=60,
+                                      subnet_v4=24, subnet_v6=56,
+                                      max_entries=8)
+
+    def test_client_locations_shared_per_subnet(self):
+        self.assertEqual(self.cache.get('10.0.0.1'), {'ip': '10.0.0.1'})
+        self.assertEqual(self.cache.get('10.0.0.2'), {'ip': '10.0.0.1'})
+        self.assertEqual(self.client.calls, ['10.0.0.1'])
+
+    def test_server_location_cached_once_for_all_clients(self):
+        for ip in ['192.0.2.1', '198.51.100.1', '2001:db8::1']:
+            self.assertEqual(self.cache.get(ip), {'server': True})
+        self.assertEqual(self.server.calls, ['192.0.2.1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,263 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from lib.packet.scion_addr import ISD_AS
+
+from asviz import render
+from asviz.graph import ASNode, EdgeIndex, LINK_PRIORITY, PathGraph, edge_key
+
+A = ISD_AS('1-11').int()
+B = ISD_AS('1-12').int()
+C = ISD_AS('2-21').int()
+D = ISD_AS('2-22').int()
+
+
+class Obj(object):
+    '''
+    Attribute bag standing in for lib.sciond_api reply entries.
+    '''
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def interfaces(hops):
+    return [Obj(isdas=isdas, ifID=if_id) for isdas, if_id in hops]
+
+
+def path(*hops):
+    '''
+    Path reply entry through (raw ISD-AS, ifID) hops.
+    '''
+    return Obj(p=Obj(
+        path=Obj(interfaces=interfaces(hops), mtu=1472),
+        hostInfo=Obj(addrs=Obj(ipv4='127.0.0.1'), port=30041)))
+
+
+def segment(*hops):
+    '''
+    Segment reply entry through (raw ISD-AS, ifID) hops, starting at the
+    originating core AS.
+    '''
+    return Obj(p=Obj(interfaces=interfaces(hops), timestamp=1, expTime=2))
+
+
+def legacy_hops(interfaces):
+    return [{
+        "ISD": ISD_AS(interface.isdas).isd_str(),
+        "AS": ISD_AS(interface.isdas).as_str(),
+        "IFID": interface.ifID,
+    } for interface in interfaces]
+
+
+def legacy_paths(paths):
+    '''
+    get_json_paths as it was before the PathGraph.
+    '''
+    return {"if_lists": [{"interfaces": legacy_hops(path.p.path.interfaces)}
+                         for path in paths]}
+
+
+def legacy_segments(csegs, usegs, dsegs):
+    '''
+    get_json_all_segments as it was before the PathGraph.
+    '''
+    def segments(segs):
+        return {"if_lists": [{
+            "interfaces": legacy_hops(seg.p.interfaces),
+            "timestamp": seg.p.timestamp,
+            "expTime": seg.p.expTime,
+        } for seg in segs]}
+    return {
+        "core_segments": segments(csegs),
+        "up_segments": segments(usegs),
+        "down_segments": segments(dsegs),
+    }
+
+
+def legacy_path_topo(paths, csegs, usegs, dsegs):
+    '''
+    get_json_path_segs as it was before the PathGraph, which emitted every
+    segment hop and only deduplicated the links of paths.
+    '''
+    data = []
+    links = []
+    for segs, ltype in [(csegs, "CORE"), (usegs, "PARENT"),
+                        (dsegs, "PARENT")]:
+        for seg in segs:
+            ifs = seg.p.interfaces
+            for x in range(1, len(ifs)):
+                data.append({"a": str(ISD_AS(ifs[x - 1].isdas)),
+                             "b": str(ISD_AS(ifs[x].isdas)), "ltype": ltype})
+                link = "%s,%s" % (ifs[x - 1].isdas, ifs[x].isdas)
+                if link not in links:
+                    links.append(link)
+    ltype = "PEER" if csegs or usegs or dsegs else "CHILD"
+    for path in paths:
+        ifs = path.p.path.interfaces
+        for x in range(1, len(ifs)):
+            link = "%s,%s" % (ifs[x - 1].isdas, ifs[x].isdas)
+            link_r = "%s,%s" % (ifs[x].isdas, ifs[x - 1].isdas)
+            if link not in links and link_r not in links:
+                links.append(link)
+                data.append({"a": str(ISD_AS(ifs[x - 1].isdas)),
+                             "b": str(ISD_AS(ifs[x].isdas)), "ltype": ltype})
+    return data
+
+
+class TestGoldenOutputs(unittest.TestCase):
+    '''
+    Outputs rendered from the PathGraph match the builders it replaced.
+    '''
+
+    def setUp(self):
+        # A and C are core ASes, B a child of A and D a child of C, B and D
+        # also peer
+        self.csegs = [segment((A, 1), (C, 2))]
+        self.usegs = [segment((A, 3), (B, 4))]
+        self.dsegs = [segment((C, 5), (D, 6))]
+        self.paths = [
+            path((B, 4), (A, 3), (A, 1), (C, 2), (C, 5), (D, 6)),
+            path((B, 7), (D, 8)),
+        ]
+
+    def test_paths(self):
+        graph = PathGraph(self.paths, self.csegs, self.usegs, self.dsegs)
+        self.assertEqual(render.get_json_paths(graph),
+                         legacy_paths(self.paths))
+
+    def test_segments(self):
+        graph = PathGraph(self.paths, self.csegs, self.usegs, self.dsegs)
+        self.assertEqual(render.get_json_all_segments(graph),
+                         legacy_segments(self.csegs, self.usegs, self.dsegs))
+
+    def test_path_topo(self):
+        graph = PathGraph(self.paths, self.csegs, self.usegs, self.dsegs)
+        self.assertEqual(
+            render.get_json_path_segs(graph),
+            legacy_path_topo(self.paths, self.csegs, self.usegs, self.dsegs))
+
+    def test_path_topo_without_segments(self):
+        graph = PathGraph(self.paths, [], [], [])
+        self.assertEqual(render.get_json_path_segs(graph),
+                         legacy_path_topo(self.paths, [], [], []))
+
+    def test_path_topo_repeated_segment_links_once(self):
+        # the old builder emitted a link again for every segment crossing it
+        usegs = self.usegs + [segment((A, 3), (B, 4))]
+        graph = PathGraph(self.paths, self.csegs, usegs, self.dsegs)
+        legacy = legacy_path_topo(self.paths, self.csegs, usegs, self.dsegs)
+        self.assertEqual(legacy[2], legacy[1])
+        del legacy[2]
+        self.assertEqual(render.get_json_path_segs(graph), legacy)
+
+
+class TestEdgeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.a, self.b, self.c = ASNode(A), ASNode(B), ASNode(C)
+        self.links = EdgeIndex()
+
+    def test_edge_key_undirected(self):
+        self.assertEqual(edge_key(self.a, self.b), edge_key(self.b, self.a))
+        self.assertNotEqual(edge_key(self.a, self.b),
+                            edge_key(self.a, self.c))
+
+    def test_reversed_duplicate_deduped(self):
+        self.assertTrue(self.links.add(self.a, self.b, 'PEER'))
+        self.assertFalse(self.links.add(self.b, self.a, 'PEER'))
+        self.assertEqual(len(self.links), 1)
+        self.assertIn((self.b, self.a), self.links)
+        self.assertNotIn((self.a, self.c), self.links)
+
+    def test_priority(self):
+        self.assertGreater(LINK_PRIORITY['CORE'], LINK_PRIORITY['PARENT'])
+        self.assertGreater(LINK_PRIORITY['PARENT'], LINK_PRIORITY['PEER'])
+        self.assertEqual(LINK_PRIORITY['PEER'], LINK_PRIORITY['CHILD'])
+
+    def test_higher_priority_type_wins(self):
+        self.links.add(self.a, self.b, 'PEER')
+        self.links.add(self.b, self.a, 'PARENT')
+        self.links.add(self.a, self.b, 'CORE')
+        self.links.add(self.a, self.b, 'PARENT')
+        self.links.add(self.a, self.b, 'CHILD')
+        self.assertEqual([link.ltype for link in self.links], ['CORE'])
+
+    def test_parent_beats_peer_and_child(self):
+        for ltype in ['PEER', 'CHILD']:
+            links = EdgeIndex()
+            links.add(self.a, self.b, 'PARENT')
+            links.add(self.a, self.b, ltype)
+            links.add(self.a, self.c, ltype)
+            links.add(self.c, self.a, 'PARENT')
+            self.assertEqual([link.ltype for link in links],
+                             ['PARENT', 'PARENT'])
+
+    def test_first_seen_order_and_direction_kept(self):
+        self.links.add(self.c, self.b, 'PEER')
+        self.links.add(self.a, self.b, 'PARENT')
+        self.links.add(self.b, self.c, 'CORE')
+        self.links.add(self.a, self.c, 'CHILD')
+        self.assertEqual(
+            [(link.a.isdas, link.b.isdas, link.ltype) for link in self.links],
+            [(C, B, 'CORE'), (A, B, 'PARENT'), (A, C, 'CHILD')])
+
+
+class TestNeighbors(unittest.TestCase):
+
+    def neighbor(self, graph, isdas, if_id):
+        n = graph.neighbor(isdas, if_id)
+        return n and (n.node.isdas, n.ltype)
+
+    def test_segment_direction(self):
+        # A is the core AS, B its child
+        for segs in [([segment((A, 1), (B, 2))], []),
+                     ([], [segment((A, 1), (B, 2))])]:
+            graph = PathGraph([], [], *segs)
+            self.assertEqual(self.neighbor(graph, A, 1), (B, 'CHILD'))
+            self.assertEqual(self.neighbor(graph, B, 2), (A, 'PARENT'))
+
+    def test_core_segment(self):
+        graph = PathGraph([], [segment((A, 1), (C, 2))], [], [])
+        self.assertEqual(self.neighbor(graph, A, 1), (C, 'CORE'))
+        self.assertEqual(self.neighbor(graph, C, 2), (A, 'CORE'))
+
+    def test_as_internal_hops_skipped(self):
+        graph = PathGraph([], [], [segment(
+            (A, 1), (B, 2), (B, 3), (D, 4))], [])
+        self.assertEqual(self.neighbor(graph, B, 2), (A, 'PARENT'))
+        self.assertEqual(self.neighbor(graph, B, 3), (D, 'CHILD'))
+        self.assertEqual(self.neighbor(graph, D, 4), (B, 'PARENT'))
+
+    def test_path_only_neighbors(self):
+        graph = PathGraph([path((B, 2), (A, 1), (A, 5), (C, 6))], [], [], [])
+        self.assertEqual(self.neighbor(graph, B, 2), (A, None))
+        self.assertEqual(self.neighbor(graph, A, 1), (B, None))
+        self.assertEqual(self.neighbor(graph, A, 5), (C, None))
+        self.assertEqual(self.neighbor(graph, C, 6), (A, None))
+        self.assertIsNone(graph.neighbor(A, 7))
+
+    def test_paths_do_not_overwrite_segments(self):
+        graph = PathGraph(
+            [path((B, 2), (A, 1), (A, 5), (C, 6))], [],
+            [segment((A, 1), (B, 2))], [])
+        self.assertEqual(self.neighbor(graph, A, 1), (B, 'CHILD'))
+        self.assertEqual(self.neighbor(graph, B, 2), (A, 'PARENT'))
+        self.assertEqual(self.neighbor(graph, A, 5), (C, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import zlib
+from unittest import mock
+
+from asviz import http_cache
+from asviz.http_cache import (
+    accepted_encoding,
+    compress_chunks,
+    etag_matches,
+    input_etag,
+)
+
+
+class TestEtagMatches(unittest.TestCase):
+
+    def test_weak_and_strong_compare_weakly(self):
+        self.assertTrue(etag_matches('W/"abc"', 'W/"abc"'))
+        self.assertTrue(etag_matches('"abc"', 'W/"abc"'))
+        self.assertFalse(etag_matches('W/"abd"', 'W/"abc"'))
+
+    def test_any_of_a_list(self):
+        self.assertTrue(etag_matches('"x", W/"abc" ,"y"', 'W/"abc"'))
+        self.assertFalse(etag_matches('"x", "y"', 'W/"abc"'))
+
+    def test_star(self):
+        self.assertTrue(etag_matches(' * ', 'W/"abc"'))
+
+    def test_empty(self):
+        self.assertFalse(etag_matches('', 'W/"abc"'))
+
+
+class TestAcceptedEncoding(unittest.TestCase):
+
+    def test_preference(self):
+        with mock.patch.object(http_cache, 'ENCODINGS', ['br', 'gzip']):
+            self.assertEqual(accepted_encoding('gzip, deflate, br'), 'br')
+            self.assertEqual(accepted_encoding('gzip;q=0.5, br;q=0.1'), 'br')
+            self.assertEqual(accepted_encoding('gzip'), 'gzip')
+            self.assertEqual(accepted_encoding('*'), 'br')
+
+    def test_q_zero_refuses(self):
+        with mock.patch.object(http_cache, 'ENCODINGS', ['br', 'gzip']):
+            self.assertEqual(accepted_encoding('br;q=0, gzip'), 'gzip')
+            self.assertEqual(accepted_encoding('*, br;q=0'), 'gzip')
+            self.assertIsNone(accepted_encoding('gzip;q=0, br;q=0'))
+            self.assertIsNone(accepted_encoding('gzip;q=x'))
+
+    def test_identity(self):
+        self.assertIsNone(accepted_encoding(''))
+        self.assertIsNone(accepted_encoding('identity, deflate'))
+
+
+class TestCompressChunks(unittest.TestCase):
+
+    def test_gzip_chunks_decode_as_they_arrive(self):
+        chunks = ['{"a": 1', ', "b": ', b'[1, 2]}']
+        z = zlib.decompressobj(wbits=31)
+        out = compress_chunks(iter(chunks), 'gzip')
+        for chunk in chunks:
+            decoded = z.decompress(next(out))
+            self.assertEqual(decoded, chunk.encode('utf-8')
+                             if isinstance(chunk, str) else chunk)
+        z.decompress(b''.join(out))
+        self.assertTrue(z.eof)
+
+    @unittest.skipIf(http_cache.brotli is None, "brotli not installed")
+    def test_brotli_chunks_decode_as_they_arrive(self):
+        brotli = http_cache.brotli
+        chunks = [b'{"a": 1', b', "b": [1, 2]}']
+        d = brotli.Decompressor()
+        out = compress_chunks(iter(chunks), 'br')
+        for chunk in chunks:
+            self.assertEqual(d.process(next(out)), chunk)
+        d.process(b''.join(out))
+        self.assertTrue(d.is_finished())
+
+
+class TestInputEtag(unittest.TestCase):
+
+    def test_inputs_identify_content(self):
+        self.assertEqual(input_etag('a', (1, '')), input_etag('a', (1, '')))
+        self.assertNotEqual(input_etag('a', (1, '')), input_etag('a', (2, '')))
+        self.assertTrue(input_etag('a').startswith('W/"'))
+
+
+if __name__ == '__main__':
+    unittest.main()
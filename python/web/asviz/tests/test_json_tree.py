@@ -0,0 +1,113 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from asviz.views import json_pointer_escape, resolve_json_pointer, step_json
+
+CERT = {
+    "Subject": "1-11",
+    "Keys": {"Signing/Key": "k1", "Enc~Key": "k2"},
+    "Chain": [
+        {"Issuer": "1-12", "Signature": {"Algorithm": "ed25519"}},
+        {"Issuer": "1-13", "Signature": {}},
+    ],
+    "Extensions": [],
+}
+
+
+class TestResolveJsonPointer(unittest.TestCase):
+
+    def test_root_and_members(self):
+        self.assertIs(resolve_json_pointer(CERT, ''), CERT)
+        self.assertEqual(resolve_json_pointer(CERT, '/Chain/1/Issuer'),
+                         '1-13')
+
+    def test_unescaping(self):
+        self.assertEqual(resolve_json_pointer(CERT, '/Keys/Signing~1Key'),
+                         'k1')
+        self.assertEqual(resolve_json_pointer(CERT, '/Keys/Enc~0Key'), 'k2')
+        # ~01 is an escaped ~ followed by 1, not an escaped /
+        self.assertEqual(resolve_json_pointer({'~1': 1, '/': 2}, '/~01'), 1)
+
+    def test_escape_round_trip(self):
+        for key in ['Signing/Key', 'Enc~Key', '~1', 3]:
+            pointer = '/' + json_pointer_escape(key)
+            d = {str(key): key}
+            self.assertEqual(resolve_json_pointer(d, pointer), key)
+
+    def test_index_out_of_range(self):
+        with self.assertRaises(LookupError):
+            resolve_json_pointer(CERT, '/Chain/2')
+
+    def test_non_numeric_index(self):
+        for token in ['first', '-', '-1', '01', '']:
+            with self.assertRaises(ValueError):
+                resolve_json_pointer(CERT, '/Chain/%s' % token)
+
+    def test_missing_member(self):
+        with self.assertRaises(LookupError):
+            resolve_json_pointer(CERT, '/Keys/Other')
+
+    def test_step_into_value(self):
+        with self.assertRaises(LookupError):
+            resolve_json_pointer(CERT, '/Subject/0')
+
+    def test_malformed(self):
+        with self.assertRaises(ValueError):
+            resolve_json_pointer(CERT, 'Subject')
+
+
+class TestStepJsonDepth(unittest.TestCase):
+
+    def lazy_pointers(self, s):
+        return [line.split("data-json-pointer='")[1].split("'")[0]
+                for line in s if 'data-json-pointer' in line]
+
+    def test_cut_off_at_depth(self):
+        s = []
+        step_json(s, CERT, 2, 'a.crt')
+        # objects and arrays two levels down load lazily
+        self.assertEqual(self.lazy_pointers(s), ['/Chain/0', '/Chain/1'])
+        self.assertIn("data-json-file='a.crt'", ''.join(s))
+        self.assertIn('k1', ''.join(s))
+        self.assertNotIn('1-13', ''.join(s))
+        self.assertEqual(s.count('<ul>'), s.count('</ul>'))
+
+    def test_empty_inline(self):
+        s = []
+        step_json(s, CERT, 1, 'a.crt')
+        self.assertEqual(self.lazy_pointers(s), ['/Keys', '/Chain'])
+        self.assertIn("<li><a href='#'><b>Extensions</b></a>", s)
+
+    def test_subtree_pointers(self):
+        s = []
+        step_json(s, CERT['Chain'], 1, 'a.crt', '/Chain')
+        self.assertEqual(self.lazy_pointers(s), ['/Chain/0', '/Chain/1'])
+
+    def test_escaped_pointers(self):
+        s = []
+        step_json(s, {'a/b': {'c': {'d': 1}}}, 1, 'a.crt')
+        self.assertEqual(self.lazy_pointers(s), ['/a~1b'])
+
+    def test_without_file_all_expanded(self):
+        s = []
+        step_json(s, CERT, 1)
+        self.assertEqual(self.lazy_pointers(s), [])
+        self.assertIn('ed25519', ''.join(s))
+        self.assertEqual(s.count('<ul>'), s.count('</ul>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
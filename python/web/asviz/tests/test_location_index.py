@@ -0,0 +1,87 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from asviz.location_index import LocationIndex
+
+NODES = b'''<?xml version="1.0" encoding="UTF-8"?>
+<nodes>
+ <node ia="1-ff00:0:110" host="GB" lat="54.0" long="-2.0" />
+ <node ia="1-ff00:0:120" host="CH 0" lat="47.0" long="8.0" />
+ <node ia="1-ff00:0:120" host="CH 1" lat="47.1" long="8.1" />
+ <node ia="2-ff00:0:210" host="FJ" lat="-18.0" long="178.0" />
+ <node ia="2-ff00:0:211" host="WS" lat="-13.8" long="-172.0" />
+ <node ia="2-ff00:0:212" host="NZ" lat="-41.0" long="174.0" />
+ <node ia="3-ff00:0:310" host="bad" lat="north" long="1.0" />
+ <node ia="3-ff00:0:311" host="missing" lat="1.0" />
+</nodes>
+'''
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestLocationIndex(unittest.TestCase):
+
+    def setUp(self):
+        # small chunks split elements across feeds of the parser
+        self.index = LocationIndex(chunks(NODES, 16))
+
+    def hosts(self, locs):
+        return sorted(loc.host for loc in locs)
+
+    def test_invalid_nodes_skipped(self):
+        self.assertEqual(self.index.count, 6)
+
+    def test_by_ia(self):
+        locs = self.index.by_ia(['2-ff00:0:210', '1-ff00:0:120', '9-9'])
+        self.assertEqual([loc.host for loc in locs], ['FJ', 'CH 0', 'CH 1'])
+        self.assertEqual(self.index.by_ia([]), [])
+        self.assertEqual(locs[0].to_json(), {
+            "ia": "2-ff00:0:210", "host": "FJ", "lat": -18.0, "lng": 178.0})
+
+    def test_bbox(self):
+        self.assertEqual(self.hosts(self.index.in_bbox(40, -10, 60, 10)),
+                         ['CH 0', 'CH 1', 'GB'])
+        self.assertEqual(self.hosts(self.index.in_bbox(47.05, -5, 60, 10)),
+                         ['CH 1', 'GB'])
+        self.assertEqual(self.index.in_bbox(0, 0, 10, 10), [])
+
+    def test_bbox_edges_inclusive(self):
+        self.assertEqual(self.hosts(self.index.in_bbox(47.0, 8.0, 47.0, 8.0)),
+                         ['CH 0'])
+
+    def test_bbox_whole_world(self):
+        self.assertEqual(len(self.index.in_bbox(-90, -180, 90, 180)), 6)
+
+    def test_bbox_across_antimeridian(self):
+        self.assertEqual(self.hosts(self.index.in_bbox(-45, 170, -10, -170)),
+                         ['FJ', 'NZ', 'WS'])
+        self.assertEqual(self.hosts(self.index.in_bbox(-45, 176, -10, -175)),
+                         ['FJ'])
+        self.assertEqual(self.hosts(self.index.in_bbox(-45, 175, 60, -175)),
+                         ['FJ'])
+
+    def test_cell_size(self):
+        index = LocationIndex([NODES], cell=0.5)
+        self.assertEqual(self.hosts(index.in_bbox(40, -10, 60, 10)),
+                         ['CH 0', 'CH 1', 'GB'])
+        self.assertEqual(self.hosts(index.in_bbox(-45, 170, -10, -170)),
+                         ['FJ', 'NZ', 'WS'])
+
+
+if __name__ == '__main__':
+    unittest.main()
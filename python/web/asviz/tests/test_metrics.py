@@ -0,0 +1,87 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from asviz.metrics import Registry
+
+
+class TestExposition(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+        self.latency = self.registry.histogram(
+            'test_seconds', 'Test latency.', ['view'], [0.1, 1.0])
+        self.errors = self.registry.counter(
+            'test_errors_total', 'Test errors.', ['type'])
+
+    def lines(self):
+        text = self.registry.expose()
+        self.assertTrue(text.endswith('\n'))
+        return text.splitlines()
+
+    def test_histogram(self):
+        for value in [0.05, 0.1, 0.5, 2.0]:
+            self.latency.observe(value, 'index')
+        lines = self.lines()
+        self.assertEqual(lines[:8], [
+            '# HELP test_seconds Test latency.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="index",le="0.1"} 2',
+            'test_seconds_bucket{view="index",le="1.0"} 3',
+            'test_seconds_bucket{view="index",le="+Inf"} 4',
+            'test_seconds_sum{view="index"} 2.65',
+            'test_seconds_count{view="index"} 4',
+            '# HELP test_errors_total Test errors.',
+        ])
+        self.assertEqual(self.latency.count('index'), 4)
+
+    def test_histogram_label_values_sorted(self):
+        self.latency.observe(5, 'paths')
+        self.latency.observe(0.01, 'index')
+        buckets = [line for line in self.lines() if '_bucket' in line]
+        self.assertEqual(buckets, [
+            'test_seconds_bucket{view="index",le="0.1"} 1',
+            'test_seconds_bucket{view="index",le="1.0"} 1',
+            'test_seconds_bucket{view="index",le="+Inf"} 1',
+            'test_seconds_bucket{view="paths",le="0.1"} 0',
+            'test_seconds_bucket{view="paths",le="1.0"} 0',
+            'test_seconds_bucket{view="paths",le="+Inf"} 1',
+        ])
+
+    def test_counter_and_label_escaping(self):
+        self.errors.inc('KeyError')
+        self.errors.inc('a"b\\c\nd', amount=2)
+        self.assertEqual(self.lines()[-4:], [
+            '# HELP test_errors_total Test errors.',
+            '# TYPE test_errors_total counter',
+            'test_errors_total{type="KeyError"} 1',
+            'test_errors_total{type="a\\"b\\\\c\\nd"} 2',
+        ])
+
+    def test_no_labels(self):
+        histogram = self.registry.histogram('bare_seconds', 'Bare.',
+                                            buckets=[1])
+        histogram.observe(0.5)
+        self.assertEqual(self.lines()[-5:], [
+            '# TYPE bare_seconds histogram',
+            'bare_seconds_bucket{le="1.0"} 1',
+            'bare_seconds_bucket{le="+Inf"} 1',
+            'bare_seconds_sum 0.5',
+            'bare_seconds_count 1',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
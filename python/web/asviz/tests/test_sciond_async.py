@@ -0,0 +1,144 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from lib.app.sciond import SCIONDConnectionError, SCIONDResponseError
+from lib.packet.scion_addr import ISD_AS
+from lib.sciond_api.as_req import SCIONDASInfoReply, SCIONDASInfoReplyEntry
+from lib.sciond_api.parse import parse_sciond_msg
+from lib.sciond_api.path_req import SCIONDPathReply, SCIONDPathReplyError
+from lib.socket import ReliableSocket
+from lib.types import SCIONDMsgType as SMT
+
+from asviz.sciond_async import AsyncSciond
+
+SRC = ISD_AS('1-11')
+
+
+class StandInSciond(object):
+    '''
+    Stand-in sciond on a unix socket, answering AS info requests after a
+    delay and path requests with no paths. Requests are counted by type.
+    '''
+
+    def __init__(self, sock_file, delay):
+        self.delay = delay
+        self.requests = []
+        self._sock = ReliableSocket(bind_unix=(sock_file, "sciond"))
+        self._sock.listen()
+        thread = threading.Thread(target=self._serve)
+        thread.daemon = True
+        thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn = self._sock.accept(block=True)
+            except OSError:
+                return
+            thread = threading.Thread(target=self._handle, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def _handle(self, conn):
+        try:
+            data, _ = conn.recv()
+            request = parse_sciond_msg(data)
+            self.requests.append(request.MSG_TYPE)
+            time.sleep(self.delay)
+            if request.MSG_TYPE == SMT.AS_REQUEST:
+                reply = SCIONDASInfoReply.from_values(request.id, [
+                    SCIONDASInfoReplyEntry.from_values(SRC, True, 1472)])
+            else:
+                reply = SCIONDPathReply.from_values(
+                    request.id, [], error=SCIONDPathReplyError.NO_PATHS)
+            conn.send(reply.pack_full())
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self._sock.close()
+
+
+class Pool(object):
+
+    def __init__(self, sock_file):
+        self._sock_file = sock_file
+
+    def sock_file(self, isd_as):
+        return self._sock_file
+
+
+class TestAsyncSciond(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.sock_file = os.path.join(self.tmp, 'sd.sock')
+
+    def tearDown(self):
+        self.client.close()
+        self.sciond.close()
+        shutil.rmtree(self.tmp)
+
+    def start(self, delay=0.0, timeout=5):
+        self.sciond = StandInSciond(self.sock_file, delay)
+        self.client = AsyncSciond(Pool(self.sock_file), timeout=timeout)
+
+    def test_as_info_reused(self):
+        self.start()
+        for _ in range(2):
+            infos = self.client.run(self.client.get_as_info(SRC))
+            self.assertEqual([i.p.isdas for i in infos], [SRC.int()])
+        self.assertEqual(self.sciond.requests, [SMT.AS_REQUEST])
+
+    def test_concurrent_requests_without_threads(self):
+        self.start(delay=0.3)
+        dsts = [ISD_AS('2-%s' % i) for i in range(20)]
+        threads = threading.active_count()
+
+        async def gather():
+            return await asyncio.gather(
+                *[self.client.get_paths(SRC, dst) for dst in dsts],
+                return_exceptions=True)
+        start = time.time()
+        results = self.client.run(gather())
+        self.assertLess(time.time() - start, 0.3 * len(dsts) / 2)
+        self.assertTrue(all(isinstance(r, SCIONDResponseError)
+                            for r in results))
+        # only the stand-in sciond added threads, one per connection
+        self.assertLessEqual(threading.active_count() - threads, 1)
+
+    def test_timeout(self):
+        self.start(delay=1, timeout=0.1)
+        with self.assertRaises(SCIONDConnectionError):
+            self.client.run(self.client.get_as_info(SRC))
+
+    def test_socket_missing(self):
+        self.start()
+        os.remove(self.sock_file)
+        with self.assertRaises(SCIONDConnectionError):
+            self.client.run(self.client.get_as_info(SRC))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from lib.packet.scion_addr import ISD_AS
+
+from asviz import sciond_supervisor
+from asviz.sciond_supervisor import SciondSupervisor
+
+
+class TestEnsure(unittest.TestCase):
+
+    def setUp(self):
+        self.supervisor = SciondSupervisor('/scion', check_interval=10)
+        self.release = threading.Event()
+        self.probes = []
+
+    def tearDown(self):
+        self.release.set()
+        self.supervisor.stop()
+
+    def socket_alive(self, sock_file):
+        # the socket of the slow AS takes until release to answer
+        self.probes.append(sock_file)
+        if sock_file == 'slow.sock':
+            self.release.wait(5)
+        return True
+
+    def ensure(self, ia, sock_file, results):
+        results.append(self.supervisor.ensure(ISD_AS(ia), sock_file, 'conf',
+                                              None))
+
+    def test_probe_outside_lock(self):
+        slow = []
+        with mock.patch.object(sciond_supervisor, 'sciond_socket_alive',
+                               self.socket_alive):
+            thread = threading.Thread(target=self.ensure,
+                                      args=('1-11', 'slow.sock', slow))
+            thread.start()
+            while 'slow.sock' not in self.probes:
+                time.sleep(0.01)
+            # other ASes and repeated requests for the slow AS don't wait
+            start = time.time()
+            ready = []
+            self.ensure('1-12', 'fast.sock', ready)
+            self.ensure('1-11', 'slow.sock', ready)
+            self.assertLess(time.time() - start, 1)
+            self.assertTrue(ready[0].is_set())
+            self.assertFalse(ready[1].is_set())
+            self.release.set()
+            thread.join(5)
+        self.assertIs(slow[0], ready[1])
+        self.assertTrue(slow[0].is_set())
+        self.assertEqual(self.probes.count('slow.sock'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
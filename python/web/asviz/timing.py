@@ -0,0 +1,207 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+from django.http import HttpResponse
+
+from as_viewer.settings import PROFILE_REQUESTS
+
+logging = logging.getLogger("asviz")
+
+# phase names and descriptions of the Server-Timing header, in order
+PHASES = [
+    ('sciond', 'sciond connect/probe'),
+    ('paths', 'path fetch'),
+    ('segments', 'segment fetch'),
+    ('asinfo', 'AS info fetch'),
+    ('json', 'JSON graph build'),
+    ('html', 'HTML tree build'),
+    ('render', 'template render'),
+    ('stream', 'streamed content'),
+]
+# functions listed in profile summaries
+PROFILE_LINES = 40
+
+_local = threading.local()
+
+
+class RequestTimer(object):
+    '''
+    Wall clock intervals spent in the phases of one request. Intervals of a
+    phase may overlap, e.g. concurrent sciond requests, and are merged so a
+    phase reports the time during which any of its work was running.
+    '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def record(self, name, start, end):
+        with self._lock:
+            self._spans.setdefault(name, []).append((start, end))
+
+    def phase(self, name):
+        '''
+        Returns a context manager recording its block as a phase.
+        '''
+        return Phase(self, name)
+
+    async def timed(self, name, coro):
+        '''
+        Awaits a coroutine, recording it as a phase.
+        '''
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def duration(self, name):
+        '''
+        Returns the seconds covered by the intervals of a phase.
+        '''
+        with self._lock:
+            spans = sorted(self._spans.get(name, []))
+        total = 0.0
+        cur_start = cur_end = None
+        for start, end in spans:
+            if cur_end is None or start > cur_end:
+                if cur_end is not None:
+                    total += cur_end - cur_start
+                cur_start, cur_end = start, end
+            else:
+                cur_end = max(cur_end, end)
+        if cur_end is not None:
+            total += cur_end - cur_start
+        return total
+
+    def header(self):
+        '''
+        Returns the Server-Timing header value of the recorded phases and
+        the total time so far, in milliseconds.
+        '''
+        with self._lock:
+            names = set(self._spans)
+        metrics = ['%s;desc="%s";dur=%.1f' % (
+            name, desc, self.duration(name) * 1000)
+            for name, desc in PHASES if name in names]
+        metrics.append('total;dur=%.1f' % (
+            (time.perf_counter() - self.start) * 1000))
+        return ', '.join(metrics)
+
+
+class Phase(object):
+    __slots__ = ['timer', 'name', 'start']
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, self.start, time.perf_counter())
+
+
+def current_timer():
+    '''
+    Returns the timer of the request handled by this thread, or a timer
+    nobody reads outside of requests.
+    '''
+    timer = getattr(_local, 'timer', None)
+    return timer if timer is not None else RequestTimer()
+
+
+def phase(name):
+    '''
+    Returns a context manager recording its block as a phase of the current
+    request.
+    '''
+    return current_timer().phase(name)
+
+
+def profile_summary(profile):
+    '''
+    Returns the functions of a profile with the most cumulative time.
+    '''
+    out = io.StringIO()
+    stats = pstats.Stats(profile, stream=out)
+    stats.sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return out.getvalue()
+
+
+class TimingMiddleware(object):
+    '''
+    Adds a Server-Timing header with the phases of each request.
+
+    Headers are sent before the content of streamed responses is produced
+    and WSGI has no trailers, so their header only covers the phases run by
+    the view, the content (e.g. the html tree of api_html) is missing from
+    it. Generating that content is timed as the stream phase and the
+    complete timing is logged once the content has been sent. With
+    profile=1 and PROFILE_REQUESTS set, the request is run under cProfile
+    and the response content is replaced by the profile summary. Only the
+    request thread is profiled, sciond calls show as waits.
+    '''
+
+    def process_request(self, request):
+        _local.timer = RequestTimer()
+        _local.profile = None
+        if PROFILE_REQUESTS and request.GET.get('profile') == '1':
+            _local.profile = cProfile.Profile()
+            _local.profile.enable()
+
+    def process_response(self, request, response):
+        timer = getattr(_local, 'timer', None)
+        profile = getattr(_local, 'profile', None)
+        _local.timer = _local.profile = None
+        if profile is not None:
+            if response.streaming:
+                # generate the content within the profile
+                for chunk in response.streaming_content:
+                    pass
+            profile.disable()
+            return self._profile_response(response, profile, timer)
+        if timer is not None:
+            response['Server-Timing'] = timer.header()
+            if response.streaming:
+                response.streaming_content = self._timed_stream(
+                    request.path, response.streaming_content, timer)
+        return response
+
+    def _timed_stream(self, path, content, timer):
+        start = time.perf_counter()
+        for chunk in content:
+            yield chunk
+        timer.record('stream', start, time.perf_counter())
+        logging.info("Server-Timing of streamed %s: %s" % (
+            path, timer.header()))
+
+    def _profile_response(self, response, profile, timer):
+        summary = HttpResponse(
+            profile_summary(profile),
+            status=200 if response.status_code == 304 else
+            response.status_code,
+            content_type="text/plain; charset=utf-8")
+        summary['Server-Timing'] = timer.header()
+        summary['Cache-Control'] = 'no-store'
+        return summary
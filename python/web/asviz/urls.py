@@ -19,4 +19,11 @@ from . import views
 
 urlpatterns = [
     url(r'^$', views.index, name='index'),
+    url(r'^api/paths/$', views.api_paths, name='api_paths'),
+    url(r'^api/segments/$', views.api_segments, name='api_segments'),
+    url(r'^api/astopo/$', views.api_astopo, name='api_astopo'),
+    url(r'^api/certs/$', views.api_certs, name='api_certs'),
+    url(r'^api/certs/index/$', views.api_cert_index, name='api_cert_index'),
+    url(r'^api/html/$', views.api_html, name='api_html'),
+    url(r'^api/json/$', views.api_json, name='api_json'),
 ]
@@ -12,21 +12,56 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import glob
 import json
 import logging
 import os
 import re
-import subprocess
+import threading
 import time
-import urllib.request
-import requests
 from datetime import datetime
+from functools import lru_cache
+from html import escape
+from xml.etree.ElementTree import ParseError
 import pathlib
-from django.http import HttpResponse
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
 
-import lib.app.sciond as lib_sciond
-from as_viewer.settings import SCION_ROOT, BASE_DIR
+from as_viewer.settings import (
+    BASE_DIR,
+    CERT_INDEX_CACHE_SIZE,
+    CONFIG_FALLBACK_FILE,
+    CONFIG_TTL,
+    CONFIG_URL,
+    FEED_ALLOWED_URLS,
+    FEED_CACHE_ENTRIES,
+    FEED_CACHE_SIZE,
+    FEED_MAX_SIZE,
+    FEED_TTL,
+    FILE_CACHE_SIZE,
+    GEN_WATCH_INTERVAL,
+    GEOLOCATION_CACHE_SIZE,
+    GEOLOCATION_CIDR_FILE,
+    GEOLOCATION_RESOLVERS,
+    GEOLOCATION_SUBNET_V4,
+    GEOLOCATION_SUBNET_V6,
+    GEOLOCATION_TTL,
+    SCION_ROOT,
+    SCIOND_HEALTH_CHECK_INTERVAL,
+    SCIOND_MAX_PER_AS,
+    SCIOND_READY_WAIT,
+    SCIOND_REQUEST_TIMEOUT,
+    PATH_CACHE_FRESH,
+    PATH_CACHE_MAX_STALE,
+    PATH_CACHE_SIZE,
+    SEGMENT_CACHE_MAX_AGE,
+    SEGMENT_CACHE_SIZE,
+)
 from lib.app.sciond import (
     get_default_sciond_path,
     SCIONDConnectionError,
@@ -38,730 +73,729 @@ from lib.defines import (
     TOPO_FILE,
 )
 from lib.errors import SCIONBaseError
-from lib.packet.host_addr import HostAddrIPv4
 from lib.packet.scion_addr import ISD_AS
 from lib.topology import Topology
 from lib.types import (
     PathSegmentType as PST,
     ServiceType,
 )
-from lib.util import iso_timestamp
 
-# topology class definitions
-topo_servers = ['BEACON', 'CERTIFICATE', 'PATH', 'SIBRA']
-topo_br = ['CORE_BR', 'PARENT_BR', 'CHILD_BR', 'PEER_BR', 'BORDER']
-topo_if = ['CORE_IF', 'PARENT_IF', 'CHILD_IF', 'PEER_IF']
-topo_zk = ['ZOOKEEPER']
+from .caches import (
+    FileCache,
+    PathCache,
+    SegmentCache,
+    SingleFlight,
+    file_stamp,
+)
+from .cert_index import CertIndex, chain_record, trc_record
+from .config_client import ConfigClient, ConfigError
+from .feed_proxy import FeedError, FeedProxy, url_has_prefix
+from .geolocation import CidrResolver, GeolocationCache, GoogleResolver
+from .graph import PathGraph
+from .http_cache import (
+    accepted_encoding,
+    compress,
+    compress_chunks,
+    COMPRESS_MIN_SIZE,
+    content_etag,
+    etag_matches,
+    input_etag,
+)
+from .json_stream import (
+    StringTable,
+    compact_links,
+    compact_paths,
+    compact_response,
+    compact_segments,
+    iter_json,
+)
+from .location_index import LocationIndex
+from .metrics import REGISTRY, cache_lookup, error_message
+from .render import (
+    get_as_view_html,
+    get_json_all_segments,
+    get_json_as_topology,
+    get_json_as_topology_sciond,
+    get_json_path_segs,
+    get_json_paths,
+    html_lines,
+    indent_close,
+    indent_open,
+    iter_as_view_html,
+    list_add,
+    list_lazy_add,
+    organize_topo,
+)
+from .sciond_async import AsyncSciond
+from .sciond_pool import SciondConnectorPool
+from .sciond_supervisor import SciondSupervisor
+from .timing import current_timer, phase
+from .watcher import DirectoryWatcher
+
+# page tabs, each loading its own data
+TABS = ['tab-pathtopo', 'tab-astopo', 'tab-trc', 'tab-crt']
+# params identifying identical index page loads
+INDEX_KEY = ['src', 'dst', 'mp', 'data', 'addr', 'tab']
+# levels of TRC and certificate json rendered before loading lazily
+JSON_TREE_DEPTH = 2
+# seconds clients are asked to wait while sciond is starting
+SCIOND_RETRY_AFTER = 2
+CAMEL_CASE = re.compile("([a-z])([A-Z])")
 
 logging = logging.getLogger("asviz")
 
-connector = {}
+sciond_pool = SciondConnectorPool(check_interval=SCIOND_HEALTH_CHECK_INTERVAL)
+sciond_supervisor = SciondSupervisor(SCION_ROOT)
+sciond_async = AsyncSciond(sciond_pool, SCIOND_MAX_PER_AS,
+                           SCIOND_REQUEST_TIMEOUT)
+segment_cache = SegmentCache(SEGMENT_CACHE_SIZE, SEGMENT_CACHE_MAX_AGE)
+path_cache = PathCache(PATH_CACHE_SIZE, PATH_CACHE_FRESH, PATH_CACHE_MAX_STALE)
+request_flight = SingleFlight()
+file_cache = FileCache(FILE_CACHE_SIZE)
+cert_index_cache = FileCache(CERT_INDEX_CACHE_SIZE, 'certindex')
+config_client = ConfigClient(CONFIG_URL, CONFIG_TTL, CONFIG_FALLBACK_FILE)
+geo_resolvers = {
+    'cidr': CidrResolver(GEOLOCATION_CIDR_FILE),
+    'google': GoogleResolver(),
+}
+geo_cache = GeolocationCache(
+    [geo_resolvers[name] for name in GEOLOCATION_RESOLVERS], GEOLOCATION_TTL,
+    GEOLOCATION_SUBNET_V4, GEOLOCATION_SUBNET_V6, GEOLOCATION_CACHE_SIZE)
+
+
+def invalidate_gen_caches():
+    '''
+    Drops everything read from gen/ after a change.
+    '''
+    file_cache.invalidate()
+    cert_index_cache.invalidate()
+
+
+gen_watcher = DirectoryWatcher(os.path.join(SCION_ROOT, GEN_PATH),
+                               GEN_WATCH_INTERVAL, invalidate_gen_caches)
+
+
+def load_sciond_as_info(s_isd_as):
+    '''
+    Requests the AS, interface and service info of the AS topology graph
+    from sciond.
+    '''
+    srvs = [ServiceType.BS, ServiceType.PS, ServiceType.CS]
+    with phase('asinfo'):
+        return sciond_async.run(get_sciond_as_info(s_isd_as, srvs))
+
+
+def sciond_info_version(infos):
+    '''
+    Returns the fields of gathered AS, interface and service info which the
+    AS topology graph is built from, or the errors of failed requests.
+    '''
+    def fields(result, entry_fields):
+        if isinstance(result, Exception):
+            return (result.__class__.__name__, str(result))
+        entries = result.values() if isinstance(result, dict) else result
+        return [entry_fields(v.p) for v in entries]
+
+    def host_fields(host_info):
+        return (host_info.addrs.ipv4, host_info.port)
+    as_info, if_info, svc_info = infos
+    return (
+        fields(as_info, lambda p: (p.isdas, p.isCore, p.mtu)),
+        fields(if_info, lambda p: (p.ifID, host_fields(p.hostInfo))),
+        fields(svc_info, lambda p: (
+            p.serviceType, [host_fields(h) for h in p.hostInfos])))
+
+
+async def get_sciond_as_info(s_isd_as, srvs):
+    '''
+    Requests AS, interface and service info from sciond concurrently.
+    Failed requests return their error.
+    '''
+    return await asyncio.gather(
+        sciond_async.get_as_info(s_isd_as),
+        sciond_async.get_if_info(s_isd_as),
+        sciond_async.get_service_info(s_isd_as, srvs),
+        return_exceptions=True)
+
+
+def html_jsonfile(paths):
+    '''
+    Parses json data into html nested lists.
+    :param paths: Paths to json files.
+    '''
+    return ''.join(iter_jsonfile_html(paths))
+
+
+def iter_jsonfile_html(paths):
+    '''
+    Yields the nested html lists of json files one file at a time, for
+    streaming responses.
+    :param paths: Paths to json files.
+    '''
+    yield "<ul class='tree'>\n"
+    for path in paths:
+        yield file_cache.get(('html', path), [path], jsonfile_html, path)
+    yield "</ul>\n"
 
 
-def get_as_view_html(paths, csegs, usegs, dsegs):
+def jsonfile_html(path):
     '''
-    Formats paths and segments into nested html.
+    Parses a single json file into a nested html list item.
+    :param path: Path to the json file.
     '''
     s = []
-    s.append("<ul class='tree'>")
-    html_paths(s, paths)
-    html_all_segments(s, csegs, usegs, dsegs)
+    list_add(s, "<b>%s</b>" % os.path.basename(path))
+    indent_open(s)
+    step_json(s, load_json_file(path), JSON_TREE_DEPTH,
+              os.path.basename(path))
     indent_close(s)
+    return html_lines(s)
+
 
-    out_str = ''
-    for str in s:
-        out_str += (str + '\n')
-    return out_str
+def load_json_file(path):
+    '''
+    Returns the parsed content of a json file, cached until it changes.
+    :param path: Path to the json file.
+    '''
+    return file_cache.get(('json', path), [path], read_json_file, path)
+
+
+def read_json_file(path):
+    logging.info(path)
+    with open(path, 'r') as fin:
+        return json.load(fin)
 
 
-def html_paths(s, paths):
+@lru_cache(maxsize=1024)
+def camel_2_title(label):
     '''
-    Formats multiple paths to nested html
-    :param paths:
+    Convert key name camel case into title case, memoized since the same
+    keys repeat across certificates.
+    :param label: Camel-cased label.
     '''
-    i = 0
-    # enumerate all paths
-    for path in paths:
-        list_add_head(s, i, "PATH", "black")
-        indent_open(s)
-        list_add(s, "MTU: %s" % path.p.path.mtu)
-        list_add(s, "IPV4: %s" % HostAddrIPv4(path.p.hostInfo.addrs.ipv4))
-        list_add(s, "Port: %s" % path.p.hostInfo.port)
-        list_add(s, "Hops: %i" % (len(path.p.path.interfaces) / 2))
-        # enumerate path interfaces
-        for interface in path.p.path.interfaces:
-            isd_as = ISD_AS(interface.isdas)
-            link = interface.ifID
-            list_add(s, "%s (%s)" % (str(isd_as), link))
-        i += 1
-        indent_close(s)
+    return CAMEL_CASE.sub(r"\g<1> \g<2>", label)
 
 
-def html_all_segments(s, csegs, usegs, dsegs):
+def json_items(d):
     '''
-    Formats all segments into nested html.
+    Returns the (key, value) items of a json object or array.
     '''
-    # enumerate segments
-    html_segment(csegs, s, "CORE", "red", True)
-    html_segment(dsegs, s, "DOWN", "blue")
-    html_segment(usegs, s, "UP", "green", True)
+    if isinstance(d, dict):
+        return iter(d.items())
+    return enumerate(d)
 
 
-def html_segment(segs, s, name, color, rev=False):
+def json_pointer_escape(key):
     '''
-    Formats a single segment to nested html
+    Escapes an object key or array index as a JSON pointer token.
     '''
-    segidx = 0
-    for seg in segs:
-        p_segment(s, seg, segidx, name, color, rev)
-        segidx += 1
+    return str(key).replace('~', '~0').replace('/', '~1')
 
 
-def get_json_segments(segs):
+def resolve_json_pointer(d, pointer):
+    '''
+    Returns the value of a JSON pointer in json data. Raises ValueError for
+    a malformed pointer or array index, and LookupError when the pointer
+    names a missing member, an index out of range or a step into a value
+    which is not an object or array.
+    :param d: Json data.
+    :param pointer: JSON pointer, e.g. /Signatures/1-11.
     '''
-    Formats segments to json.
+    if pointer == '':
+        return d
+    if not pointer.startswith('/'):
+        raise ValueError("Invalid JSON pointer: %s" % pointer)
+    for token in pointer.split('/')[1:]:
+        token = token.replace('~1', '/').replace('~0', '~')
+        if isinstance(d, list):
+            if not token.isdigit() or (token != '0' and token[0] == '0'):
+                raise ValueError("Invalid array index: %s" % token)
+            d = d[int(token)]
+        elif isinstance(d, dict):
+            d = d[token]
+        else:
+            raise LookupError("Not an object or array at %s" % token)
+    return d
+
+
+def step_json(s, d, max_depth=None, file=None, pointer=''):
     '''
-    cores = []
-    for seg in segs:
-        core = []
-        for interface in seg.p.interfaces:
-            core.append({
-                "ISD": ISD_AS(interface.isdas).isd_str(),
-                "AS": ISD_AS(interface.isdas).as_str(),
-                "IFID": interface.ifID,
-            })
-        cores.append({
-            "interfaces": core,
-            "timestamp": seg.p.timestamp,
-            "expTime": seg.p.expTime,
-        })
-    path = {}
-    path["if_lists"] = cores
-    return path
+    Append html list items of json objects and arrays, iterating with an
+    explicit stack. When a file is given, objects and arrays nested
+    max_depth levels deep are added as lazy items whose subtree is loaded
+    from api_json when opened.
+    :param s: Current html output lines.
+    :param d: Current json input.
+    :param max_depth: Levels expanded inline, None for all.
+    :param file: Name of the cert file the json was loaded from.
+    :param pointer: JSON pointer of d within the file.
+    '''
+    lazy = file is not None and max_depth is not None
+    stack = [(json_items(d), pointer)]
+    while stack:
+        items, parent = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            if stack:
+                indent_close(s)
+            continue
+        k, v = item
+        label = camel_2_title(str(k))
+        if isinstance(v, (dict, list)):
+            child = '%s/%s' % (parent, json_pointer_escape(k))
+            if lazy and v and len(stack) >= max_depth:
+                list_lazy_add(s, "<b>%s</b>" % label, file, child)
+            else:
+                list_add(s, "<b>%s</b>" % label)
+                indent_open(s)
+                stack.append((json_items(v), child))
+        elif isinstance(v, (str, int, float)) or v is None:
+            # parse time into readable format
+            if isinstance(v, int) and "Time" in label:
+                v = datetime.utcfromtimestamp(v).strftime(
+                    "%Y-%m-%d %H:%M:%S.%f UTC")
+            list_add(s, "<b>%s</b>: %s" % (label, v))
+        else:
+            logging.error(
+                "!!!!! Value %s not recognized for key %s." % (v, k))
 
 
-def get_json_all_segments(csegs, usegs, dsegs):
+def set_param(request, name, default):
     '''
-    Format all segments to json.
+    Generic handler for validating incoming url parameters.
+    :param request: HTML request object containing url parameters.
+    :param name: Parameter name.
+    :param default: Default value of parameter.
     '''
-    data = {}
-    data["core_segments"] = get_json_segments(csegs)
-    data["up_segments"] = get_json_segments(usegs)
-    data["down_segments"] = get_json_segments(dsegs)
-    logging.debug(data)
-    return data
+    value = request.GET.get(name)
+    logging.info("%s = %s" % (name, value))
+    if not value or value == '':
+        value = default
+    return value
 
 
-def get_json_paths(paths):
+async def get_segments(s_isd_as, seg_type, d_isd_as):
     '''
-    Formats all paths to json for path graph.
+    Requests segments of one type from sciond and caches them until the
+    earliest segment expiration.
     '''
-    cores = []
-    logging.info("\n-------- SCIOND: Paths")
-    for path in paths:
-        logging.debug(path.__dict__)
-        core = []
-        for interface in path.p.path.interfaces:
-            core.append({
-                "ISD": ISD_AS(interface.isdas).isd_str(),
-                "AS": ISD_AS(interface.isdas).as_str(),
-                "IFID": interface.ifID,
-            })
-        cores.append({
-            "interfaces": core,
-        })
-    path = {}
-    path["if_lists"] = cores
-    logging.debug(path)
-    return path
+    segs = await sciond_async.get_segtype_hops(s_isd_as, seg_type)
+    segment_cache.put(s_isd_as, seg_type, segs, dst=d_isd_as)
+    return segs
 
 
-def json_append_server(nodes, links, isd_as, label, type, addr, port):
+async def fetch_paths(s_isd_as, d_isd_as, max_paths):
     '''
-    Creates json format server data for AS topology graph
+    Requests paths from sciond and stores them in the path cache.
     '''
-    nodes.append(get_json_server_node(label, type, addr, port))
-    links.append(get_json_internal_link(isd_as, label))
-    return nodes, links
+    paths = await sciond_async.get_paths(
+        s_isd_as, d_isd_as, max_paths=max_paths)
+    path_cache.put((s_isd_as, d_isd_as, max_paths), paths)
+    return paths
 
 
-def json_append_router(nodes, links, isd_as, label, type, addr, port, ifID):
+def refresh_paths(s_isd_as, d_isd_as, max_paths):
     '''
-    Create json formatted router data for AS topology graph
+    Revalidates cached paths in the background, at most once per key at a
+    time. This also lets sciond refresh old segments for the next call.
     '''
-    nodes.append(get_json_router_node(label, type, addr, port, ifID))
-    links.append(get_json_internal_link(isd_as, label))
-    return nodes, links
+    key = (s_isd_as, d_isd_as, max_paths)
+    if not path_cache.start_refresh(key):
+        return
+
+    def release(future):
+        path_cache.end_refresh(key)
+    future = submit_background(fetch_paths(s_isd_as, d_isd_as, max_paths))
+    future.add_done_callback(release)
 
 
-def json_append_zookeeper(nodes, links, isd_as, v, name, idx):
+async def get_sciond_paths_segs(s_isd_as, d_isd_as, max_paths, timer):
     '''
-    Create json formatted zookeeper for AS topology graph
+    Requests paths, then core, down and up segments concurrently from
+    sciond. Paths come first since sciond only holds the core and down
+    segments of a destination after looking up its paths. Cached paths are
+    served while they are revalidated in the background, segments still
+    valid in the segment cache are not requested again.
+    Returns paths, core, down and up segments and the paths age in seconds
+    once all requests complete.
+    :param s_isd_as: Source ISD_AS with a pooled sciond connector.
+    :param d_isd_as: Destination ISD_AS.
+    :param max_paths: Maximum number of paths to request.
+    :param timer: RequestTimer recording the path and segment fetches.
     '''
-    nodes.append(get_json_zookeeper_node(v, name, idx))
-    links.append(get_json_internal_link(isd_as, "zk-%s" % idx))
-    return nodes, links
+    paths, age = path_cache.get((s_isd_as, d_isd_as, max_paths))
+    missed = paths is None
+    if missed:
+        paths = await timer.timed(
+            'paths', fetch_paths(s_isd_as, d_isd_as, max_paths))
+        age = 0
+    results = [paths]
+    for seg_type in [PST.CORE, PST.DOWN, PST.UP]:
+        segs = segment_cache.get(s_isd_as, seg_type, dst=d_isd_as)
+        if segs is None:
+            segs = timer.timed(
+                'segments', get_segments(s_isd_as, seg_type, d_isd_as))
+        results.append(segs)
+    calls = {idx: r for idx, r in enumerate(results)
+             if asyncio.iscoroutine(r)}
+    for idx, r in zip(calls, await asyncio.gather(*calls.values())):
+        results[idx] = r
+    if missed or path_cache.needs_refresh(results[0], age):
+        # refresh old segments and paths for next call
+        refresh_paths(s_isd_as, d_isd_as, max_paths)
+    return results + [age]
 
 
-def get_json_as_topology_sciond(connector, paths):
+def submit_background(coro):
     '''
-    Format all sciond AS topology data as a graph.
-    Data comes from lib.app.sciond.
+    Runs a sciond coroutine on the async client without waiting for its
+    result, errors are only logged.
     '''
-    nodes = []
-    links = []
-    try:
-        logging.info("\n-------- SCIOND: AS Info")
-        t = lib_sciond.get_as_info(connector=connector)
-        for v in t:
-            logging.debug(v.__dict__)
-            isd_as = str(ISD_AS(v.p.isdas))
-            nodes.append(get_root_as_node(isd_as, v.p.isCore, v.p.mtu))
-
-        logging.info("\n-------- SCIOND: Interface Info")
-        if_idx = 0
-        i = lib_sciond.get_if_info(connector=connector)
-        for key, v in i.items():
-            logging.debug('%s: %s' % (key, v.__dict__))
-            addr = v.p.hostInfo.addrs.ipv4
-            port = v.p.hostInfo.port
-            label = '%s-%s' % (ServiceType.BR, if_idx + 1)
-            type = ServiceType.BR
-            ifID = v.p.ifID
-            nodes, links = json_append_router(
-                nodes, links, isd_as, label, type, addr, port, ifID)
-
-            # find any matching interfaces from paths
-            if_id = v.p.ifID
-            if_isd_as = "(%s)" % if_id
-            for path in paths:
-                match = False
-                for interface in path.p.path.interfaces:
-                    if match:
-                        if_isd_as = "%s (%s)" % (
-                            ISD_AS(interface.isdas), if_id)
-                        break
-                    if interface.ifID == v.p.ifID:
-                        match = True
-
-            link_type = "PARENT"
-            nodes.append(get_json_interface_node_sciond(if_isd_as))
-            links.append(get_json_interface_link(label, if_isd_as, link_type))
-            if_idx += 1
-
-        logging.info("\n-------- SCIOND: Service Info")
-        srvs = [ServiceType.BS, ServiceType.PS, ServiceType.CS]
-        v = lib_sciond.get_service_info(
-            srvs, connector=connector)
-        for key in v:
-            logging.debug(v[key].__dict__)
-            sidx = 0
-            for hi in v[key].p.hostInfos:
-                addr = hi.addrs.ipv4
-                port = hi.port
-                label = '%s-%s' % (v[key].p.serviceType, sidx + 1)
-                type = str(v[key].p.serviceType)
-                nodes, links = json_append_server(
-                    nodes, links, isd_as, label, type, addr, port)
-                sidx += 1
-
-    except (SCIONDResponseError) as err:
-        logging.error("%s: %s" % (err.__class__.__name__, err))
-
-    graph = {}
-    graph["nodes"] = nodes
-    graph["links"] = links
-    logging.debug(graph)
-    return graph
-
-
-def get_json_as_topology(t, topo):
-    '''
-    Format all sciond AS topology data as a graph.
-    Data comes from SCIONDaemon.topology.
-    '''
-    nodes = []
-    links = []
-    isd_as = str(t.isd_as)
-    nodes.append(get_root_as_node(str(t.isd_as), t.is_core_as, t.mtu))
-    for servers in topo:
-        idx = 1
-        for v in topo[servers]:
-            if servers in topo_servers:
-                addr = v.public[0]
-                port = v.public[1]
-                nodes, links = json_append_server(
-                    nodes, links, isd_as, v.name, servers, addr, port)
-            elif servers in topo_br:
-                logging.info(v.interfaces)
-                interface = list(v.interfaces.values())[0]
-                addr = v.int_addrs.public[0]
-                port = v.int_addrs.public[1]
-                link_type = interface.link_type
-                ifID = interface.if_id
-                nodes, links = json_append_router(
-                    nodes, links, isd_as, v.name, servers, addr, port, ifID)
-                nodes.append(get_json_interface_node(interface))
-                links.append(get_json_interface_link(
-                    v.name, interface.isd_as, link_type))
-            elif servers in topo_zk:
-                nodes, links = json_append_zookeeper(
-                    nodes, links, isd_as, v, servers, idx)
-            idx += 1
-    graph = {}
-    graph["nodes"] = nodes
-    graph["links"] = links
-    logging.debug(graph)
-    return graph
-
-
-def get_root_as_node(name, is_core, mtu):
-    '''
-    Get AS Info for json graph
-    '''
-    return {
-        "name": name,
-        "type": "root",
-        "icon": get_service_type_name("ISD-AS"),
-        "group": get_grouping_index("ISD-AS"),
-        "is_core_as": is_core,
-        "mtu": mtu
-    }
-
-
-def get_json_internal_link(src, dst):
-    '''
-    Get AS internal node link for json graph
-    '''
-    return {
-        "source": src,
-        "target": dst,
-        "type": "as-in"
-    }
-
-
-def get_json_zookeeper_node(addr, name, idx):
-    '''
-    Create zookeeper node for graph
-    '''
-    return {
-        "name": "zk-%s" % idx,
-        "type": "server",
-        "icon": get_service_type_name(name),
-        "group": get_grouping_index(name),
-        "addr": addr,
-    }
-
-
-def get_json_server_node(label, name, addr, port):
-    '''
-    Create server node for graph
-    '''
-    return {
-        "name": label,
-        "type": "server",
-        "icon": get_service_type_name(name),
-        "group": get_grouping_index(name),
-        "addr": str(HostAddrIPv4(addr)),
-        "port": port
-    }
-
-
-def get_json_router_node(label, name, addr, port, ifID):
-    '''
-    Create router node for graph
-    '''
-    return {
-        "name": label,
-        "type": "router",
-        "icon": get_service_type_name(name),
-        "group": get_grouping_index(name),
-        "addr": str(HostAddrIPv4(addr)),
-        "port": port,
-        "if_id": ifID,
-    }
-
-
-def get_json_interface(i):
-    '''
-    Create external AS interface node for graph
-    '''
-    addr = i.public[0][0]
-    port = i.public[0][1]
-    to_addr = i.remote[0][0]
-    to_port = i.remote[0][1]
-    return {
-        "if_addr": str(HostAddrIPv4(addr)),
-        "if_bandwidth": i.bandwidth,
-        "if_id": i.if_id,
-        "if_isd_as": str(i.isd_as),
-        "if_link_type": i.link_type,
-        "if_mtu": i.mtu,
-        "if_name": i.name,
-        "if_port": port,
-        "if_to_addr": str(HostAddrIPv4(to_addr)),
-        "if_to_if_id": i.to_if_id,
-        "if_to_port": to_port,
-    }
-
-
-def get_json_interface_link(src, isd_as, link_type):
-    '''
-    Create external AS interface link for graph
-    '''
-    return {
-        "source": src,
-        "target": str(isd_as),
-        "type": "as-%s" % link_type.lower(),
-    }
+    def log_error(future):
+        err = future.exception()
+        if err:
+            logging.warning("Background %s: %s: %s" % (
+                coro.__name__, err.__class__.__name__, err))
+    future = sciond_async.submit(coro)
+    future.add_done_callback(log_error)
+    return future
 
 
-def get_json_interface_node(i):
+def findCerts(conf_dir, extension):
     '''
-    Create external AS interface node for graph direct bind
+    Returns all cert paths based on extension, cached until the cert
+    directory changes.
     '''
-    return {
-        "name": str(i.isd_as),
-        "type": "interface",
-        "icon": get_service_type_name("ISD_AS"),
-        "group": get_grouping_index("ISD-AS"),
-        "public addr": str(HostAddrIPv4(i.public[0])),
-        "public port": i.public[1],
-        "remote addr": str(HostAddrIPv4(i.remote[0])),
-        "remote port": i.remote[1],
-        "link_type": i.link_type,
-        "bandwidth": i.bandwidth,
-        "mtu": i.mtu,
-        "overlay": i.overlay,
-        "to_if_id": i.to_if_id,
-    }
+    certDir = os.path.join(conf_dir, CERT_DIR)
+    return file_cache.get(('certs', certDir, extension), [certDir],
+                          list_certs, certDir, extension)
 
 
-def get_json_interface_node_sciond(isd_as):
+def load_cert_index(cert_dirs):
     '''
-    Create external AS interface node for graph socket bind
+    Returns the CertIndex of all TRC and certificate chain files of cert
+    directories, cached until a directory listing changes or the gen/
+    watcher sees a file change. Indexes have their own cache, so an index
+    over all of gen/ does not evict the per-file entries of the file cache.
+    :param cert_dirs: Cert directories to index.
     '''
-    return {
-        "name": str(isd_as),
-        "type": "interface",
-        "icon": "ISD-AS",
-        "group": get_grouping_index("ISD-AS"),
-    }
-
+    return cert_index_cache.get(tuple(cert_dirs), cert_dirs,
+                                build_cert_index, cert_dirs)
+
 
-def get_grouping_index(name):
+def build_cert_index(cert_dirs):
     '''
-    Return consistent node type id for graph
+    Loads and indexes all TRC and certificate chain files of cert
+    directories, skipping files which are not valid json.
+    '''
+    records = []
+    for cert_dir in cert_dirs:
+        for extension, record in [('.trc', trc_record),
+                                  ('.crt', chain_record)]:
+            for path in list_certs(cert_dir, extension):
+                try:
+                    records.append(record(path, read_json_file(path)))
+                except (ValueError, AttributeError) as err:
+                    logging.warning("%s: %s: %s" % (
+                        path, err.__class__.__name__, err))
+    return CertIndex(records)
+
+
+def list_certs(certDir, extension):
     '''
-    group = {
-        'ISD-AS': 0,
-        'isdas': 0,
-        'BORDER': 1,
-        'br': 1,
-        'BEACON': 2,
-        'bs': 2,
-        'CERTIFICATE': 3,
-        'cs': 3,
-        'PATH': 4,
-        'ps': 4,
-        'SIBRA': 5,
-        'sb': 5,
-        'ZOOKEEPER': 6,
-        'zk': 6,
-    }
-    for type in group:
-        if type in name:
-            return group[type]
-
-
-def get_service_type_name(name):
-    '''
-    Get human readable name for service type
-    '''
-    group = {
-        'isdas': 'ISD-AS',
-        'br': 'BORDER',
-        'bs': 'BEACON',
-        'cs': 'CERTIFICATE',
-        'ps': 'PATH',
-        'sb': 'SIBRA',
-        'zk': 'ZOOKEEPER',
-    }
-    for type in group:
-        if type in name:
-            return group[type]
-    # default
-    return name
-
-
-def get_json_path_interfaces(path):
-    '''
-    Format json data for paths graph
+    Lists the cert paths of a directory with an extension.
     '''
-    data = []
-    last_i = None
-    # enumerate path interfaces
-    for interface in path.interfaces:
-        if last_i:
-            p = ISD_AS(interface.isdas)
-            link_p = interface.ifID
-            n = ISD_AS(last_i.isdas)
-            link_n = last_i.ifID
-            data.append({"a": str(p), "b": str(n), "al": link_p,
-                         "bl": link_n, "ltype": "CHILD"})
-            last_i = None
-
-        last_i = interface
+    certs = []
+    for file in os.listdir(certDir):
+        if file.endswith(extension):
+            certs.append(os.path.join(certDir, file))
+    return certs
 
-    return data
 
-
-def add_seg_links(segs, data, links, ltype):
-    '''
-    Add standard links to paths graph
-    '''
-    for s in segs:
-        for x in range(1, len(s.p.interfaces)):
-            p = ISD_AS(s.p.interfaces[x - 1].isdas)
-            n = ISD_AS(s.p.interfaces[x].isdas)
-            data.append({"a": str(p), "b": str(n), "ltype": ltype})
-            link = "%s,%s" % (
-                s.p.interfaces[x - 1].isdas, s.p.interfaces[x].isdas)
-            if link not in links:
-                links.append(link)
+def get_params(request):
+    '''
+    Validates url parameters common to the index page and data endpoints.
+    :param request: HTML request object containing url parameters.
+    '''
+    p = {}  # return param dictionary
+    p['tab'] = set_param(request, 'tab', 'tab-pathtopo')
+    p['data'] = set_param(request, 'data', 'sdapi')
+    p['addr'] = set_param(request, 'addr', '')
+    p['src'] = set_param(request, 'src', '')
+    p['dst'] = set_param(request, 'dst', '')
+    p['mp'] = set_param(request, 'mp', '5')
+    p['schema'] = set_param(request, 'schema', 'full')
+    p['err'] = ''
+    if p['tab'] not in TABS:
+        p['tab'] = 'tab-pathtopo'
+    return p
 
 
-def add_nonseg_links(paths, data, links, ltype):
+def get_conf_dir(isd_as):
     '''
-    Add remaining peering links to path graph
+    Returns the generated endhost configuration directory of an AS.
     '''
-    for path in paths:
-        for x in range(1, len(path.p.path.interfaces)):
-            p = ISD_AS(path.p.path.interfaces[x - 1].isdas)
-            n = ISD_AS(path.p.path.interfaces[x].isdas)
-            link = "%s,%s" % (path.p.path.interfaces[x - 1].isdas,
-                              path.p.path.interfaces[x].isdas)
-            link_r = "%s,%s" % (path.p.path.interfaces[x].isdas,
-                                path.p.path.interfaces[x - 1].isdas)
-            # confirm either direction is not a duplicate
-            if link not in links and link_r not in links:
-                links.append(link)
-                data.append({"a": str(p), "b": str(n), "ltype": ltype})
-
-
-def get_json_path_segs(paths, csegs, usegs, dsegs):
-    '''
-    Create path segments for graph overlay
-    '''
-    data = []
-    links = []
-    segs = len(csegs) + len(usegs) + len(dsegs)
-    if segs > 0:
-        nonseg_ltype = "PEER"
-    else:
-        nonseg_ltype = "CHILD"
-    add_seg_links(csegs, data, links, "CORE")
-    add_seg_links(usegs, data, links, "PARENT")
-    add_seg_links(dsegs, data, links, "PARENT")
-    add_nonseg_links(paths, data, links, nonseg_ltype)
-    logging.debug(data)
-    return data
+    return "%s/%s/ISD%s/AS%s/endhost" % (
+        SCION_ROOT, GEN_PATH, isd_as.isd_str(), isd_as.as_file_fmt())
 
 
-def p_segment(s, seg, idx, name, color, rev):
+def prepare_source(p):
     '''
-    Add segment to html list
+    Resolves source and destination ISD-ASes and makes sure sciond is
+    serving the source AS when using the sciond API.
+    Returns source, destination and endhost config dir, or None with
+    p['err'] set when sciond is not available yet.
+    :param p: Validated url parameters.
     '''
-    list_add_head(s, idx, name, color)
-    indent_open(s)
-    list_add(s, "Creation: %s" % iso_timestamp(seg.p.timestamp))
-    list_add(s, "Expiration: %s" % iso_timestamp(seg.p.expTime))
-    list_add(s, "Hops: %i" % (len(seg.p.interfaces) / 2))
-    # enumerate path interfaces
-    if rev:
-        interfaces = reversed(seg.p.interfaces)
-    else:
-        interfaces = seg.p.interfaces
-    for interface in interfaces:
-        isd_as = ISD_AS(interface.isdas)
-        link = interface.ifID
-        list_add(s, "%s (%s)" % (str(isd_as), link))
-    indent_close(s)
+    s_isd_as = ISD_AS(p['src'])
+    d_isd_as = ISD_AS(p['dst'])
+    p['src'], p['dst'] = str(s_isd_as), str(d_isd_as)  # reformat
+    logging.info("Requesting sciond data from %s to %s" % (s_isd_as, d_isd_as))
+    conf_dir = get_conf_dir(s_isd_as)
+    if (p['data'] == 'sdapi'):
+        with phase('sciond'):
+            if not connect_sciond(p, s_isd_as, conf_dir):
+                return None
+    return s_isd_as, d_isd_as, conf_dir
 
 
-def indent_open(s):
+def connect_sciond(p, s_isd_as, conf_dir):
+    '''
+    Connects the pooled connector of the source AS, launching sciond when
+    its socket is not reachable. Returns whether sciond is up.
     '''
-    Open html list
+    sock_file = get_default_sciond_path(s_isd_as)
+    if not pathlib.Path(sock_file).exists():
+        sock_file = get_default_sciond_path(None)
+    sciond_pool.get(s_isd_as, sock_file)
+    if not sciond_pool.is_healthy(s_isd_as):
+        logging.warning("sciond not reachable at %s" % sock_file)
+        # need to launch sciond, wait shortly for uptime
+        ready = sciond_supervisor.ensure(
+            s_isd_as, sock_file, conf_dir, p['addr'])
+        if not ready.wait(SCIOND_READY_WAIT):
+            p['err'] = ("sciond for %s is starting, please retry "
+                        "shortly." % s_isd_as)
+            return False
+        sciond_pool.reconnect(s_isd_as)
+    return True
+
+
+def load_path_graph(p, s_isd_as, d_isd_as):
+    '''
+    Returns a PathGraph of paths and core, down and up segments, which are
+    only available from the sciond API with a destination. sciond errors are
+    kept in p['err'] and yield an empty graph.
     '''
-    s.append("<ul>")
+    csegs = dsegs = usegs = []
+    paths = []
+    if (p['data'] == 'sdapi' and p['dst'] != ''):  # PATHS
+        try:
+            # get paths and keep segments
+            paths, csegs, dsegs, usegs, age = sciond_async.run(
+                get_sciond_paths_segs(s_isd_as, d_isd_as, int(p['mp']),
+                                      current_timer()))
+            p['paths_age'] = int(age)
+        except (SCIONDResponseError, SCIONDConnectionError,
+                AttributeError) as err:
+            # AttributeError handles backward-compatability
+            p['err'] = error_message(err)
+            logging.error(p['err'])
+    return PathGraph(paths, csegs, usegs, dsegs)
 
 
-def indent_close(s):
+def get_paths_data(graph):
     '''
-    Close html list
+    Returns json data for the paths tab: paths, path graph and segments.
+    :param graph: PathGraph of paths and segments.
     '''
-    s.append("</ul>")
+    with phase('json'):
+        return {
+            'paths': get_json_paths(graph),
+            'path_topo': get_json_path_segs(graph),
+            'segments': get_json_all_segments(graph),
+        }
 
 
-def list_add(s, str):
+def get_api_paths_data(graph, table, segments):
     '''
-    Add individual data element to html list
+    Returns json data of the paths api: paths and path graph, or segments,
+    in the compact schema when a string table is given.
+    :param graph: PathGraph of paths and segments.
+    :param table: StringTable of the compact schema, or None.
+    :param segments: Whether to return the segments instead of the paths.
     '''
-    s.append("<li><a href='#'>%s</a>" % str)
+    with phase('json'):
+        if segments:
+            return {'segments': get_json_all_segments(graph)
+                    if table is None else compact_segments(graph, table)}
+        if table is None:
+            return {'paths': get_json_paths(graph),
+                    'path_topo': get_json_path_segs(graph)}
+        return {'paths': compact_paths(graph, table),
+                'path_topo': compact_links(graph, table)}
 
 
-def list_attr_add(s, name, idx):
+def get_astopo_data(p, s_isd_as, d_isd_as, conf_dir):
     '''
-    Add html path segment data to string
+    Returns the AS topology graph for the AS topology tab.
     '''
-    s.append("<li seg-type='%s' seg-num=%s>" % (name, idx))
+    version, build = load_astopo(p, s_isd_as, d_isd_as, conf_dir)
+    return build()
 
 
-def list_add_head(s, idx, name, color):
+def load_astopo(p, s_isd_as, d_isd_as, conf_dir):
     '''
-    Add html segment header to string
+    Loads the inputs of the AS topology graph. Returns their version and a
+    function building the graph from them.
     '''
-    list_attr_add(s, name, idx)
-    s.append("<a href='#' >%s " % name)
-    if (name != 'PATH'):
-        s.append("SEGMENT ")
-    s.append("%s</a>" % (idx + 1))
+    if (p['data'] == 'sdapi'):
+        # paths name the neighbors of interfaces, mostly from cache
+        graph = load_path_graph(p, s_isd_as, d_isd_as)
+        infos = load_sciond_as_info(s_isd_as)
+        return ((graph.digest(), sciond_info_version(infos)),
+                lambda: get_json_as_topology_sciond(s_isd_as, graph, infos))
+    gen_watcher.start()
+    topo_file = os.path.join(conf_dir, TOPO_FILE)
+    return file_stamp([topo_file]), lambda: file_cache.get(
+        ('astopo', topo_file), [topo_file], load_json_as_topology, topo_file)
 
 
-def organize_topo(t):
+def load_json_as_topology(topo_file):
     '''
-    Filters topology object array into type pairs.
-    :param t: Topology array.
+    Builds the AS topology graph of a topology file.
     '''
-    return {  # current  api
-        'BEACON': t.beacon_servers,
-        'CERTIFICATE': t.certificate_servers,
-        'PATH': t.path_servers,
-        'SIBRA': t.sibra_servers,
-        'BORDER': t.border_routers,
-        'CORE_IF': t.core_interfaces,
-        'PARENT_IF': t.parent_interfaces,
-        'CHILD_IF': t.child_interfaces,
-        'PEER_IF': t.peer_interfaces,
-        'ZOOKEEPER': t.zookeepers,
-    }
+    t = file_cache.get(('topo', topo_file), [topo_file],
+                       Topology.from_file, topo_file)
+    return get_json_as_topology(t, organize_topo(t))
 
 
-def html_jsonfile(paths):
+def get_certs_html(p, conf_dir, extension):
     '''
-    Parses json data into html nested lists.
-    :param paths: Paths to json files.
+    Returns TRC or certificate html for the certificate tabs.
     '''
-    s = []
-    s.append("<ul class='tree'>")
-    for path in paths:
-        logging.info(path)
-        with open(path, 'r') as fin:
-            file = json.load(fin)
-        list_add(s, "<b>%s</b>" % os.path.basename(path))
-        indent_open(s)
-        step_json(s, file)
-        indent_close(s)
-    indent_close(s)
-    out_str = ''
-    for str in s:
-        out_str += (str + '\n')
-    logging.info(out_str)
-    return out_str
+    return ''.join(iter_certs_html(p, conf_dir, extension))
 
 
-def camel_2_title(label):
+def certs_version(p, conf_dir, extension):
     '''
-    Convert key name camel case into title case.
-    :param label: Camel-cased label.
+    Returns the version of the TRC or certificate files of the certificate
+    tabs.
     '''
-    return re.sub("([a-z])([A-Z])", "\g<1> \g<2>", label)
+    if (p['data'] == 'sdapi'):
+        return p['data']
+    gen_watcher.start()
+    return file_stamp(findCerts(conf_dir, extension))
 
 
-def step_json(s, d):
+def iter_certs_html(p, conf_dir, extension):
     '''
-    Append next html list item based on json level.
-    :param s: Current html output string.
-    :param d: Current json input.
+    Yields TRC or certificate html for the certificate tabs, one file at a
+    time.
     '''
-    for k, v in d.items():
-        if isinstance(v, str) or isinstance(v, int) or isinstance(v, float):
-            # parse time into readable format
-            if isinstance(v, int) and "Time" in k:
-                time = datetime.utcfromtimestamp(v).strftime(
-                    "%Y-%m-%d %H:%M:%S.%f UTC")
-                list_add(s, "<b>%s</b>: %s" % (camel_2_title(k), time))
-            else:
-                list_add(s, "<b>%s</b>: %s" % (camel_2_title(k), v))
-        elif v is None:
-            list_add(s, "<b>%s</b>: %s" % (camel_2_title(k), v))
-        elif isinstance(v, dict):
-            list_add(s, "<b>%s</b>" % camel_2_title(k))
-            indent_open(s)
-            step_json(s, v)
-            indent_close(s)
-        else:
-            logging.error(
-                "!!!!! Value %s not recognized for key %s." % (v, k))
+    if (p['data'] == 'sdapi'):
+        if extension == '.trc':
+            return iter(["TRC information for sciond not yet implemented."])
+        return iter(
+            ["Certificate information for sciond not yet implemented."])
+    gen_watcher.start()
+    return iter_jsonfile_html(findCerts(conf_dir, extension))
 
 
-def set_param(request, name, default):
+def not_modified(request, etag, cache_control):
     '''
-    Generic handler for validating incoming url parameters.
-    :param request: HTML request object containing url parameters.
-    :param name: Parameter name.
-    :param default: Default value of parameter.
+    Returns a 304 Not Modified response when the request already has the
+    content of an ETag, otherwise None.
     '''
-    value = request.GET.get(name)
-    logging.info("%s = %s" % (name, value))
-    if not value or value == '':
-        value = default
-    return value
+    if not etag or not etag_matches(
+            request.META.get('HTTP_IF_NONE_MATCH', ''), etag):
+        return None
+    return cache_headers(HttpResponseNotModified(), etag, cache_control)
 
 
-def launch_sciond(sock_file, conf_dir, addr, s_isd_as):
+def cache_headers(resp, etag, cache_control):
     '''
-    Launch sciond process with or without optional IP address when not using
-    localhost.
+    Sets the validator and caching headers of a response.
     '''
-    cmd = 'cd %s && python/bin/sciond --api-addr %s sd%s %s' % (
-        SCION_ROOT, sock_file, s_isd_as.file_fmt(), conf_dir)
-    if addr and addr != '':
-        cmd = '%s --addr %s' % (cmd, addr)
-    logging.info("Listening for sciond: %s" % cmd)
-    subprocess.Popen(cmd, shell=True)
-    wait = 0
-    while not os.path.exists(sock_file) and wait < 5:
-        wait = wait + 1
-        time.sleep(1)
+    if etag:
+        resp['ETag'] = etag
+    resp['Cache-Control'] = cache_control
+    resp['Vary'] = 'Accept-Encoding'
+    return resp
 
 
-def findCerts(conf_dir, extension):
+def compress_response(request, resp):
     '''
-    Returns all cert paths based on extension.
+    Compresses a response with the best content coding the browser
+    accepts, streamed responses on the fly. Small, failed or already
+    encoded responses are left as they are.
     '''
-    certs = []
-    certDir = os.path.join(conf_dir, CERT_DIR)
-    for file in os.listdir(certDir):
-        if file.endswith(extension):
-            certs.append(os.path.join(certDir, file))
-    return certs
+    encoding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if (not encoding or resp.status_code != 200 or
+            resp.has_header('Content-Encoding')):
+        return resp
+    if resp.streaming:
+        resp.streaming_content = compress_chunks(resp.streaming_content,
+                                                 encoding)
+    elif len(resp.content) >= COMPRESS_MIN_SIZE:
+        resp.content = compress(resp.content, encoding)
+    else:
+        return resp
+    if resp.has_header('Content-Length'):
+        del resp['Content-Length']
+    resp['Content-Encoding'] = encoding
+    return resp
+
+
+def conditional_response(request, resp, etag=None, cache_control='no-cache'):
+    '''
+    Returns a response with an ETag hashing its content and the given
+    Cache-Control, compressed, or 304 Not Modified when the browser has
+    the content already. Streamed responses need the ETag of their content
+    to be validated.
+    :param request: HTML request object.
+    :param resp: Response to return.
+    :param etag: ETag of the content, hashed from the body when None.
+    :param cache_control: Cache-Control header value, no-cache to
+        revalidate on every use.
+    '''
+    if etag is None and not resp.streaming:
+        etag = content_etag([resp.content])
+    unchanged = not_modified(request, etag, cache_control)
+    if unchanged is not None:
+        return unchanged
+    return compress_response(request, cache_headers(resp, etag,
+                                                    cache_control))
+
+
+def json_response(request, build, etag, cache_control='no-cache'):
+    '''
+    Streams json data as a conditional response, encoded while it is sent.
+    The ETag identifies the inputs the data is built from, so 304 Not
+    Modified is returned without building the data, and the encoded content
+    is never held or hashed as a whole.
+    :param build: Function returning json serializable data.
+    :param etag: ETag from input_etag, or None.
+    '''
+    unchanged = not_modified(request, etag, cache_control)
+    if unchanged is not None:
+        return unchanged
+    resp = StreamingHttpResponse(iter_json(build()),
+                                 content_type="application/json")
+    return compress_response(request, cache_headers(resp, etag,
+                                                    cache_control))
 
 
 def index(request):
     '''
     Main index handler for index.html for main visualization page.
     Validates parameters, request scion data, returns formatted response.
+    Only the data of the active tab is computed, the other tabs load theirs
+    through the api endpoints when opened.
     :param request: HTML request object containing url parameters.
     '''
-    p = {}  # return param dictionary
-    p['tab'] = set_param(request, 'tab', 'tab-pathtopo')
-    p['data'] = set_param(request, 'data', 'sdapi')
-    p['addr'] = set_param(request, 'addr', '')
-    p['src'] = set_param(request, 'src', '')
-    p['dst'] = set_param(request, 'dst', '')
-    p['mp'] = set_param(request, 'mp', '5')
-    p['err'] = ''
+    p = get_params(request)
     if (p['src'] == '' and p['dst'] == ''):
         # use endhost gen/ia if no host specified
         if (p['src'] == ''):
@@ -771,74 +805,67 @@ def index(request):
                     # load and reformat
                     p['src'] = str(ISD_AS(fin.read().strip()))
             except (FileNotFoundError) as err:
-                logging.warning("%s: %s" % (err.__class__.__name__, err))
+                logging.warning(error_message(err))
         return fmt_err(request, p)
-    s_isd_as = ISD_AS(p['src'])
-    d_isd_as = ISD_AS(p['dst'])
-    p['src'], p['dst'] = str(s_isd_as), str(d_isd_as)  # reformat
-    csegs = dsegs = usegs = []
-    paths = ''
-    logging.info("Requesting sciond data from %s to %s" % (s_isd_as, d_isd_as))
-    conf_dir = "%s/%s/ISD%s/AS%s/endhost" % (
-        SCION_ROOT, GEN_PATH, s_isd_as.isd_str(), s_isd_as.as_file_fmt())
-    sock_file = get_default_sciond_path(s_isd_as)
-    if not pathlib.Path(sock_file).exists():
-        sock_file = get_default_sciond_path(None)
+    # identical concurrent page loads share one computation
+    key = ('index',) + tuple(p[k] for k in INDEX_KEY)
     try:
-        if (p['data'] == 'sdapi'):
-            connector[s_isd_as] = lib_sciond.init(sock_file)
-            logging.info(connector[s_isd_as]._api_addr)
-            try:  # test if sciond is already running for this AS
-                logging.info("Testing sciond at %s" % sock_file)
-                lib_sciond.get_as_info(connector=connector[s_isd_as])
-            except (SCIONDResponseError) as err:
-                p['err'] = "%s: %s" % (err.__class__.__name__, err)
-                return fmt_err(request, p)
-            except (SCIONDConnectionError, FileNotFoundError) as err:
-                logging.warning("%s: %s" % (err.__class__.__name__, err))
-                # need to launch sciond, wait for uptime
-                launch_sciond(sock_file, conf_dir, p['addr'], s_isd_as)
-
-            if (p['dst'] != ''):  # PATHS
-                try:
-                    # get paths and keep segments
-                    paths = lib_sciond.get_paths(d_isd_as, max_paths=int(
-                        p['mp']), connector=connector[s_isd_as])
-                    csegs = lib_sciond.get_segtype_hops(
-                        PST.CORE, connector=connector[s_isd_as])
-                    dsegs = lib_sciond.get_segtype_hops(
-                        PST.DOWN, connector=connector[s_isd_as])
-                    usegs = lib_sciond.get_segtype_hops(
-                        PST.UP, connector=connector[s_isd_as])
-                    # refresh old segments for next call
-                    lib_sciond.get_paths(d_isd_as, max_paths=int(
-                        p['mp']), connector=connector[s_isd_as])
-                except (SCIONDResponseError, SCIONDConnectionError,
-                        AttributeError) as err:
-                    # AttributeError handles backward-compatability
-                    logging.error("%s: %s" % (err.__class__.__name__, err))
-                    p['err'] = str(err)
-            p['json_as_topo'] = json.dumps(
-                get_json_as_topology_sciond(connector[s_isd_as], paths))
-            p['json_trc'] = ("TRC information for sciond not yet implemented.")
-            p['json_crt'] = (
-                "Certificate information for sciond not yet implemented.")
-        elif (p['data'] == 'file'):
-            t = Topology.from_file(os.path.join(conf_dir, TOPO_FILE))
-            topo = organize_topo(t)
-            p['json_as_topo'] = json.dumps(get_json_as_topology(t, topo))
-            p['json_trc'] = html_jsonfile(findCerts(conf_dir, ".trc"))
-            p['json_crt'] = html_jsonfile(findCerts(conf_dir, ".crt"))
-        p['path_info'] = get_as_view_html(paths, csegs, usegs, dsegs)
-        p['json_path_topo'] = json.dumps(
-            get_json_path_segs(paths, csegs, usegs, dsegs))
-        p['json_seg_topo'] = json.dumps(
-            get_json_all_segments(csegs, usegs, dsegs))
-        p['json_paths'] = json.dumps(get_json_paths(paths))
+        ok, page = request_flight.do(key, get_index_data, dict(p))
     except (SCIONBaseError) as err:
-        p['err'] = "%s: %s" % (err.__class__.__name__, err)
+        p['err'] = error_message(err)
+        return fmt_err(request, p)
+    p.update(page)
+    if not ok:
         return fmt_err(request, p)
-    return render(request, 'asviz/index.html', p)
+    with phase('render'):
+        page = render(request, 'asviz/index.html', p)
+    return conditional_response(request, page)
+
+
+def get_index_data(p):
+    '''
+    Computes the page data of the active tab into the params. Returns
+    whether the page can be rendered and the params, which are shared by
+    all coalesced requests and must not be modified.
+    :param p: Validated url parameters, owned by this computation.
+    '''
+    source = prepare_source(p)
+    if not source:
+        return False, p
+    s_isd_as, d_isd_as, conf_dir = source
+    set_null_data(p)
+    if (p['tab'] == 'tab-pathtopo'):
+        graph = load_path_graph(p, s_isd_as, d_isd_as)
+        data = get_paths_data(graph)
+        p['path_info'] = get_as_view_html(graph)
+        with phase('json'):
+            p['json_path_topo'] = json.dumps(data['path_topo'])
+            p['json_seg_topo'] = json.dumps(data['segments'])
+            p['json_paths'] = json.dumps(data['paths'])
+    elif (p['tab'] == 'tab-astopo'):
+        data = get_astopo_data(p, s_isd_as, d_isd_as, conf_dir)
+        with phase('json'):
+            p['json_as_topo'] = json.dumps(data)
+    elif (p['tab'] == 'tab-trc'):
+        p['json_trc'] = get_certs_html(p, conf_dir, '.trc')
+    elif (p['tab'] == 'tab-crt'):
+        p['json_crt'] = get_certs_html(p, conf_dir, '.crt')
+    p['json_lazy_tabs'] = json.dumps(
+        [tab for tab in TABS if tab != p['tab']])
+    return True, p
+
+
+def set_null_data(params):
+    '''
+    Set tab data not yet loaded to null for the page to request lazily.
+    '''
+    params['json_trc'] = ''
+    params['json_crt'] = ''
+    params['json_paths'] = 'null'
+    params['json_path_topo'] = 'null'
+    params['json_seg_topo'] = 'null'
+    params['json_as_topo'] = 'null'
+    params['path_info'] = ''
 
 
 def fmt_err(request, params):
@@ -852,24 +879,346 @@ def fmt_err(request, params):
     params['json_path_topo'] = '{}'
     params['json_seg_topo'] = '{}'
     params['json_as_topo'] = '{"links": [], "nodes": []}'
+    params['json_lazy_tabs'] = '[]'
     params['path_info'] = ''
     return render(request, 'asviz/index.html', params)
 
 
+def api_request(request, build):
+    '''
+    Generic handler for tab data endpoints, streams the data built for the
+    request parameters as json together with any error message. The compact
+    schema is used when requested with schema=compact. The ETag hashes the
+    version of the inputs of the data, such as the digest of the PathGraph,
+    so the data is only built when the browser does not have it already,
+    and the json is encoded while it is sent. Identical concurrent requests
+    share loading the inputs and building the data.
+    :param request: HTML request object containing url parameters.
+    :param build: Function of params, source, destination and config dir
+        loading the tab inputs. Returns their version and a function of the
+        StringTable of the compact schema or None building the dictionary
+        of tab data.
+    '''
+    p = get_params(request)
+    key = ('api', request.path) + tuple(sorted(request.GET.items()))
+    etag, make_data = request_flight.do(key, load_api_inputs, p, build, key)
+    return json_response(
+        request, lambda: request_flight.do(key + (etag,), make_data), etag)
+
+
+def load_api_inputs(p, build, key):
+    '''
+    Loads the inputs of a tab data endpoint, shared by all coalesced
+    requests. Returns the ETag of their version and a function building the
+    data.
+    '''
+    version = make = None
+    if (p['src'] == ''):
+        p['err'] = "Source AS required."
+    else:
+        try:
+            source = prepare_source(p)
+            if source:
+                version, make = build(p, *source)
+        except (SCIONBaseError) as err:
+            p['err'] = error_message(err)
+    if p['err']:
+        logging.error(p['err'])
+    err = p['err']
+    compact = p['schema'] == 'compact'
+
+    def make_data():
+        table = StringTable() if compact else None
+        data = make(table) if make else {}
+        data['err'] = err
+        if table is not None:
+            compact_response(data, table)
+        return data
+    return input_etag(key, (version, err)), make_data
+
+
+def api_paths(request):
+    '''
+    Paths tab data: paths and path graph, the html path tree is streamed by
+    api_html.
+    '''
+    def build(p, s_isd_as, d_isd_as, conf_dir):
+        graph = load_path_graph(p, s_isd_as, d_isd_as)
+        age = p.get('paths_age', 0)
+
+        def make(table):
+            data = get_api_paths_data(graph, table, False)
+            data['paths_age'] = age
+            return data
+        return (graph.digest(), age), make
+    return api_request(request, build)
+
+
+def api_segments(request):
+    '''
+    Paths tab segment data.
+    '''
+    def build(p, s_isd_as, d_isd_as, conf_dir):
+        graph = load_path_graph(p, s_isd_as, d_isd_as)
+        return graph.digest(), lambda table: get_api_paths_data(
+            graph, table, True)
+    return api_request(request, build)
+
+
+def api_astopo(request):
+    '''
+    AS topology tab data.
+    '''
+    def build(p, s_isd_as, d_isd_as, conf_dir):
+        version, make = load_astopo(p, s_isd_as, d_isd_as, conf_dir)
+        return version, lambda table: {'as_topo': make()}
+    return api_request(request, build)
+
+
+def api_certs(request):
+    '''
+    ISD TRC or AS certificate tab html, selected by the type parameter.
+    '''
+    extension = '.crt' if request.GET.get('type') == 'crt' else '.trc'
+
+    def build(p, s_isd_as, d_isd_as, conf_dir):
+        return (certs_version(p, conf_dir, extension), lambda table: {
+            'html': get_certs_html(p, conf_dir, extension)})
+    return api_request(request, build)
+
+
+def api_html(request):
+    '''
+    Streams the html tree of a tab, selected by the name parameter: paths
+    for the path interfaces, trc or crt for the certificate files. Errors
+    are returned as plain text with an error status.
+    :param request: HTML request object containing url parameters.
+    '''
+    name = request.GET.get('name')
+    p = get_params(request)
+    status = 400
+    chunks = None
+    if (p['src'] == ''):
+        p['err'] = "Source AS required."
+    elif name not in ['paths', 'trc', 'crt']:
+        p['err'] = "Unknown html fragment: %s" % name
+    else:
+        status = 500
+        try:
+            source = prepare_source(p)
+            if not source:
+                status = 503  # sciond is starting
+            else:
+                s_isd_as, d_isd_as, conf_dir = source
+                if name == 'paths':
+                    chunks = iter_as_view_html(
+                        load_path_graph(p, s_isd_as, d_isd_as))
+                else:
+                    chunks = iter_certs_html(p, conf_dir, '.' + name)
+        except (SCIONBaseError) as err:
+            p['err'] = error_message(err)
+    if chunks is None:
+        logging.error(p['err'])
+        resp = HttpResponse(p['err'], status=status,
+                            content_type="text/plain; charset=utf-8")
+        if status == 503:
+            resp['Retry-After'] = str(SCIOND_RETRY_AFTER)
+        return resp
+    resp = StreamingHttpResponse(
+        guard_html_stream(chunks), content_type="text/html; charset=utf-8")
+    if p['err']:
+        resp['X-Asviz-Error'] = ' '.join(p['err'].splitlines())
+    return compress_response(request, cache_headers(resp, None, 'no-cache'))
+
+
+def guard_html_stream(chunks):
+    '''
+    Yields the chunks of a streamed html response. The status is sent
+    before the first chunk, so an error raised while generating them ends
+    the stream with an error element the page reports instead.
+    '''
+    try:
+        for chunk in chunks:
+            yield chunk
+    except Exception as err:
+        msg = error_message(err)
+        logging.error(msg)
+        yield "<li class='asviz-error'>%s</li>\n" % escape(msg)
+
+
+def api_cert_index(request):
+    '''
+    Queries the index of TRC and certificate chain files as json.
+    Parameters: src limits the query to the endhost certs of one AS instead
+    of all ASes in gen/, type selects trc or crt, isd and as filter by ISD
+    or chain subject ISD-AS, expiring returns what expires within that many
+    days, not what has expired already unless expired=1, and latest=1 only
+    the latest version per ISD or AS. TRCs are listed once per ISD and
+    version, not once per AS holding a copy.
+    :param request: HTML request object containing url parameters.
+    '''
+    records = []
+    msg = ''
+    try:
+        gen_watcher.start()
+        gen_dir = os.path.join(SCION_ROOT, GEN_PATH)
+        src = set_param(request, 'src', '')
+        if src:
+            cert_dirs = [os.path.join(get_conf_dir(ISD_AS(src)), CERT_DIR)]
+        else:
+            cert_dirs = sorted(glob.glob(os.path.join(
+                gen_dir, 'ISD*', 'AS*', 'endhost', CERT_DIR)))
+        isd_as = set_param(request, 'as', None)
+        expiring = set_param(request, 'expiring', None)
+        expired = set_param(request, 'expired', '') == '1'
+        now = time.time()
+        records = load_cert_index(cert_dirs).query(
+            kind=set_param(request, 'type', None),
+            isd=set_param(request, 'isd', None),
+            isd_as=str(ISD_AS(isd_as)) if isd_as else None,
+            expires_before=(now + float(expiring) * 86400
+                            if expiring else None),
+            expires_after=now if expiring and not expired else None,
+            latest=set_param(request, 'latest', '') == '1')
+    except (SCIONBaseError, ValueError, OSError) as err:
+        msg = error_message(err)
+        logging.error(msg)
+    return json_response(request, lambda: {
+        'certs': [r.to_json(gen_dir) for r in records],
+        'err': msg,
+    }, input_etag(gen_dir, [r.key() for r in records], msg))
+
+
+def api_json(request):
+    '''
+    Returns the html list items of a subtree of a TRC or certificate file,
+    selected by the file name and a JSON pointer, for lazily opened tree
+    items. Errors are returned as plain text with an error status.
+    :param request: HTML request object containing url parameters.
+    '''
+    p = get_params(request)
+    name = set_param(request, 'file', '')
+    pointer = set_param(request, 'pointer', '')
+    extension = os.path.splitext(name)[1]
+    status = 400
+    if (p['src'] == '' or extension not in ['.trc', '.crt']):
+        p['err'] = "Source AS and TRC or certificate file required."
+    else:
+        try:
+            conf_dir = get_conf_dir(ISD_AS(p['src']))
+            paths = [path for path in findCerts(conf_dir, extension)
+                     if os.path.basename(path) == name]
+            if not paths:
+                status = 404
+                raise FileNotFoundError("No such file: %s" % name)
+            try:
+                d = resolve_json_pointer(load_json_file(paths[0]), pointer)
+            except (LookupError, TypeError):
+                status = 404
+                raise
+            if not isinstance(d, (dict, list)):
+                raise ValueError("Not an object or array: %s" % pointer)
+            s = []
+            step_json(s, d, JSON_TREE_DEPTH, name, pointer)
+            return conditional_response(request, HttpResponse(
+                html_lines(s), content_type="text/html; charset=utf-8"))
+        except (SCIONBaseError, LookupError, TypeError, ValueError,
+                OSError) as err:
+            p['err'] = error_message(err)
+    logging.error(p['err'])
+    return HttpResponse(p['err'], status=status,
+                        content_type="text/plain; charset=utf-8")
+
+
 def hosttime(request):
     ts = time.time() * 1000
     json_ts = '{"hosttime_ms": %s}' % ts
     resp = HttpResponse(json_ts, content_type="text/json; charset=utf-8")
+    resp['Cache-Control'] = 'no-store'
+    return resp
+
+
+def metrics(request):
+    '''
+    Exposes sciond latencies, view times, response sizes, errors and cache
+    lookups in the Prometheus text format.
+    '''
+    resp = HttpResponse(
+        REGISTRY.expose(),
+        content_type="text/plain; version=0.0.4; charset=utf-8")
+    resp['Cache-Control'] = 'no-store'
     return resp
 
 
 def config(request):
-    projectId = 'my-project-1470640410708'
-    configUrl = 'https://%s.appspot.com/getconfig' % projectId
-    response = requests.post(configUrl)
-    json = response.text
-    logging.info(json)
-    return HttpResponse(json, content_type="text/json; charset=utf-8")
+    try:
+        json = config_client.get()
+    except ConfigError as err:
+        logging.error(error_message(err))
+        return HttpResponse(str(err), status=502,
+                            content_type="text/plain; charset=utf-8")
+    # the config holds API keys, keep it out of shared and disk caches
+    return conditional_response(
+        request, HttpResponse(json, content_type="text/json; charset=utf-8"),
+        cache_control='private, no-store')
+
+
+def feed_url_allowed(url):
+    '''
+    Feeds may be fetched from the URL prefixes in FEED_ALLOWED_URLS, matched
+    by scheme, host and path, and from the feed URLs named by the
+    visualization config.
+    '''
+    if any(url_has_prefix(url, prefix) for prefix in FEED_ALLOWED_URLS):
+        return True
+    try:
+        conf = json.loads(config_client.get().decode('utf-8'))
+    except (ConfigError, ValueError):
+        return False
+    return isinstance(conf, dict) and url in [
+        v for k, v in conf.items() if k.endswith('_url')]
+
+
+feed_proxy = FeedProxy(feed_url_allowed, FEED_TTL, FEED_MAX_SIZE,
+                       FEED_CACHE_SIZE, FEED_CACHE_ENTRIES)
+# nodes feed URL -> (feed entry, LocationIndex, build time)
+location_indexes = {}
+location_lock = threading.Lock()
+
+
+def feed_response(request, url, content_type):
+    '''
+    Returns a remote feed through the caching proxy, compressed when the
+    browser accepts it. Cached feeds are validated by the ETag of their
+    content and may be cached by the browser for FEED_TTL seconds.
+    :param request: HTML request object.
+    :param url: Feed URL.
+    :param content_type: Content type of the response.
+    '''
+    if not url:
+        return HttpResponse("Feed URL required.", status=400,
+                            content_type="text/plain; charset=utf-8")
+    try:
+        feed = feed_proxy.get(url)
+    except FeedError as err:
+        logging.error(error_message(err))
+        return HttpResponse(str(err), status=err.status,
+                            content_type="text/plain; charset=utf-8")
+    cache_control = 'max-age=%d' % FEED_TTL
+    if feed.body is None:
+        resp = StreamingHttpResponse(feed.stream, content_type=content_type)
+        return compress_response(request,
+                                 cache_headers(resp, None, cache_control))
+    unchanged = not_modified(request, feed.etag, cache_control)
+    if unchanged is not None:
+        return unchanged
+    encoding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if encoding and len(feed.body) >= COMPRESS_MIN_SIZE:
+        resp = HttpResponse(feed.encoded(encoding), content_type=content_type)
+        resp['Content-Encoding'] = encoding
+    else:
+        resp = HttpResponse(feed.body, content_type=content_type)
+    return cache_headers(resp, feed.etag, cache_control)
 
 
 def labels(request):
@@ -879,13 +1228,12 @@ def labels(request):
     if debug:
         with open(labelsTest, 'r') as fin:
             json = fin.read()
-            logging.info(json)
-            return HttpResponse(json, content_type="text/json; charset=utf-8")
+            return conditional_response(request, HttpResponse(
+                json, content_type="text/json; charset=utf-8"),
+                cache_control='max-age=%d' % FEED_TTL)
     else:
-        with urllib.request.urlopen(labelsUrl) as response:
-            json = response.read()
-            logging.info(json)
-            return HttpResponse(json, content_type="text/json; charset=utf-8")
+        return feed_response(request, labelsUrl,
+                             "text/json; charset=utf-8")
 
 
 def locations(request):
@@ -895,27 +1243,111 @@ def locations(request):
     if debug:
         with open(locationsTest, 'r') as fin:
             xml = fin.read()
-            logging.info(xml)
-            return HttpResponse(xml, content_type="text/json; charset=utf-8")
+            return conditional_response(request, HttpResponse(
+                xml, content_type="text/json; charset=utf-8"),
+                cache_control='max-age=%d' % FEED_TTL)
     else:
-        with urllib.request.urlopen(locationsUrl) as response:
-            xml = response.read()
-            logging.info(xml)
-            return HttpResponse(xml, content_type="text/xml; charset=utf-8")
+        return feed_response(request, locationsUrl,
+                             "text/xml; charset=utf-8")
+
+
+def load_location_index(request):
+    '''
+    Returns the LocationIndex of the nodes feed of a request, parsed once
+    per version of the feed, and that version. Cached feeds are versioned
+    by their ETag, uncached, streamed feeds by the time they were indexed
+    and reparsed after FEED_TTL seconds.
+    :param request: HTML request object containing url parameters.
+    '''
+    if request.GET.get('debug'):
+        path = BASE_DIR + '/../../test/asviz/nodes-d.xml'
+        return (file_cache.get(('locations', path), [path],
+                               load_location_file, path), file_stamp([path]))
+    url = request.GET.get('nodes_xml_url')
+    if not url:
+        raise FeedError("Feed URL required.", 400)
+    with location_lock:
+        cached = location_indexes.get(url)
+    if (cached and cached[0].body is None and
+            time.time() - cached[2] < FEED_TTL):
+        cache_lookup('location_index', True)
+        return cached[1], cached[2]
+    feed = feed_proxy.get(url)
+    cache_lookup('location_index', bool(cached and cached[0] is feed))
+    if not (cached and cached[0] is feed):
+        index = LocationIndex([feed.body] if feed.body is not None else
+                              feed.stream)
+        logging.info("indexed %s locations from %s" % (index.count, url))
+        cached = (feed, index, time.time())
+        with location_lock:
+            location_indexes[url] = cached
+    return cached[1], feed.etag if feed.etag is not None else cached[2]
+
+
+def load_location_file(path):
+    '''
+    Parses a nodes xml file into a LocationIndex.
+    '''
+    with open(path, 'rb') as fin:
+        return LocationIndex(iter(lambda: fin.read(65536), b''))
+
+
+def location_response(request, query):
+    '''
+    Returns the locations selected by query from the nodes feed index as
+    json together with any error message.
+    :param request: HTML request object containing url parameters.
+    :param query: Function of a LocationIndex returning Locations.
+    '''
+    locs = []
+    msg = ''
+    version = None
+    try:
+        index, version = load_location_index(request)
+        locs = query(index)
+    except (FeedError, ParseError, ValueError, TypeError, OSError) as err:
+        msg = error_message(err)
+        logging.error(msg)
+    query_key = (request.path,) + tuple(sorted(request.GET.items()))
+    return json_response(request, lambda: {
+        'locations': [loc.to_json() for loc in locs],
+        'err': msg,
+    }, input_etag(query_key, version, msg),
+        cache_control='no-cache' if msg else 'max-age=%d' % FEED_TTL)
+
+
+def locations_ia(request):
+    '''
+    Locations of the ISD-ASes listed in the comma separated ia parameter.
+    '''
+    ias = [ia for ia in set_param(request, 'ia', '').split(',') if ia]
+    return location_response(request, lambda index: index.by_ia(ias))
+
+
+def locations_bbox(request):
+    '''
+    Locations inside the bounding box of the south, west, north and east
+    parameters, in degrees.
+    '''
+    def query(index):
+        return index.in_bbox(*[float(request.GET.get(k)) for k in [
+            'south', 'west', 'north', 'east']])
+    return location_response(request, query)
 
 
 def geolocate(request):
     debug = request.GET.get('debug')
     default_loc = '{"location": {"lat": 0, "lng": 0}}'
     geoApiKey = request.GET.get('google_geolocation_apikey')
-    geoLocateUrl = ("https://www.googleapis.com/geolocation/v1/geolocate" +
-                    "?key=%s" % geoApiKey)
     if debug:
         logging.info(default_loc)
         return HttpResponse(default_loc,
                             content_type="text/json; charset=utf-8")
     else:
-        response = requests.post(geoLocateUrl)
-        json = response.text
-        logging.info(json)
-        return HttpResponse(json, content_type="text/json; charset=utf-8")
+        try:
+            loc = geo_cache.get(request.META.get('REMOTE_ADDR'), geoApiKey)
+        except ValueError as err:
+            logging.error(error_message(err))
+            loc = None
+        json_loc = json.dumps(loc) if loc is not None else default_loc
+        return HttpResponse(json_loc, content_type="text/json; charset=utf-8")
@@ -0,0 +1,86 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import threading
+
+logging = logging.getLogger("asviz")
+
+
+def tree_signature(root):
+    '''
+    Summarizes the state of a directory tree as the number of entries, the
+    latest mtime and the total size. Creating, removing, renaming or writing
+    any file changes the signature.
+    :param root: Directory to scan.
+    '''
+    count = 0
+    latest = 0
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in [''] + filenames:
+            try:
+                st = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            count += 1
+            latest = max(latest, st.st_mtime_ns)
+            size += st.st_size
+    return count, latest, size
+
+
+class DirectoryWatcher(object):
+    '''
+    Polls a directory tree in the background and calls on_change whenever
+    anything under it changes. Polling keeps it dependency free and works on
+    any filesystem, the tree is only scanned once per interval.
+    '''
+
+    def __init__(self, root, interval, on_change):
+        self._root = root
+        self._interval = interval
+        self._on_change = on_change
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        '''
+        Starts watching, further calls do nothing.
+        '''
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._watch_loop, name="asviz-watch-%s" %
+                    os.path.basename(self._root), daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        '''
+        Stops watching.
+        '''
+        self._stop.set()
+
+    def _watch_loop(self):
+        last = tree_signature(self._root)
+        while not self._stop.wait(self._interval):
+            current = tree_signature(self._root)
+            if current != last:
+                logging.info("%s changed, invalidating file caches" %
+                             self._root)
+                last = current
+                self._on_change()
@@ -0,0 +1,30 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`benchmark` --- asviz view helper benchmarks
+=================================================
+
+Run from the test directory, e.g. `python3 -m benchmark.edge_index`.
+"""
+
+import os
+import sys
+
+WEB_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__)))), 'python', 'web')
+sys.path.insert(0, WEB_DIR)
+
+# puts SCION_ROOT on the path for lib imports, like the web app does
+import as_viewer.settings  # noqa
@@ -0,0 +1,80 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`edge_index` --- path topology link dedup scaling
+======================================================
+
+Compares the former list-of-strings link dedup of add_seg_links and
+add_nonseg_links with the EdgeIndex of asviz.graph for growing numbers of
+segment hops.
+"""
+
+import time
+
+from benchmark.synthetic import isdas, make_segments
+from asviz.graph import EdgeIndex, PathGraph
+
+SEG_LENGTH = 5
+
+
+def list_dedup(graph):
+    '''
+    Link dedup as formerly done on a list of formatted strings.
+    '''
+    links = []
+    for segs in [graph.csegs, graph.usegs, graph.dsegs]:
+        for s in segs:
+            for x in range(1, len(s.hops)):
+                link = "%s,%s" % (
+                    s.hops[x - 1].node.isdas, s.hops[x].node.isdas)
+                if link not in links:
+                    links.append(link)
+    return links
+
+
+def index_dedup(graph):
+    links = EdgeIndex()
+    for segs in [graph.csegs, graph.usegs, graph.dsegs]:
+        for s in segs:
+            for x in range(1, len(s.hops)):
+                links.add(s.hops[x - 1].node, s.hops[x].node, "CORE")
+    return links
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, len(result)
+
+
+def main():
+    print("%8s %8s %8s %12s %12s" % (
+        "hops", "ases", "links", "list (s)", "index (s)"))
+    for hops in [100, 1000, 5000, 10000, 25000, 50000]:
+        # keep the AS count proportional so the link count grows with hops
+        ases = [isdas(1 + i % 5, 0xff0000000000 + i)
+                for i in range(max(10, hops // 10))]
+        segs = make_segments(hops // SEG_LENGTH, SEG_LENGTH, ases)
+        graph = PathGraph([], segs, [], [])
+        t_index, links = timed(index_dedup, graph)
+        if hops <= 10000:
+            t_list = "%12.4f" % timed(list_dedup, graph)[0]
+        else:
+            t_list = "%12s" % "(skipped)"
+        print("%8d %8d %8d %s %12.4f" % (
+            hops, len(ases), links, t_list, t_index))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`fake_sciond` --- sciond stand-in replaying topology fixtures
+==================================================================
+
+Serves the sciond API on the Unix socket of each AS of a topology, at the
+path get_default_sciond_path gives, so asviz.views.index and as_viewer.py
+can be load tested without a SCION network. AS, interface and service info,
+paths and segments are answered from fixtures generated from a
+test/topology .topo file or a test/data topo-*.json file, or read from a
+fixture file written by an earlier run:
+
+    python3 -m benchmark.fake_sciond short-d
+    python3 -m benchmark.fake_sciond topo-t.json --isd-as 1-11 1-12
+    python3 -m benchmark.fake_sciond short-d --write-fixtures d.json
+    python3 -m benchmark.fake_sciond --fixtures d.json \\
+        --latency 0.01 --latency get_paths=0.2 --error-rate get_paths=0.05
+
+Latency and error rates are set for all calls or per lib.app.sciond call
+name. Failed path requests reply with a path server timeout, other failed
+requests drop the connection without a reply.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from benchmark.synthetic import Topology
+
+from lib.app.sciond import get_default_sciond_path
+from lib.packet.host_addr import HostAddrIPv4
+from lib.packet.path import SCIONPath
+from lib.packet.scion_addr import ISD_AS
+from lib.sciond_api.as_req import SCIONDASInfoReply, SCIONDASInfoReplyEntry
+from lib.sciond_api.host_info import HostInfo
+from lib.sciond_api.if_req import SCIONDIFInfoReply, SCIONDIFInfoReplyEntry
+from lib.sciond_api.parse import parse_sciond_msg
+from lib.sciond_api.path_meta import FwdPathMeta, PathInterface
+from lib.sciond_api.path_req import (
+    SCIONDPathReply,
+    SCIONDPathReplyEntry,
+    SCIONDPathReplyError,
+)
+from lib.sciond_api.segment_req import (
+    SCIONDSegTypeHopReply,
+    SCIONDSegTypeHopReplyEntry,
+)
+from lib.sciond_api.service_req import (
+    SCIONDServiceInfoReply,
+    SCIONDServiceInfoReplyEntry,
+)
+from lib.socket import ReliableSocket
+from lib.types import (
+    PathSegmentType as PST,
+    SCIONDMsgType as SMT,
+    ServiceType,
+)
+
+TEST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOPOLOGY_DIRS = [os.path.join(TEST_DIR, 'topology'),
+                 os.path.join(TEST_DIR, 'data')]
+LOCALHOST = '127.0.0.1'
+MTU = 1472
+MAX_PATHS = 10
+SEGMENT_TTL = 21600  # seconds
+SERVICE_TTL = 300  # seconds
+# first ports of border routers by interface ID and of services by index
+BR_PORT = 50000
+SVC_PORTS = {ServiceType.BS: 31041, ServiceType.PS: 31043,
+             ServiceType.CS: 31045}
+# lib.app.sciond call names answering each request type
+CALLS = {
+    SMT.PATH_REQUEST: 'get_paths',
+    SMT.AS_REQUEST: 'get_as_info',
+    SMT.IF_REQUEST: 'get_if_info',
+    SMT.SERVICE_REQUEST: 'get_service_info',
+    SMT.SEGTYPEHOP_REQUEST: 'get_segtype_hops',
+}
+
+
+def hop_interfaces(topo, hops):
+    '''
+    Fixture interfaces of an AS hop sequence, [ISD-AS, interface ID] pairs.
+    '''
+    return [[str(ISD_AS(i.isdas)), i.ifID] for i in topo.interfaces(hops)]
+
+
+def make_fixture(topo, raw, max_paths=MAX_PATHS):
+    '''
+    Fixture of one AS of a Topology: its AS, interface and service info,
+    up segments, and paths, core and down segments by destination.
+    '''
+    fixture = {
+        'core': topo.cores[raw],
+        'mtu': MTU,
+        'interfaces': [],
+        'services': {},
+        'paths': {},
+        'up_segments': [],
+        'core_segments': {},
+        'down_segments': {},
+    }
+    for neighbor, ltype in topo.neighbors[raw]:
+        if_id = topo.if_ids[(raw, neighbor)]
+        fixture['interfaces'].append({
+            'if_id': if_id, 'neighbor': str(ISD_AS(neighbor)),
+            'ltype': ltype, 'addr': LOCALHOST, 'port': BR_PORT + if_id})
+    for svc, port in sorted(SVC_PORTS.items()):
+        fixture['services'][svc] = [[LOCALHOST, port]]
+    ups = topo.up_chains(raw)
+    # segments list the core AS first, like the beacons they come from
+    fixture['up_segments'] = [hop_interfaces(topo, hops[::-1])
+                              for hops in ups if len(hops) > 1]
+    for dst in topo.ases:
+        if dst == raw:
+            continue
+        name = str(ISD_AS(dst))
+        routes = topo.routes(raw, dst, max_paths)
+        if not routes:
+            continue
+        fixture['paths'][name] = [hop_interfaces(topo, hops)
+                                  for hops in routes]
+        downs = topo.up_chains(dst)
+        fixture['down_segments'][name] = [
+            hop_interfaces(topo, hops[::-1]) for hops in downs
+            if len(hops) > 1]
+        cores = set()
+        for up in ups:
+            for down in downs:
+                core = topo.core_route(up[-1], down[-1])
+                if core and len(core) > 1:
+                    cores.add(tuple(core))
+        fixture['core_segments'][name] = [
+            hop_interfaces(topo, list(hops)) for hops in sorted(cores)]
+    return fixture
+
+
+def make_fixtures(topo, names=None, max_paths=MAX_PATHS):
+    '''
+    Fixtures of the ASes of a Topology, all of them unless names are given,
+    keyed by ISD-AS string.
+    '''
+    raws = [ISD_AS(n).int() for n in names] if names else topo.ases
+    return {str(ISD_AS(raw)): make_fixture(topo, raw, max_paths)
+            for raw in raws}
+
+
+def find_topology(name):
+    '''
+    Path of a topology file given as a path, or by name in test/topology or
+    test/data.
+    '''
+    if os.path.exists(name):
+        return name
+    for topo_dir in TOPOLOGY_DIRS:
+        for ext in ['', '.topo', '.json']:
+            path = os.path.join(topo_dir, name + ext)
+            if os.path.isfile(path):
+                return path
+    raise ValueError("No topology %s in %s" % (name, TOPOLOGY_DIRS))
+
+
+class CallSettings(object):
+    '''
+    Latency and error rate of each sciond call, parsed from VALUE or
+    CALL=VALUE arguments where a bare value applies to all calls.
+    '''
+
+    def __init__(self, specs, default=0.0):
+        self.default = default
+        self.calls = {}
+        for spec in specs or []:
+            call, _, value = spec.rpartition('=')
+            if not call:
+                self.default = float(value)
+            elif call in CALLS.values():
+                self.calls[call] = float(value)
+            else:
+                raise ValueError("Unknown sciond call %s, one of %s" % (
+                    call, sorted(CALLS.values())))
+
+    def get(self, call):
+        return self.calls.get(call, self.default)
+
+
+class FakeSciond(object):
+    '''
+    Serves the fixture of one AS on its sciond socket. Each connection is
+    handled on its own thread. Down and core segments are only returned for
+    destinations paths were requested to, like sciond caches them.
+    '''
+
+    def __init__(self, isd_as, fixture, sock_file, latency, jitter,
+                 error_rate, rnd):
+        self.isd_as = isd_as
+        self.fixture = fixture
+        self.sock_file = sock_file
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rnd = rnd
+        self._lock = threading.Lock()
+        self._dsts = set()
+        self._sock = None
+
+    def start(self):
+        if os.path.exists(self.sock_file):
+            os.remove(self.sock_file)
+        os.makedirs(os.path.dirname(self.sock_file), exist_ok=True)
+        self._sock = ReliableSocket(bind_unix=(self.sock_file, "sciond"))
+        self._sock.listen()
+        thread = threading.Thread(target=self._serve, daemon=True,
+                                  name="fake sciond %s" % self.isd_as)
+        thread.start()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+        if os.path.exists(self.sock_file):
+            os.remove(self.sock_file)
+
+    def _serve(self):
+        while True:
+            conn = self._sock.accept(block=True)
+            if conn is None:
+                continue
+            threading.Thread(target=self._handle, args=(conn,),
+                             daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            while True:
+                data, _ = conn.recv()
+                if not data:
+                    return
+                request = parse_sciond_msg(data)
+                call = CALLS.get(request.MSG_TYPE)
+                if call is None:
+                    print("%s: unsupported request %s" % (
+                        self.isd_as, request.MSG_TYPE))
+                    return
+                self._delay(call)
+                failed = self._fail(call)
+                if failed and call != 'get_paths':
+                    return  # dropped without reply
+                reply = getattr(self, call)(request, failed)
+                conn.send(reply.pack_full())
+        finally:
+            conn.close()
+
+    def _delay(self, call):
+        with self._lock:
+            delay = self.latency.get(call) + self.rnd.uniform(
+                0, self.jitter.get(call))
+        if delay > 0:
+            time.sleep(delay)
+
+    def _fail(self, call):
+        with self._lock:
+            return self.rnd.random() < self.error_rate.get(call)
+
+    def get_paths(self, request, failed):
+        dst = str(ISD_AS(request.p.dst))
+        if failed:
+            return SCIONDPathReply.from_values(
+                request.id, [], error=SCIONDPathReplyError.PS_TIMEOUT)
+        routes = self.fixture['paths'].get(dst)
+        if routes is None:
+            return SCIONDPathReply.from_values(
+                request.id, [], error=SCIONDPathReplyError.NO_PATHS)
+        with self._lock:
+            self._dsts.add(dst)
+        first_hop = self._first_hops()
+        entries = []
+        for ifs in routes[:request.p.maxPaths or MAX_PATHS]:
+            addr, port = first_hop.get(ifs[0][1], (LOCALHOST, BR_PORT))
+            meta = FwdPathMeta.from_values(
+                SCIONPath(), path_interfaces(ifs), self.fixture['mtu'])
+            entries.append(SCIONDPathReplyEntry.from_values(
+                meta, HostAddrIPv4(addr), port))
+        return SCIONDPathReply.from_values(request.id, entries)
+
+    def get_as_info(self, request, failed):
+        entry = SCIONDASInfoReplyEntry.from_values(
+            ISD_AS(self.isd_as), self.fixture['core'], self.fixture['mtu'])
+        return SCIONDASInfoReply.from_values(request.id, [entry])
+
+    def get_if_info(self, request, failed):
+        if_ids = set(request.p.ifIDs)
+        entries = []
+        for i in self.fixture['interfaces']:
+            if not if_ids or i['if_id'] in if_ids:
+                entries.append(SCIONDIFInfoReplyEntry.from_values(
+                    i['if_id'], HostInfo.from_values(
+                        [HostAddrIPv4(i['addr'])], i['port'])))
+        return SCIONDIFInfoReply.from_values(request.id, entries)
+
+    def get_service_info(self, request, failed):
+        svcs = set(request.p.serviceTypes)
+        entries = []
+        for svc, hosts in sorted(self.fixture['services'].items()):
+            if svcs and svc not in svcs:
+                continue
+            host_infos = [HostInfo.from_values([HostAddrIPv4(addr)], port)
+                          for addr, port in hosts]
+            entries.append(SCIONDServiceInfoReplyEntry.from_values(
+                svc, host_infos, ttl=SERVICE_TTL))
+        return SCIONDServiceInfoReply.from_values(request.id, entries)
+
+    def get_segtype_hops(self, request, failed):
+        with self._lock:
+            dsts = sorted(self._dsts)
+        if request.p.type == PST.UP:
+            segs = self.fixture['up_segments']
+        else:
+            key = ('down_segments' if request.p.type == PST.DOWN else
+                   'core_segments')
+            segs = []
+            for dst in dsts:
+                segs.extend(s for s in self.fixture[key].get(dst, [])
+                            if s not in segs)
+        now = int(time.time())
+        entries = [SCIONDSegTypeHopReplyEntry.from_values(
+            path_interfaces(ifs), now, now + SEGMENT_TTL) for ifs in segs]
+        return SCIONDSegTypeHopReply.from_values(request.id, entries)
+
+    def _first_hops(self):
+        return {i['if_id']: (i['addr'], i['port'])
+                for i in self.fixture['interfaces']}
+
+
+def path_interfaces(ifs):
+    return [PathInterface.from_values(ISD_AS(isd_as), if_id)
+            for isd_as, if_id in ifs]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve fake sciond sockets from topology fixtures.')
+    parser.add_argument('topology', nargs='?', default=None,
+                        help='Topology file or name in test/topology or '
+                        'test/data.')
+    parser.add_argument('--fixtures', default=None,
+                        help='Fixture json file to serve instead.')
+    parser.add_argument('--write-fixtures', default=None,
+                        help='Write the generated fixtures to this file.')
+    parser.add_argument('--isd-as', nargs='*', default=None,
+                        help='ASes to serve (default all).')
+    parser.add_argument('--max-paths', type=int, default=MAX_PATHS,
+                        help='Paths generated per destination.')
+    parser.add_argument('--latency', action='append', default=[],
+                        help='[CALL=]SECONDS delay of each reply.')
+    parser.add_argument('--jitter', action='append', default=[],
+                        help='[CALL=]SECONDS of uniform random extra delay.')
+    parser.add_argument('--error-rate', action='append', default=[],
+                        help='[CALL=]RATE of failed requests, 0 to 1.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of jitter and failures.')
+    args = parser.parse_args()
+
+    if args.fixtures:
+        with open(args.fixtures, 'r') as fin:
+            fixtures = json.load(fin)
+    elif args.topology:
+        topo = Topology.load(find_topology(args.topology))
+        fixtures = make_fixtures(topo, args.isd_as, args.max_paths)
+    else:
+        parser.error("a topology or --fixtures is required")
+    if args.write_fixtures:
+        with open(args.write_fixtures, 'w') as fout:
+            json.dump(fixtures, fout, indent=1, sort_keys=True)
+        print("fixtures written to %s" % args.write_fixtures)
+        return 0
+
+    latency = CallSettings(args.latency)
+    jitter = CallSettings(args.jitter)
+    error_rate = CallSettings(args.error_rate)
+    servers = []
+    for x, isd_as in enumerate(args.isd_as or sorted(fixtures)):
+        sock_file = get_default_sciond_path(ISD_AS(isd_as))
+        server = FakeSciond(isd_as, fixtures[isd_as], sock_file, latency,
+                            jitter, error_rate,
+                            random.Random(args.seed + x))
+        server.start()
+        servers.append(server)
+        print("%-12s %s" % (isd_as, sock_file))
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,371 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`synthetic` --- synthetic sciond paths and segments
+========================================================
+"""
+
+import collections
+import json
+import random
+import time
+
+import yaml
+
+from lib.packet.scion_addr import ISD_AS
+
+# ISD offset between replicated copies of a topology
+COPY_ISD_OFFSET = 100
+LOCALHOST = bytes([127, 0, 0, 1])
+# hierarchy of the AS levels of test/data topologies
+LEVELS = {'LEAF': 0, 'INTERMEDIATE': 1, 'CORE': 2}
+
+
+class Obj(object):
+    '''
+    Attribute bag shaped like the capnp wrappers of lib.app.sciond.
+    '''
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def isdas(isd, as_):
+    '''
+    Raw 64 bit ISD-AS of an ISD and AS number.
+    '''
+    return (isd << 48) | as_
+
+
+def interface(raw, if_id):
+    return Obj(isdas=raw, ifID=if_id)
+
+
+def hop_interfaces(ases, rnd):
+    '''
+    Interfaces of a hop sequence, one egress and one ingress interface per
+    link like sciond reports them.
+    '''
+    ifs = []
+    for x in range(1, len(ases)):
+        ifs.append(interface(ases[x - 1], rnd.randint(1, 64)))
+        ifs.append(interface(ases[x], rnd.randint(1, 64)))
+    return ifs
+
+
+def make_segments(count, length, ases, seed=0):
+    '''
+    Segment-like objects with .p.interfaces, .p.timestamp and .p.expTime.
+    :param count: Number of segments.
+    :param length: AS hops per segment.
+    :param ases: List of raw ISD-ASes to draw hops from.
+    '''
+    rnd = random.Random(seed)
+    now = int(time.time())
+    segs = []
+    for _ in range(count):
+        hops = rnd.sample(ases, min(length, len(ases)))
+        segs.append(Obj(p=Obj(
+            interfaces=hop_interfaces(hops, rnd), timestamp=now,
+            expTime=now + rnd.randint(600, 21600))))
+    return segs
+
+
+def replica(name, k):
+    '''
+    Raw ISD-AS of an AS name in copy k of a topology.
+    '''
+    isd_as = ISD_AS(str(name))
+    return isdas(int(isd_as.isd_str()) + k * COPY_ISD_OFFSET,
+                 isd_as.int() & 0xffffffffffff)
+
+
+def read_topo(topo):
+    '''
+    AS names mapped to whether they are core, and (a, b, ltype) links of a
+    parsed .topo file.
+    '''
+    ases = {name: bool((conf or {}).get('core'))
+            for name, conf in topo['ASes'].items()}
+    links = [(link['a'], link['b'], link['ltype']) for link in topo['links']]
+    return ases, links
+
+
+def read_json_topology(topo):
+    '''
+    AS names mapped to whether they are core, and (a, b, ltype) links of a
+    parsed test/data topology: either a list of links, where ASes with core
+    links or without parents are core, or a map of ASes to their level and
+    the link types of their neighbors, where unlisted neighbors are not
+    core and the higher level AS of a parent link is the parent.
+    '''
+    if isinstance(topo, list):
+        links = [(link['a'], link['b'], link['ltype']) for link in topo]
+        names = {n for a, b, _ in links for n in (a, b)}
+        children = {b for _, b, ltype in links if ltype == 'PARENT'}
+        cores = {n for a, b, ltype in links if ltype == 'CORE'
+                 for n in (a, b)}
+        return {n: n in cores or n not in children for n in names}, links
+    levels = {name: LEVELS.get(conf.get('level'), 0)
+              for name, conf in topo.items() if isinstance(conf, dict)}
+    ases = {}
+    seen = {}
+    for name, conf in sorted(topo.items()):
+        if not isinstance(conf, dict) or 'links' not in conf:
+            continue  # default_* settings
+        ases[name] = conf.get('level') == 'CORE'
+        for neighbor, ltype in sorted(conf['links'].items()):
+            if ltype in ['PARENT', 'CHILD']:
+                # files differ in which side they name, the level decides
+                rank = levels.get(neighbor, 0) - levels[name]
+                if rank < 0 or (rank == 0 and ltype == 'CHILD'):
+                    link = (name, neighbor, 'PARENT')
+                else:
+                    link = (neighbor, name, 'PARENT')
+            else:
+                a, b = sorted([name, neighbor])
+                link = (a, b, 'CORE' if ltype == 'ROUTING' else ltype)
+            seen.setdefault(link, len(seen))
+    links = sorted(seen, key=seen.get)
+    for a, b, _ in links:
+        ases.setdefault(a, False)
+        ases.setdefault(b, False)
+    return ases, links
+
+
+class Topology(object):
+    '''
+    AS graph of a test/topology .topo file or a test/data topology, as raw
+    ISD-ASes.
+
+    Each AS numbers its links from 1 in file order, so interface IDs are
+    consistent between paths, segments and interface info. The graph can be
+    replicated into copies in further ISDs, linked core to core, to scale
+    the number of ASes while keeping the fan-out of the file.
+    '''
+
+    def __init__(self, cores, links):
+        '''
+        :param cores: Dict of raw ISD-AS to whether it is a core AS.
+        :param links: List of (raw a, raw b, ltype) tuples.
+        '''
+        self.cores = cores
+        self.links = links
+        self.ases = sorted(cores)
+        self.neighbors = {raw: [] for raw in self.ases}
+        self.parents = {raw: [] for raw in self.ases}
+        self.if_ids = {}
+        for a, b, ltype in links:
+            self.if_ids[(a, b)] = len(self.neighbors[a]) + 1
+            self.neighbors[a].append((b, ltype))
+            self.if_ids[(b, a)] = len(self.neighbors[b]) + 1
+            self.neighbors[b].append((a, ltype))
+            if ltype == 'PARENT':
+                self.parents[b].append(a)
+
+    @classmethod
+    def load(cls, path, copies=1):
+        '''
+        Reads a .topo file, or a test/data topo-*.json link list or AS map,
+        replicated into copies.
+        '''
+        with open(path, 'r') as fin:
+            if path.endswith('.json'):
+                ases, file_links = read_json_topology(json.load(fin))
+            else:
+                ases, file_links = read_topo(yaml.safe_load(fin))
+        cores = {}
+        links = []
+        for k in range(copies):
+            for name, core in ases.items():
+                cores[replica(name, k)] = core
+                if k and core:
+                    links.append((replica(name, k - 1), replica(name, k),
+                                  'CORE'))
+            for a, b, ltype in file_links:
+                links.append((replica(a, k), replica(b, k), ltype))
+        return cls(cores, links)
+
+    def interfaces(self, hops):
+        '''
+        Interfaces of an AS hop sequence, the egress and ingress interface
+        of each link.
+        '''
+        ifs = []
+        for x in range(1, len(hops)):
+            ifs.append(interface(hops[x - 1], self.if_ids[(
+                hops[x - 1], hops[x])]))
+            ifs.append(interface(hops[x], self.if_ids[(hops[x], hops[x - 1])]))
+        return ifs
+
+    def up_hops(self, rnd, start=None):
+        '''
+        Walks parent links from a non-core AS up to a core AS.
+        '''
+        leaves = [r for r in self.ases if self.parents[r]]
+        hops = [start if start is not None else rnd.choice(leaves)]
+        while self.parents[hops[-1]] and not self.cores[hops[-1]]:
+            parent = rnd.choice(self.parents[hops[-1]])
+            if parent in hops:
+                break
+            hops.append(parent)
+        return hops
+
+    def core_hops(self, rnd, start, length):
+        '''
+        Walks core links from a core AS for up to length links.
+        '''
+        hops = [start]
+        while len(hops) <= length:
+            nexts = [b for b, ltype in self.neighbors[hops[-1]]
+                     if ltype == 'CORE' and b not in hops]
+            if not nexts:
+                break
+            hops.append(rnd.choice(nexts))
+        return hops
+
+    def up_chains(self, raw, limit=16):
+        '''
+        Hop sequences following parent links from an AS to each core AS
+        reachable, at most limit of them. A core AS is its own chain.
+        '''
+        chains = []
+        stack = [[raw]]
+        while stack and len(chains) < limit:
+            hops = stack.pop()
+            if self.cores[hops[-1]] or not self.parents[hops[-1]]:
+                chains.append(hops)
+                continue
+            for parent in reversed(self.parents[hops[-1]]):
+                if parent not in hops:
+                    stack.append(hops + [parent])
+        return chains
+
+    def core_route(self, a, b):
+        '''
+        Shortest hop sequence over core links between two core ASes, or
+        None if they are not connected.
+        '''
+        prev = {a: None}
+        queue = collections.deque([a])
+        while queue:
+            cur = queue.popleft()
+            if cur == b:
+                hops = []
+                while cur is not None:
+                    hops.append(cur)
+                    cur = prev[cur]
+                return hops[::-1]
+            for nb, ltype in self.neighbors[cur]:
+                if ltype == 'CORE' and nb not in prev:
+                    prev[nb] = cur
+                    queue.append(nb)
+        return None
+
+    def routes(self, src, dst, max_paths):
+        '''
+        Up to max_paths shortest hop sequences from src to dst joining an up
+        chain of src, a core route and a reversed up chain of dst.
+        '''
+        found = set()
+        for up in self.up_chains(src):
+            for down in self.up_chains(dst):
+                core = self.core_route(up[-1], down[-1])
+                if core is None:
+                    continue
+                hops = tuple(up[:-1] + core + down[-2::-1])
+                if len(set(hops)) == len(hops):
+                    found.add(hops)
+        return [list(hops) for hops in sorted(found, key=len)[:max_paths]]
+
+
+def segment(ifs, now, rnd):
+    return Obj(p=Obj(interfaces=ifs, timestamp=now,
+                     expTime=now + rnd.randint(600, 21600)))
+
+
+def path(ifs, mtu=1472):
+    return Obj(p=Obj(
+        path=Obj(interfaces=ifs, mtu=mtu),
+        hostInfo=Obj(addrs=Obj(ipv4=LOCALHOST), port=30041)))
+
+
+def make_topology_data(topo, hops, seed=0):
+    '''
+    Paths and up, core and down segments walking the links of a Topology,
+    about hops AS links in total: two fifths in paths, the rest split
+    between the segment types. Paths join an up, core and down walk.
+    Returns paths, core, up and down segments.
+    '''
+    rnd = random.Random(seed)
+    now = int(time.time())
+    paths, csegs, usegs, dsegs = [], [], [], []
+    budget = {'paths': hops * 2 // 5, 'csegs': hops // 5,
+              'usegs': hops // 5, 'dsegs': hops - hops * 4 // 5}
+    ltypes = set(ltype for _, _, ltype in topo.links)
+    # segment types the topology cannot have go to the paths
+    for key, ltype in [('csegs', 'CORE'), ('usegs', 'PARENT'),
+                       ('dsegs', 'PARENT')]:
+        if ltype not in ltypes:
+            budget['paths'] += budget[key]
+            budget[key] = 0
+    core_starts = sorted(set(a for a, _, ltype in topo.links
+                             if ltype == 'CORE'))
+    while any(v > 0 for v in budget.values()):
+        up = topo.up_hops(rnd)
+        down = topo.up_hops(rnd)[::-1]
+        core = topo.core_hops(rnd, up[-1], rnd.randint(1, 3))
+        if budget['usegs'] > 0 and len(up) > 1:
+            usegs.append(segment(topo.interfaces(up), now, rnd))
+            budget['usegs'] -= len(up) - 1
+        if budget['dsegs'] > 0 and len(down) > 1:
+            dsegs.append(segment(topo.interfaces(down), now, rnd))
+            budget['dsegs'] -= len(down) - 1
+        if budget['csegs'] > 0:
+            seg = core
+            if len(seg) <= 1:
+                seg = topo.core_hops(rnd, rnd.choice(core_starts),
+                                     rnd.randint(1, 3))
+            csegs.append(segment(topo.interfaces(seg), now, rnd))
+            budget['csegs'] -= len(seg) - 1
+        if budget['paths'] > 0:
+            walk = up + core[1:]
+            if down[0] == walk[-1]:
+                walk += down[1:]
+            paths.append(path(topo.interfaces(walk)))
+            budget['paths'] -= max(1, len(walk) - 1)
+    return paths, csegs, usegs, dsegs
+
+
+def make_as_info(topo, raw, if_count, seed=0):
+    '''
+    AS, interface and service info of an AS like lib_sciond returns them,
+    with if_count interfaces cycling through the links of the AS.
+    '''
+    rnd = random.Random(seed)
+    as_info = [Obj(p=Obj(isdas=raw, isCore=topo.cores.get(raw, False),
+                         mtu=1472))]
+    links = topo.neighbors.get(raw) or [(raw, 'PEER')]
+    if_info = {}
+    for x in range(if_count):
+        if_id = x + 1 if x >= len(links) else topo.if_ids.get(
+            (raw, links[x][0]), x + 1)
+        if_info[if_id] = Obj(p=Obj(ifID=if_id, hostInfo=Obj(
+            addrs=Obj(ipv4=LOCALHOST), port=rnd.randint(30000, 40000))))
+    service_info = {}
+    for svc in ['bs', 'ps', 'cs']:
+        service_info[svc] = Obj(p=Obj(serviceType=svc, hostInfos=[
+            Obj(addrs=Obj(ipv4=LOCALHOST), port=rnd.randint(30000, 40000))
+            for _ in range(2)]))
+    return as_info, if_info, service_info
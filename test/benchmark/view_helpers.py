@@ -0,0 +1,190 @@
+# Copyright 2017 ETH Zurich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+:mod:`view_helpers` --- asviz view helper scaling and regressions
+=================================================================
+
+Times the path, segment and AS topology helpers the views render with,
+from asviz.render, on synthetic sciond data walking the topologies of
+test/topology, from 10 to 100k AS hops. asviz.views is not imported, so no
+sciond client, cache or watcher of the web app is set up. Timings are
+compared with a stored baseline, scaled by a calibration loop so baselines
+move between machines, and the run fails when a helper got slower than the
+tolerance allows. Without a baseline the comparison is skipped. --save
+writes test/benchmark/baseline.json in the source tree unless --baseline
+names another file:
+
+    python3 -m benchmark.view_helpers --save     # store the baseline
+    python3 -m benchmark.view_helpers            # compare with it
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from benchmark.synthetic import Topology, make_as_info, make_topology_data
+
+from asviz import render
+from asviz.graph import PathGraph
+
+TEST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOPOLOGY_DIR = os.path.join(TEST_DIR, 'topology')
+BASELINE_FILE = os.path.join(TEST_DIR, 'benchmark', 'baseline.json')
+SCALES = [10, 100, 1000, 10000, 100000]
+# AS hops per replicated copy of a topology, so larger scales span more ASes
+HOPS_PER_COPY = 1000
+# timings below this many seconds are too noisy to flag
+MIN_TIME = 0.005
+
+
+def best_time(func, repeat):
+    '''
+    Returns the fastest of repeat runs of func in seconds.
+    '''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate(repeat=5):
+    '''
+    Seconds of a fixed pure python workload, the speed unit of a machine.
+    '''
+    def work():
+        d = {}
+        for x in range(200000):
+            d[x % 1000] = "%s-%s" % (x, x >> 3)
+        return sorted(d.values())
+    return best_time(work, repeat)
+
+
+def bench_topology(topo_file, scale, repeat):
+    '''
+    Times the view helpers on the synthetic data of one topology and scale.
+    Returns helper names mapped to seconds.
+    '''
+    topo = Topology.load(topo_file, max(1, scale // HOPS_PER_COPY))
+    paths, csegs, usegs, dsegs = make_topology_data(topo, scale)
+    graph = PathGraph(paths, csegs, usegs, dsegs)
+    src = topo.ases[0]
+    if_count = max(1, scale // 10)
+    infos = make_as_info(topo, src, if_count)
+    results = {
+        'PathGraph': best_time(
+            lambda: PathGraph(paths, csegs, usegs, dsegs), repeat),
+        'get_json_paths': best_time(
+            lambda: render.get_json_paths(graph), repeat),
+        'get_json_path_segs': best_time(
+            lambda: render.get_json_path_segs(graph), repeat),
+        'get_json_all_segments': best_time(
+            lambda: render.get_json_all_segments(graph), repeat),
+        'get_as_view_html': best_time(
+            lambda: render.get_as_view_html(graph), repeat),
+        'get_json_as_topology_sciond': best_time(
+            lambda: render.get_json_as_topology_sciond(src, graph, infos),
+            repeat),
+    }
+    return results
+
+
+def run(topo_files, scales, repeat):
+    '''
+    Returns the calibration and timings keyed by topology/scale/helper.
+    '''
+    timings = {}
+    for topo_file in topo_files:
+        name = os.path.splitext(os.path.basename(topo_file))[0]
+        for scale in scales:
+            for helper, t in bench_topology(topo_file, scale, repeat).items():
+                key = '%s/%s/%s' % (name, scale, helper)
+                timings[key] = t
+                print("%-60s %10.4f" % (key, t))
+                sys.stdout.flush()
+    return {'calibration': calibrate(), 'timings': timings}
+
+
+def compare(result, baseline, tolerance):
+    '''
+    Returns the keys of timings slower than tolerance times their baseline,
+    after scaling by the calibration of both runs.
+    '''
+    speed = result['calibration'] / baseline['calibration']
+    regressions = []
+    print("\n%-60s %10s %10s %7s" % ("helper", "base (s)", "now (s)", "ratio"))
+    for key, t in sorted(result['timings'].items()):
+        base = baseline['timings'].get(key)
+        if base is None:
+            continue
+        expected = base * speed
+        ratio = t / expected if expected else 1.0
+        flag = ''
+        if ratio > tolerance and t > MIN_TIME:
+            regressions.append(key)
+            flag = ' REGRESSION'
+        print("%-60s %10.4f %10.4f %7.2f%s" % (key, expected, t, ratio, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark asviz view helpers on synthetic sciond data.')
+    parser.add_argument('--topology', nargs='*', default=None,
+                        help='Topology names in test/topology (default all).')
+    parser.add_argument('--scales', type=int, nargs='*', default=SCALES,
+                        help='AS hop counts to run.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Runs per helper, the fastest counts.')
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help='Baseline json file.')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='Slowdown factor failing the run.')
+    parser.add_argument('--save', action='store_true',
+                        help='Store the results as the baseline, by default '
+                        'in the source tree.')
+    args = parser.parse_args()
+
+    if args.topology:
+        topo_files = [os.path.join(TOPOLOGY_DIR, '%s.topo' % name)
+                      for name in args.topology]
+    else:
+        topo_files = sorted(glob.glob(os.path.join(TOPOLOGY_DIR, '*.topo')))
+    result = run(topo_files, args.scales, args.repeat)
+    if args.save:
+        with open(args.baseline, 'w') as fout:
+            json.dump(result, fout, indent=1, sort_keys=True)
+        print("\nbaseline saved to %s" % args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print("\nno baseline at %s, comparison skipped, store one with "
+              "--save" % args.baseline)
+        return 0
+    with open(args.baseline, 'r') as fin:
+        baseline = json.load(fin)
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print("\n%s regressions over %.1fx" % (
+            len(regressions), args.tolerance))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())